@@ -0,0 +1,134 @@
+"""Synthetic activity histories and a local stand-in for the Strava API, for benchmarks."""
+import bisect
+import datetime
+import json
+import os
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TYPES = [('Run', 'Run', 3.0), ('Ride', 'Ride', 7.5), ('Ride', 'MountainBikeRide', 5.5),
+         ('Hike', 'Hike', 1.3), ('NordicSki', 'NordicSki', 4.2), ('Workout', 'Workout', 0)]
+WORDS = ['Morning', 'Evening', 'Lunch', 'Easy', 'Tempo', 'Long', 'Recovery', 'Hill', 'Běh',
+         'Vyjížďka', 'Šumava', 'Pálava', 'Brno', 'loop', 'intervals', 'with friends']
+GEARS = ['b1001', 'b1002', 'b1003', 'g2001', 'g2002', None]
+HOME = (49.19, 16.61)
+PAGE_SIZE = 100
+
+
+def activity(rng, activity_id, start):
+    activity_type, sport_type, speed = rng.choice(TYPES)
+    speed = round(speed * rng.uniform(0.7, 1.3), 3)
+    moving_time = rng.randint(600, 4 * 3600)
+    distance = round(speed * moving_time, 1)
+    lat, lng = HOME[0] + rng.gauss(0, 0.2), HOME[1] + rng.gauss(0, 0.3)
+    local = start + datetime.timedelta(hours=2)
+    return {
+        'resource_state': 2, 'athlete': {'id': 134815, 'resource_state': 1},
+        'name': ' '.join(rng.sample(WORDS, rng.randint(1, 3))),
+        'distance': distance, 'moving_time': moving_time,
+        'elapsed_time': moving_time + rng.randint(0, 900),
+        'total_elevation_gain': round(rng.uniform(0, 1500), 1) if speed else 0,
+        'type': activity_type, 'sport_type': sport_type, 'id': activity_id,
+        'start_date': start.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'start_date_local': local.strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'timezone': '(GMT+01:00) Europe/Prague', 'utc_offset': 7200,
+        'start_latlng': [round(lat, 6), round(lng, 6)] if speed else None,
+        'end_latlng': [round(lat + rng.gauss(0, 0.01), 6), round(lng + rng.gauss(0, 0.01), 6)]
+        if speed else None,
+        'kudos_count': rng.randint(0, 30), 'comment_count': rng.randint(0, 3),
+        'map': {'id': f'a{activity_id}', 'summary_polyline': None, 'resource_state': 2},
+        'trainer': False, 'commute': rng.random() < 0.1, 'manual': not speed,
+        'private': False, 'gear_id': rng.choice(GEARS), 'average_speed': speed,
+        'max_speed': round(speed * 1.8, 3),
+        'has_heartrate': rng.random() < 0.8,
+        'average_heartrate': round(rng.uniform(110, 175), 1) if rng.random() < 0.8 else None,
+        'max_heartrate': rng.randint(160, 195),
+    }
+
+
+def synthetic_activities(count, seed=0):
+    """count activities of a plausible athlete, one every ~12 hours back from now, oldest first."""
+    rng = random.Random(seed)
+    now = datetime.datetime(2024, 6, 1, 7, 30)
+    starts = [now - datetime.timedelta(hours=12 * index + rng.randint(0, 6))
+              for index in range(count)]
+    return [activity(rng, 10_000_000_000 + index, start)
+            for index, start in enumerate(reversed(starts))]
+
+
+def write_pages(activities, directory):
+    """Store activities as activities_N.json pages, the layout of older versions, which
+    the store imports when it is opened."""
+    os.makedirs(directory, exist_ok=True)
+    for page, start in enumerate(range(0, len(activities), PAGE_SIZE), start=1):
+        with open(os.path.join(directory, f'activities_{page}.json'), 'w') as f:
+            json.dump(activities[start:start + PAGE_SIZE], f)
+
+
+def write_config(root_dir):
+    """Fake app credentials and a valid access token, so download talks to MockStrava."""
+    import pickle
+    import time
+    os.makedirs(root_dir, exist_ok=True)
+    with open(os.path.join(root_dir, 'config.json'), 'w') as f:
+        json.dump({'client_id': 1, 'client_secret': 'secret', 'code': 'code'}, f)
+    with open(os.path.join(root_dir, 'access_token.pickle'), 'wb') as f:
+        pickle.dump({'access_token': 'token', 'refresh_token': 'refresh',
+                     'expires_at': time.time() + 3600}, f)
+
+
+class MockStrava:
+    """Local HTTP server answering the API calls of download with the given activities,
+    newest first as Strava pages them. Use as a context manager, url is the API root."""
+    def __init__(self, activities, latency=0.0):
+        self.activities = sorted(activities, key=lambda a: a['start_date'], reverse=True)
+        # negated start timestamps, ascending for bisect
+        self.starts = [-datetime.datetime.strptime(a['start_date'], '%Y-%m-%dT%H:%M:%SZ')
+                       .replace(tzinfo=datetime.timezone.utc).timestamp()
+                       for a in self.activities]
+        self.latency = latency
+        self.requests = 0
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                mock.requests += 1
+                url = urlparse(self.path)
+                query = {key: values[0] for key, values in parse_qs(url.query).items()}
+                if url.path.endswith('/athlete/activities'):
+                    body = mock.page(int(query.get('page', 1)), int(query.get('per_page', 30)),
+                                     int(query.get('after', 0)))
+                elif url.path.endswith('/athlete'):
+                    body = {'id': 134815, 'bikes': [], 'shoes': []}
+                else:
+                    self.send_error(404)
+                    return
+                if mock.latency:
+                    threading.Event().wait(mock.latency)
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/api/v3'
+
+    def page(self, page, per_page, after):
+        # newest first, so activities after the timestamp are a prefix
+        newer = bisect.bisect_left(self.starts, -after)
+        return self.activities[(page - 1) * per_page:min(page * per_page, newer)]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
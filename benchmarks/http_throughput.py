@@ -0,0 +1,97 @@
+"""Measure throughput of strava-cli http under concurrent clients.
+
+Usage: python benchmarks/http_throughput.py [--size N] [--clients N ...] [--requests N]
+The server runs in its own process on a generated history of --size activities, each
+client sends requests over a kept alive connection, cycling through QUERIES.
+"""
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from benchmarks.fixtures import synthetic_activities, write_pages  # noqa: E402
+
+ENTRY_POINT = 'import sys\nfrom src.parse import main\nsys.argv[0] = "strava-cli"\nmain()'
+QUERIES = [
+    '/activities',
+    '/activities?type=run&per_page=20',
+    '/activities?distance=%3E+20&sortby=distance:desc&per_page=10',
+    '/activities?name=sumava&page=2',
+    '/activities?near=49.19,16.61&radius=10&average_pace=%3C+05:30',
+    '/activities?date=2023-01-01..2023-12-31&sortby=average_heartrate:desc,date:asc',
+    '/stats?weekly=4&monthly=12&type=ride',
+]
+
+
+def start_server(home):
+    """Run strava-cli http on a free port, (process, port) once it accepts requests."""
+    env = {**os.environ, 'HOME': home}
+    process = subprocess.Popen([sys.executable, '-c', ENTRY_POINT, 'http', '--port', '0'],
+                               env=env, cwd=REPO_DIR, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True)
+    # Serving activities on http://127.0.0.1:PORT/activities, ...
+    line = process.stdout.readline()
+    return process, int(line.split(':')[2].split('/')[0])
+
+
+def client(port, count, latencies):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    for index in range(count):
+        start = time.perf_counter()
+        connection.request('GET', QUERIES[index % len(QUERIES)])
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            raise RuntimeError(f'{QUERIES[index % len(QUERIES)]} failed with {response.status}')
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def measure(port, clients, requests):
+    """Requests per second and median latency in ms of clients sending requests each."""
+    latencies = []
+    threads = [threading.Thread(target=client, args=(port, requests, latencies))
+               for _ in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, statistics.median(latencies) * 1000
+
+
+def main():
+    argparser = ArgumentParser(description='Measure throughput of strava-cli http.')
+    argparser.add_argument('--size', type=int, default=10000, help='number of activities')
+    argparser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16],
+                           help='numbers of concurrent clients')
+    argparser.add_argument('--requests', type=int, default=100, help='requests per client')
+    args = argparser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        write_pages(synthetic_activities(args.size),
+                    os.path.join(home, '.config', 'strava-cli', 'strava-cli-activities'))
+        process, port = start_server(home)
+        try:
+            # first requests build the name and spatial indexes
+            measure(port, 1, len(QUERIES))
+            for clients in args.clients:
+                throughput, latency = measure(port, clients, args.requests)
+                print(f"{clients:>3} clients {throughput:8.1f} requests/s "
+                      f"{latency:8.1f} ms median latency")
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Measure startup time of the strava-cli entry point.
+
+Usage: python benchmarks/startup.py [--runs N] [--max-ms MS]
+Exits with non-zero status when the median of any scenario exceeds --max-ms.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from src import store  # noqa: E402
+
+ENTRY_POINT = 'import sys\nfrom src.parse import main\nsys.argv[0] = "strava-cli"\nmain()'
+
+SCENARIOS = {
+    'interpreter': [],
+    'import': ['-c', 'import src.parse'],
+    'help': ['-c', ENTRY_POINT, '--help'],
+    'plain query': ['-c', ENTRY_POINT, '--format', 'plain', '--limit', '1'],
+    'rich query': ['-c', ENTRY_POINT, '--limit', '1'],
+}
+
+
+def create_home(directory):
+    conn = store.connect(os.path.join(directory, '.config', 'strava-cli',
+                                      'strava-cli-activities', 'activities.db'))
+    with open(os.path.join(REPO_DIR, 'tests', 'example_data.json')) as f:
+        store.upsert(conn, json.load(f))
+    conn.close()
+
+
+def start_daemon(home, env):
+    """Run strava-cli serve in the background until its socket accepts connections."""
+    process = subprocess.Popen([sys.executable, '-c', ENTRY_POINT, 'serve'], env=env,
+                               stdout=subprocess.DEVNULL, cwd=REPO_DIR)
+    socket_path = os.path.join(home, '.config', 'strava-cli', 'strava-cli.sock')
+    while not os.path.exists(socket_path):
+        time.sleep(0.01)
+    return process
+
+
+def time_command(args, env, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *(args or ['-c', 'pass'])], env=env, check=True,
+                       stdout=subprocess.DEVNULL, cwd=REPO_DIR)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    argparser = ArgumentParser(description='Measure startup time of strava-cli.')
+    argparser.add_argument('--runs', type=int, default=10, help='runs per scenario')
+    argparser.add_argument('--max-ms', type=float, help='fail when a median exceeds this')
+    args = argparser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as home:
+        create_home(home)
+        env = {**os.environ, 'HOME': home}
+        for name, command in SCENARIOS.items():
+            median = time_command(command, env, args.runs)
+            failed |= args.max_ms is not None and median > args.max_ms
+            print(f"{name:<12} {median:8.1f} ms")
+        daemon = start_daemon(home, env)
+        try:
+            median = time_command(SCENARIOS['plain query'], env, args.runs)
+        finally:
+            daemon.terminate()
+            daemon.wait()
+        failed |= args.max_ms is not None and median > args.max_ms
+        print(f"{'served query':<12} {median:8.1f} ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""Benchmark loading, filtering, sorting, stats, rendering and download on synthetic
+histories of 1k, 10k and 100k activities, downloads are served by a local mock of the
+Strava API so that the suite runs offline.
+
+Usage: python benchmarks/suite.py [--sizes N ...] [--runs N] [--save FILE]
+                                  [--compare FILE] [--tolerance RATIO]
+Exits with non-zero status when a median is slower than --tolerance times the median
+saved in the --compare file.
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+REPO_DIR = os.path.dirname(os.path.abspath(os.path.dirname(__file__)))
+sys.path.insert(0, REPO_DIR)
+# paths in src are resolved from HOME on import, keep the user's data out of reach
+HOME = tempfile.mkdtemp(prefix='strava-cli-bench-')
+os.environ['HOME'] = HOME
+
+from benchmarks.fixtures import MockStrava, synthetic_activities, write_config, write_pages  # noqa: E402,E501
+from src import ACTIVITIES_DIR, ROOT_DIR, STORE_PATH, api, snapshot, store  # noqa: E402
+
+SIZES = [1000, 10000, 100000]
+# filters given on the command line, each is run on the snapshot and on the store
+FILTERS = {
+    'type': ['--type', 'run'],
+    'name': ['--name', 'sumava'],
+    'distance': ['--distance', '> 10'],
+    'distance range': ['--distance', '10..42'],
+    'date': ['--date', '>= 2023-01-01'],
+    'pace': ['--average_pace', '< 05:30'],
+    'heartrate': ['--average_heartrate', '>= 150'],
+    'near': ['--near', '49.19,16.61', '--radius', '10'],
+    'sortby limit': ['--sortby', 'distance:desc', '--limit', '10'],
+}
+# activities rendered by the rich printer, the cost is linear in them
+RENDERED = 1000
+
+
+def measure(function, runs, setup=None):
+    """Median wall time of function in milliseconds, setup runs untimed before each run."""
+    timings = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def reset_store():
+    shutil.rmtree(os.path.dirname(STORE_PATH), ignore_errors=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(snapshot.SNAPSHOT_PATH)
+
+
+def plan_for(argv):
+    from src.parse import build_query_plan, parse_cli_args
+    return build_query_plan(parse_cli_args(argv))
+
+
+def bench_size(activities, runs):
+    """Median milliseconds of each scenario by name for one history."""
+    from src import load_activities, parse, printer, query, stats
+    from rich.console import Console
+    results = {}
+
+    def import_pages():
+        store.connect().close()
+    results['import pages'] = measure(
+        import_pages, runs, setup=lambda: (reset_store(), write_pages(activities, ACTIVITIES_DIR)))
+    results['snapshot refresh'] = measure(snapshot.refresh, runs)
+    results['load store'] = measure(load_activities.load, runs)
+    results['load snapshot'] = measure(snapshot.load, runs)
+
+    data = load_activities.load()
+    results['filter types'] = measure(lambda: parse.filter_activity_types(data, ['run']), runs)
+    results['filter name'] = measure(lambda: parse.match_field(data, 'sumava', 'name'), runs)
+    distance = parse.validate_attr_filter('> 10', 'distance')
+    results['filter attribute'] = measure(
+        lambda: parse.apply_attr_filters(data, 'distance', distance), runs)
+    results['sort_by_attr'] = measure(
+        lambda: parse.sort_by_attr(data, 'distance:desc,date:asc'), runs)
+    results['weekly_stats'] = measure(lambda: stats.weekly_stats(data, 52), runs)
+
+    table = snapshot.load()
+    conn = store.connect()
+    try:
+        for name, argv in FILTERS.items():
+            plan = plan_for(argv)
+            results[f'query {name}'] = measure(lambda: query.execute_table(plan, table), runs)
+            results[f'query {name} (store)'] = measure(lambda: query.execute(plan, conn), runs)
+    finally:
+        conn.close()
+
+    printer._console = Console(file=io.StringIO(), force_terminal=True, width=120)
+    rendered = data[:RENDERED]
+    with contextlib.redirect_stdout(io.StringIO()):
+        results[f'pprint {len(rendered)}'] = measure(lambda: printer.pprint(rendered), runs)
+    printer._console = None
+    return results
+
+
+def bench_download(activities, runs):
+    """Median milliseconds of a full download from the mock API."""
+    from src import get_data
+    write_config(ROOT_DIR)
+    with MockStrava(activities) as server, contextlib.redirect_stdout(io.StringIO()):
+        api.API_URL = server.url
+        # the mock has no quota, don't pace requests
+        api.scheduler = api.RequestScheduler(short_limit=10 ** 9, daily_limit=10 ** 9)
+        return measure(get_data.download, runs, setup=reset_store)
+
+
+def compare(results, baseline, tolerance):
+    """Scenarios slower than tolerance times their baseline as (key, median, baseline)."""
+    return [(key, median, baseline[key]) for key, median in results.items()
+            if key in baseline and median > tolerance * baseline[key]]
+
+
+def main():
+    argparser = ArgumentParser(description='Benchmark strava-cli on synthetic histories.')
+    argparser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                           help='numbers of activities of the histories')
+    argparser.add_argument('--runs', type=int, default=5, help='runs per scenario')
+    argparser.add_argument('--save', type=str, help='write medians to a json file')
+    argparser.add_argument('--compare', type=str, help='json file saved by an earlier run')
+    argparser.add_argument('--tolerance', type=float, default=1.25,
+                           help='fail when a median exceeds this times the compared one')
+    args = argparser.parse_args()
+
+    results = {}
+    try:
+        for size in args.sizes:
+            activities = synthetic_activities(size)
+            reset_store()
+            timings = bench_size(activities, args.runs)
+            timings['download'] = bench_download(activities, args.runs)
+            for name, median in timings.items():
+                results[f'{size} {name}'] = median
+                print(f"{size:>7} {name:<28} {median:10.1f} ms")
+    finally:
+        shutil.rmtree(HOME, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for key, median, baseline in regressions:
+            print(f"Regression: {key} {median:.1f} ms, was {baseline:.1f} ms")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
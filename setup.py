@@ -7,8 +7,12 @@ setup(
     packages=find_packages(),
     install_requires=[
         'requests',
-        'rich'
+        'rich',
+        'numpy'
     ],
+    extras_require={
+        'parquet': ['pyarrow'],
+    },
     entry_points={
         'console_scripts': [
             'strava-cli=src.parse:main',
@@ -7,6 +7,17 @@ USER_CONFIG_DIR = expanduser(os.path.join('~', '.config'))
 ROOT_DIR = expanduser(os.path.join('~', '.config', 'strava-cli'))
 ACTIVITIES_DIR = expanduser(os.path.join('~', '.config', 'strava-cli', 'strava-cli-activities'))
 CONFIG_PATH = expanduser(os.path.join('~', '.config', 'strava-cli', 'config.json'))
+STORE_PATH = expanduser(os.path.join('~', '.config', 'strava-cli', 'strava-cli-activities',
+                                     'activities.db'))
+STREAMS_DIR = expanduser(os.path.join('~', '.config', 'strava-cli', 'strava-cli-activities',
+                                      'streams'))
+CACHE_DIR = expanduser(os.path.join('~', '.config', 'strava-cli', 'cache'))
+SNAPSHOT_PATH = expanduser(os.path.join('~', '.config', 'strava-cli', 'cache',
+                                        'activities.snapshot'))
+ATHLETE_PATH = expanduser(os.path.join('~', '.config', 'strava-cli', 'cache', 'athlete.json'))
+BESTS_PATH = expanduser(os.path.join('~', '.config', 'strava-cli', 'cache', 'bests.json'))
+ROUTES_PATH = expanduser(os.path.join('~', '.config', 'strava-cli', 'cache', 'routes.pickle'))
+SOCKET_PATH = expanduser(os.path.join('~', '.config', 'strava-cli', 'strava-cli.sock'))
 ACCESS_TOKEN = expanduser(os.path.join('~', '.config', 'strava-cli', 'access_token.pickle'))
 
 
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import requests
+
+from src import instrument
+
+API_URL = 'https://www.strava.com/api/v3'
+OAUTH_URL = 'https://www.strava.com/api/v3/oauth/token'
+
+# default Strava quotas, replaced by X-RateLimit-Limit as soon as a response reports them
+SHORT_LIMIT = 200
+DAILY_LIMIT = 2000
+SHORT_WINDOW = 15 * 60
+MAX_RETRIES = 5
+BACKOFF = 1
+DAILY_QUOTA_EXHAUSTED = 'Daily Strava API quota exhausted, try again tomorrow.'
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+def seconds_to_next_window(now, window=SHORT_WINDOW):
+    """Strava resets the short quota at natural 15 minute boundaries (0, 15, 30, 45)."""
+    return window - now % window
+
+
+def parse_rate_header(value):
+    """Parse 'short,daily' rate header into ints, None when missing or malformed."""
+    try:
+        short, daily = value.split(',')[:2]
+        return int(short), int(daily)
+    except (AttributeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at `rate` tokens per second up to `capacity`."""
+    def __init__(self, rate, capacity, clock=time.time, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+    def set_available(self, tokens):
+        """Clamp available tokens to what the server reports as remaining."""
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, tokens)
+
+
+class RequestScheduler:
+    """Single entry point for Strava API calls.
+    Requests are paced by a token bucket sized to the 15 minute quota, quota usage
+    reported in X-RateLimit headers is fed back into the bucket, and 429/5xx responses
+    are retried with exponential backoff."""
+    def __init__(self, short_limit=SHORT_LIMIT, daily_limit=DAILY_LIMIT,
+                 max_retries=MAX_RETRIES, clock=time.time, sleep=time.sleep):
+        self.daily_limit = daily_limit
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self.bucket = TokenBucket(short_limit / SHORT_WINDOW, short_limit, clock, sleep)
+        # set once a response reports the daily quota used up, later requests are refused
+        self.exhausted = False
+
+    def update_limits(self, headers):
+        limits = parse_rate_header(headers.get('X-RateLimit-Limit'))
+        usage = parse_rate_header(headers.get('X-RateLimit-Usage'))
+        if limits:
+            self.bucket.rate = limits[0] / SHORT_WINDOW
+            self.bucket.capacity = limits[0]
+            self.daily_limit = limits[1]
+        if limits and usage:
+            self.exhausted = usage[1] >= limits[1]
+            self.bucket.set_available(limits[0] - usage[0])
+
+    def retry_delay(self, response, attempt):
+        """Seconds to wait before retrying a failed request."""
+        if response is not None and response.status_code == 429:
+            if retry_after := response.headers.get('Retry-After'):
+                return float(retry_after)
+            limits = parse_rate_header(response.headers.get('X-RateLimit-Limit'))
+            usage = parse_rate_header(response.headers.get('X-RateLimit-Usage'))
+            if limits and usage and usage[0] >= limits[0]:
+                return seconds_to_next_window(self.clock())
+        return BACKOFF * 2 ** attempt
+
+    def request(self, method, url, session=None, **kwargs):
+        """Send request once the quota allows it, retrying on rate limiting and server errors."""
+        if self.exhausted:
+            raise RateLimitExceeded(DAILY_QUOTA_EXHAUSTED)
+        sender = session or requests
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                response = sender.request(method, url, **kwargs)
+            except requests.ConnectionError:
+                instrument.request(method, url, None, time.perf_counter() - start)
+                if attempt == self.max_retries:
+                    raise
+                self.sleep(self.retry_delay(None, attempt))
+                continue
+            instrument.request(method, url, response.status_code, time.perf_counter() - start)
+            self.update_limits(response.headers)
+            if response.status_code != 429 and response.status_code < 500:
+                return response
+            if self.exhausted:
+                # no retry succeeds before the daily quota resets
+                raise RateLimitExceeded(DAILY_QUOTA_EXHAUSTED)
+            if attempt < self.max_retries:
+                self.sleep(self.retry_delay(response, attempt))
+        response.raise_for_status()
+        return response
+
+
+scheduler = RequestScheduler()
+
+
+def get(path, access_token, session=None, **kwargs):
+    """GET an API endpoint relative to API_URL as the authenticated athlete."""
+    headers = {'Authorization': f"Bearer {access_token['access_token']}"}
+    return scheduler.request('GET', f"{API_URL}/{path}", session=session,
+                             headers=headers, **kwargs)
+
+
+def post(url, **kwargs):
+    return scheduler.request('POST', url, **kwargs)
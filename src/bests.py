@@ -0,0 +1,113 @@
+import json
+import os
+
+import numpy as np
+
+from src import BESTS_PATH, streams
+
+# (name, stream, size), distances in metres are covered in the shortest time,
+# durations in seconds with the highest average of the stream
+EFFORTS = [('1k', 'distance', 1000), ('5k', 'distance', 5000), ('10k', 'distance', 10000),
+           ('5s power', 'watts', 5), ('1min power', 'watts', 60),
+           ('20min power', 'watts', 20 * 60),
+           ('1min heartrate', 'heartrate', 60), ('20min heartrate', 'heartrate', 20 * 60)]
+# bump whenever efforts or the way they are computed change
+BESTS_VERSION = 1
+
+
+def fastest_time(time, distance, length):
+    """Shortest time in seconds to cover length metres, None if the activity is shorter."""
+    # GPS noise can make the distance stream go back slightly
+    distance = np.maximum.accumulate(distance)
+    ends = np.searchsorted(distance, distance + length)
+    valid = ends < len(distance)
+    if not valid.any():
+        return None
+    return int(np.min(time[ends[valid]] - time[valid]))
+
+
+def per_second(time, values, fill):
+    """Samples spread on a one second grid, seconds without a sample set to fill."""
+    grid = np.full(int(time[-1]) + 1, fill, dtype=np.float64)
+    grid[time] = values
+    return grid
+
+
+def best_average(time, values, seconds, fill):
+    """Highest average of values over a window of consecutive seconds, computed from
+    cumulative sums. Windows with a missing sample are skipped, None if there is none."""
+    grid = per_second(time, values, fill)
+    if len(grid) < seconds:
+        return None
+    missing = np.isnan(grid)
+    sums = np.cumsum(np.concatenate([[0], np.where(missing, 0, grid)]))
+    gaps = np.cumsum(np.concatenate([[0], missing]))
+    totals = sums[seconds:] - sums[:-seconds]
+    complete = gaps[seconds:] == gaps[:-seconds]
+    if not complete.any():
+        return None
+    return round(float(np.max(totals[complete])) / seconds, 1)
+
+
+def activity_bests(samples):
+    """Best efforts of an activity from its streams, None for efforts it has no data for."""
+    bests = {}
+    time = samples.get('time')
+    for name, stream, size in EFFORTS:
+        values = samples.get(stream)
+        if time is None or values is None or not len(time):
+            bests[name] = None
+        elif stream == 'distance':
+            bests[name] = fastest_time(time, values, size)
+        else:
+            # no power while coasting, heart rate unknown
+            bests[name] = best_average(time, values, size, 0 if stream == 'watts' else np.nan)
+    return bests
+
+
+def read_cache(path=None):
+    try:
+        with open(path or BESTS_PATH, 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache['activities'] if cache.get('version') == BESTS_VERSION else {}
+
+
+def write_cache(bests, path=None):
+    path = path or BESTS_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump({'version': BESTS_VERSION, 'activities': bests}, f)
+    os.replace(f'{path}.tmp', path)
+
+
+def load_bests(activity_ids, path=None, streams_dir=None):
+    """Best efforts by activity id for activities with downloaded streams.
+    Only activities missing in the cache are computed from their streams."""
+    cache = read_cache(path)
+    bests = {}
+    computed = False
+    for activity_id in activity_ids:
+        key = str(activity_id)
+        if key not in cache:
+            if not streams.has_streams(activity_id, streams_dir):
+                continue
+            cache[key] = activity_bests(streams.load(activity_id, directory=streams_dir))
+            computed = True
+        bests[activity_id] = cache[key]
+    if computed:
+        write_cache(cache, path)
+    return bests
+
+
+def history_bests(activities, bests, top=1):
+    """The top activities for each effort as (effort, [(value, activity)]), best first."""
+    ranking = []
+    for name, stream, _ in EFFORTS:
+        efforts = [(bests[activity['id']][name], activity) for activity in activities
+                   if activity['id'] in bests and bests[activity['id']][name] is not None]
+        # shortest time for distances, highest average otherwise
+        efforts.sort(key=lambda effort: effort[0], reverse=stream != 'distance')
+        ranking.append((name, efforts[:top]))
+    return ranking
@@ -1,13 +1,83 @@
-from src.get_data import get_user
+import json
+import os
+import time
+
+from src import ATHLETE_PATH
+
+# athlete profile and gear change rarely, the cache is also refreshed by every download
+ATHLETE_TTL = 24 * 60 * 60
+
+_gear_index = None
 
 
 def show_user():
     pass
 
 
-def list_gear():
-    user = get_user()
-    return user['bikes'], user['shoes']
+def read_athlete_cache():
+    """Cached athlete profile with the time it was fetched, None if there is no cache."""
+    try:
+        with open(ATHLETE_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def refresh_athlete_cache():
+    """Fetch athlete profile from the API, store it in the cache and return the cache."""
+    from src.get_data import get_user
+    athlete = get_user()
+    if not isinstance(athlete, dict) or 'bikes' not in athlete or 'shoes' not in athlete:
+        # never cache an error payload in place of the athlete
+        raise ValueError(f'Unexpected athlete profile from Strava: {athlete}')
+    cached = {'fetched_at': time.time(), 'athlete': athlete}
+    os.makedirs(os.path.dirname(ATHLETE_PATH), exist_ok=True)
+    with open(ATHLETE_PATH, 'w') as f:
+        json.dump(cached, f)
+    return cached
+
+
+def refresh_athlete():
+    """Fetch athlete profile from the API and store it in the cache."""
+    return refresh_athlete_cache()['athlete']
+
+
+def load_athlete_cache(max_age=ATHLETE_TTL):
+    """Athlete cache, refreshed from the API when older than max_age. A stale cache is
+    still used when the API can't be reached or refuses the request."""
+    cached = read_athlete_cache()
+    if cached and time.time() - cached['fetched_at'] < max_age:
+        return cached
+    import requests
+    try:
+        return refresh_athlete_cache()
+    except (OSError, requests.HTTPError, ValueError):
+        if cached:
+            return cached
+        raise
+
+
+def load_athlete(max_age=ATHLETE_TTL):
+    """Athlete profile from the cache, see load_athlete_cache."""
+    return load_athlete_cache(max_age)['athlete']
+
+
+def list_gear(max_age=ATHLETE_TTL):
+    athlete = load_athlete(max_age)
+    return athlete['bikes'], athlete['shoes']
+
+
+def gear_index():
+    """Name index of all gear with the gear in the same order. Built once for each fetch of
+    the athlete profile, so a long running process picks up gear refreshed by a download
+    or after ATHLETE_TTL."""
+    global _gear_index
+    cached = load_athlete_cache()
+    if _gear_index is None or _gear_index[0] != cached['fetched_at']:
+        from src.search import NameIndex
+        gears = cached['athlete']['bikes'] + cached['athlete']['shoes']
+        _gear_index = cached['fetched_at'], NameIndex(gear['name'] for gear in gears), gears
+    return _gear_index[1:]
 
 
 if __name__ == '__main__':
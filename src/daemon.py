@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import shutil
+import socket
+import socketserver
+import sys
+import threading
+from contextlib import redirect_stderr, redirect_stdout
+
+from src import SOCKET_PATH
+
+# subcommands answered by the daemon, the others change state or talk to Strava
+QUERY_COMMANDS = (None, 'bests', 'routes')
+
+
+def connect(path=None):
+    """Socket connected to a running daemon, None when there is none."""
+    path = path or SOCKET_PATH
+    if not os.path.exists(path):
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def send(sock, argv):
+    """Send a query with the cli arguments, answered by (error, output bytes).
+    Requests are a json line, responses a json header line with the error and size of
+    the output, followed by the output as printed."""
+    request = {'argv': argv, 'cwd': os.getcwd(), 'terminal': sys.stdout.isatty(),
+               'width': shutil.get_terminal_size().columns}
+    sock.sendall(json.dumps(request).encode() + b'\n')
+    sock.shutdown(socket.SHUT_WR)
+    with sock.makefile('rb') as response:
+        header = json.loads(response.readline())
+        return header['error'], response.read(header['size'])
+
+
+def forward(argv, path=None):
+    """Run a query on a running daemon and print its output, False when none is running."""
+    sock = connect(path)
+    if sock is None:
+        return False
+    with sock:
+        error, output = send(sock, argv)
+    sys.stdout.buffer.write(output)
+    sys.stdout.flush()
+    if error:
+        sys.exit(error)
+    return True
+
+
+def answer(request):
+    """Run a query sent by a client as the cli would, returning (error, output bytes)."""
+    from src import printer, snapshot
+    from src.parse import parse_cli_args, run
+    output = io.TextIOWrapper(io.BytesIO(), encoding='utf-8', write_through=True)
+    errors = io.StringIO()
+    error = None
+    with redirect_stdout(output), redirect_stderr(errors):
+        try:
+            args = parse_cli_args(request['argv'])
+            if args.subcommand not in QUERY_COMMANDS:
+                raise ValueError(f'{args.subcommand} is not served, run it without the daemon')
+            if args.output:
+                args.output = os.path.join(request['cwd'], args.output)
+            if args.format == 'rich':
+                from rich.console import Console
+                printer._console = Console(file=output, force_terminal=request['terminal'],
+                                           width=request['width'])
+            # rebuilt once after a download, kept in memory for the following queries
+            snapshot.current()
+            run(args)
+        except SystemExit as e:
+            # raised by argparse for --help and invalid arguments
+            error = (errors.getvalue().strip() or 'invalid arguments') if e.code else None
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            printer._console = None
+    return error, output.buffer.getvalue()
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        request = json.loads(self.rfile.readline())
+        # stdout is redirected while a query runs, so queries take turns
+        with self.server.lock:
+            error, output = answer(request)
+        header = {'error': error, 'size': len(output)}
+        self.wfile.write(json.dumps(header).encode() + b'\n' + output)
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        super().__init__(path, Handler)
+
+
+def serve(path=None):
+    """Answer queries on a unix socket until interrupted, keeping activities in memory."""
+    from src import snapshot
+    path = path or SOCKET_PATH
+    sock = connect(path)
+    if sock is not None:
+        sock.close()
+        raise RuntimeError(f'strava-cli is already served on {path}')
+    if os.path.exists(path):
+        # left behind by a daemon that was killed
+        os.remove(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    snapshot.current()
+    with Server(path) as server:
+        os.chmod(path, 0o600)
+        print(f"Serving activities on {path}, stop with Ctrl+C")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
@@ -3,8 +3,15 @@ import json
 import pickle
 import time
 import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
-from src import CONFIG_PATH, ACCESS_TOKEN, ACTIVITIES_DIR
+from src import CONFIG_PATH, ACCESS_TOKEN, api, instrument, snapshot, store
+from src.api import OAUTH_URL
+from src.commands import refresh_athlete
+
+PAGE_SIZE = 100
+PAGE_WORKERS = 4
 
 
 def get_access_token():
@@ -13,11 +20,11 @@ def get_access_token():
     client_id, client_secret = config['client_id'], config['client_secret']
 
     if not os.path.exists(ACCESS_TOKEN):
-        refresh_response = requests.post(url='https://www.strava.com/api/v3/oauth/token',
-                                         data={'client_id': client_id,
-                                               'client_secret': client_secret,
-                                               'grant_type': 'authorization_code',
-                                               'code': config['code']})
+        refresh_response = api.post(url=OAUTH_URL,
+                                    data={'client_id': client_id,
+                                          'client_secret': client_secret,
+                                          'grant_type': 'authorization_code',
+                                          'code': config['code']})
         access_token = refresh_response.json()
         with open(ACCESS_TOKEN, 'wb') as f:
             pickle.dump(access_token, f)
@@ -26,11 +33,11 @@ def get_access_token():
             access_token = pickle.load(f)
 
         if time.time() > access_token['expires_at']:
-            refresh_response = requests.post(url='https://www.strava.com/api/v3/oauth/token',
-                                             data={'client_id': client_id,
-                                                   'client_secret': client_secret,
-                                                   'grant_type': 'refresh_token',
-                                                   'refresh_token': access_token['refresh_token']})
+            refresh_response = api.post(url=OAUTH_URL,
+                                        data={'client_id': client_id,
+                                              'client_secret': client_secret,
+                                              'grant_type': 'refresh_token',
+                                              'refresh_token': access_token['refresh_token']})
             access_token = refresh_response.json()
             with open(ACCESS_TOKEN, 'wb') as f:
                 pickle.dump(access_token, f)
@@ -38,33 +45,96 @@ def get_access_token():
     return access_token
 
 
-def download():
-    access_token = get_access_token()
-    if os.path.exists(ACTIVITIES_DIR):
-        for filename in os.listdir(ACTIVITIES_DIR):
-            file_path = os.path.join(ACTIVITIES_DIR, filename)
-            os.remove(file_path)
-
-    index = 0
-    finished = False
-    while not finished:
-        index += 1
-        response = requests.get(url='https://www.strava.com/api/v3/athlete/activities',
-                                headers={'Authorization': f"Bearer {access_token['access_token']}"},
-                                params={'page': index, 'per_page': 100})
-        if response.text == '[]' or index == 10:
-            finished = True
-            continue
-        with open(os.path.join(ACTIVITIES_DIR, f"activities_{index}.json"), 'w') as f:
-            json.dump(response.json(), f)
-
-    print("Download successful")
+def fetch_page(session, access_token, params, index):
+    response = api.get('athlete/activities', access_token, session=session,
+                       params={**params, 'page': index, 'per_page': PAGE_SIZE})
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_pages(access_token, params=None, workers=PAGE_WORKERS):
+    """Yield pages of activities in order until a page comes back shorter than PAGE_SIZE.
+    Up to `workers` pages are requested concurrently over a shared session. With `after`
+    in params the first page is requested alone, an incremental sync rarely needs more."""
+    params = params or {}
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(index):
+            return executor.submit(fetch_page, session, access_token, params, index)
+        first_pages = 1 if 'after' in params else workers
+        pending = deque(submit(index) for index in range(1, first_pages + 1))
+        next_index = first_pages + 1
+        while pending:
+            page = pending.popleft().result()
+            last = len(page) < PAGE_SIZE
+            if last:
+                for future in pending:
+                    future.cancel()
+            else:
+                while len(pending) < workers:
+                    pending.append(submit(next_index))
+                    next_index += 1
+            if page:
+                yield page
+            if last:
+                return
+
+
+def download(full=False, geocode=False, streams=False):
+    """Sync activities to the local store.
+    Only activities newer than the most recent stored one are requested,
+    unless full is set, in which case the store is cleared and refetched.
+    With geocode, country and city of new activities are looked up from their start.
+    With streams, detailed samples are fetched for activities that don't have them yet."""
+    with instrument.stage('access token'):
+        access_token = get_access_token()
+    conn = store.connect()
+    try:
+        if full:
+            store.clear(conn)
+        after = store.newest_start(conn)
+        # step back one second so activities started at the same moment are not missed,
+        # duplicates are replaced by id
+        params = {} if after is None else {'after': after - 1}
+        new_count = 0
+        with instrument.stage('fetch activities'):
+            try:
+                for page in fetch_pages(access_token, params):
+                    store.upsert(conn, page)
+                    new_count += len(page)
+            except api.RateLimitExceeded as e:
+                # pages are stored as they come, newer activities continue from the last one
+                print(f"{e} Activities not synced yet remain, "
+                      f"run download {'--full ' if after is None else ''}again then.")
+        if geocode:
+            from src.nominatim import annotate
+            with instrument.stage('geocode'):
+                print(f"Geocoded {annotate(conn)} activities")
+        if streams:
+            from src.streams import download_streams
+            with instrument.stage('streams'):
+                count, remaining = download_streams(access_token, store.ids(conn))
+            print(f"Downloaded streams of {count} activities")
+            if remaining:
+                print(f"Daily Strava API quota exhausted, streams of {remaining} activities "
+                      f"remain, run download --streams again tomorrow.")
+    finally:
+        conn.close()
+    with instrument.stage('refresh snapshot'):
+        snapshot.refresh()
+    with instrument.stage('refresh athlete'):
+        try:
+            refresh_athlete()
+        except (OSError, requests.HTTPError, ValueError, api.RateLimitExceeded) as e:
+            # activities are stored already, gear is served from the old cache
+            print(f"Warning: athlete profile not refreshed, keeping the cached one: {e}")
+
+    print(f"Download successful, {new_count} activities synced")
 
 
 def get_user():
     access_token = get_access_token()
-    response = requests.get(url='https://www.strava.com/api/v3/athlete/',
-                            headers={'Authorization': f"Bearer {access_token['access_token']}"})
+    response = api.get('athlete', access_token)
+    response.raise_for_status()
     return response.json()
 
 
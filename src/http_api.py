@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import traceback
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+import numpy as np
+
+from src import ACTIVITIES_DIR, STORE_PATH, Attribute, snapshot, store
+from src.table import RawRows
+
+PER_PAGE = 50
+MAX_PER_PAGE = 1000
+# query parameters of each endpoint, named as the cli flags without the dashes
+FILTER_PARAMS = {'name', 'type', 'limit', 'sortby', 'gear', 'near', 'radius', 'country', 'city',
+                 *Attribute.__members__}
+ENDPOINT_PARAMS = {'/activities': FILTER_PARAMS | {'page', 'per_page'},
+                   '/stats': FILTER_PARAMS | {'weekly', 'monthly', 'yearly'}}
+
+
+class Activities:
+    """Activities held in memory for all requests, reloaded only when the store or the
+    activities directory changes, e.g. by a download or activities_N.json put there."""
+    def __init__(self, directory=None, store_path=None):
+        self.directory = directory or ACTIVITIES_DIR
+        self.store_path = store_path or STORE_PATH
+        self.lock = threading.Lock()
+        self.version = None
+        self.table = None
+
+    def current_version(self):
+        return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None
+                     for path in (self.directory, self.store_path))
+
+    def get(self):
+        if self.current_version() != self.version:
+            with self.lock:
+                version = self.current_version()
+                if version != self.version:
+                    if store.exists(self.store_path):
+                        # imports activities_N.json files left in the directory
+                        store.connect(self.store_path).close()
+                    self.table = snapshot.current(store_path=self.store_path)
+                    self.version = self.current_version()
+        return self.table
+
+
+@lru_cache(maxsize=1)
+def query_parser():
+    """Cli parser raising ValueError instead of exiting, built once for all requests."""
+    from src.parse import cli_parser
+    argparser = cli_parser()
+
+    def error(message):
+        raise ValueError(message)
+    argparser.error = error
+    return argparser
+
+
+def parse_params(path, query):
+    """Cli arguments given as query parameters of an endpoint, url encoded, e.g.
+    ?type=run&distance=%3E+10 for --type run --distance '> 10'.
+    Raises ValueError for unknown or invalid parameters instead of exiting."""
+    params = parse_qs(query, keep_blank_values=True)
+    unknown = set(params) - ENDPOINT_PARAMS[path]
+    if unknown:
+        raise ValueError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+    argv = [f'--{key}={value}' for key, values in params.items()
+            if key not in ('page', 'per_page') for value in values]
+    args = query_parser().parse_args(argv)
+    page = int(params.get('page', ['1'])[-1])
+    per_page = int(params.get('per_page', [str(PER_PAGE)])[-1])
+    if page < 1 or not 1 <= per_page <= MAX_PER_PAGE:
+        raise ValueError(f'page must be positive and per_page within 1..{MAX_PER_PAGE}')
+    return args, page, per_page
+
+
+def build_plan(args):
+    from src.parse import build_query_plan, query_gear_by_name
+    gear = query_gear_by_name(args.gear) if args.gear else None
+    return build_query_plan(args, gear)
+
+
+def activities_page(table, args, page, per_page, query):
+    """Page of selected activities as the original API objects and the url of the next one."""
+    from src.query import execute_table
+    plan = build_plan(args)
+    start, stop = (page - 1) * per_page, page * per_page
+    # one more row tells whether there is a next page, without selecting all of them
+    plan.limit = stop + 1 if args.limit is None else min(args.limit, stop + 1)
+    selected = execute_table(plan, table)
+    rows = selected.take(np.arange(start, min(stop, len(selected)))).rows
+    # the snapshot keeps activities as JSON text, sent as they are
+    activities = rows.raw if isinstance(rows, RawRows) else [json.dumps(row) for row in rows]
+    next_url = None
+    if len(selected) > stop:
+        params = {key: values for key, values in parse_qs(query).items() if key != 'page'}
+        next_url = f"/activities?{urlencode({**params, 'page': page + 1}, doseq=True)}"
+    return (f'{{"page": {page}, "per_page": {per_page}, "next": {json.dumps(next_url)}, '
+            f'"activities": [{", ".join(activities)}]}}')
+
+
+def period_stats(table, args):
+    """Stats of the selected activities for each period asked for, moving time in seconds."""
+    from src.query import execute_table
+    from src.stats import generate_ranges, period_stats
+    periods = [(period, count) for period, count in
+               [('week', args.weekly), ('month', args.monthly), ('year', args.yearly)] if count]
+    if not periods:
+        raise ValueError('Specify weekly, monthly or yearly number of periods')
+    selected = execute_table(build_plan(args), table)
+    stats = {}
+    for period, count in periods:
+        stats[period] = [{'start': period_range['start'].isoformat(),
+                          'end': period_range['end'].isoformat(),
+                          **values, 'moving_time': values['moving_time'].total_seconds()}
+                         for period_range, values in zip(generate_ranges(count, period),
+                                                         period_stats(selected, count, period))]
+    return json.dumps(stats)
+
+
+class Handler(BaseHTTPRequestHandler):
+    # keep connections of clients open between requests, headers and body are written
+    # separately, don't let them wait for the client's delayed ack
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ENDPOINT_PARAMS:
+            return self.send_json(404, json.dumps({'error': f'Unknown endpoint {url.path}'}))
+        try:
+            args, page, per_page = parse_params(url.path, url.query)
+            table = self.server.activities.get()
+            if table is None:
+                return self.send_json(503, json.dumps(
+                    {'error': 'activity store empty, run the download command first.'}))
+            if url.path == '/activities':
+                body = activities_page(table, args, page, per_page, url.query)
+            else:
+                body = period_stats(table, args)
+        except (ValueError, KeyError) as e:
+            # KeyError quotes its message
+            message = e.args[0] if isinstance(e, KeyError) else str(e)
+            return self.send_json(400, json.dumps({'error': message}))
+        except Exception as e:
+            self.log_error('%s', traceback.format_exc())
+            return self.send_json(500, json.dumps({'error': f'{type(e).__name__}: {e}'}))
+        self.send_json(200, body)
+
+    def send_json(self, status, body):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, activities=None):
+        self.activities = activities or Activities()
+        super().__init__(address, Handler)
+
+
+def serve(host='127.0.0.1', port=8000):
+    """Answer HTTP requests until interrupted."""
+    with Server((host, port)) as server:
+        server.activities.get()
+        host, port = server.server_address[:2]
+        print(f"Serving activities on http://{host}:{port}/activities, stop with Ctrl+C",
+              flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,106 @@
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+# timings of the current run, None unless enabled by --timings
+_timings = None
+
+
+class Timings:
+    """Wall time of the stages of a run, rows passing each filter and HTTP requests made.
+    Stages nest, each is listed under the stage it started in."""
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.stages = []
+        self.depth = 0
+        self.filters = {}
+        self.requests = []
+
+    @contextmanager
+    def stage(self, name):
+        # listed in the order stages start, filled in when they end
+        entry = [self.depth, name, None]
+        self.stages.append(entry)
+        self.depth += 1
+        start = self.clock()
+        try:
+            yield
+        finally:
+            entry[2] = self.clock() - start
+            self.depth -= 1
+
+    def filtered(self, label, rows_in, rows_out):
+        """Count rows in and out of a filter, filters applied in chunks add up."""
+        counts = self.filters.setdefault(label, [0, 0])
+        counts[0] += rows_in
+        counts[1] += rows_out
+
+    def request(self, method, url, status, seconds):
+        self.requests.append((method, url, status, seconds))
+
+    def report(self, file=None):
+        file = file or sys.stderr
+        print("Stages", file=file)
+        for depth, name, seconds in self.stages:
+            print(f"  {'  ' * depth}{name:<{32 - 2 * depth}} {seconds * 1000:10.1f} ms", file=file)
+        if self.filters:
+            print(f"Filters {'rows in':>45} {'rows out':>10}", file=file)
+            for label, (rows_in, rows_out) in self.filters.items():
+                print(f"  {label:<40} {rows_in:>10} {rows_out:>10}", file=file)
+        if self.requests:
+            latencies = [seconds * 1000 for _, _, _, seconds in self.requests]
+            print(f"HTTP requests: {len(latencies)}, total {sum(latencies):.1f} ms, "
+                  f"mean {sum(latencies) / len(latencies):.1f} ms, "
+                  f"max {max(latencies):.1f} ms", file=file)
+            for method, url, status, seconds in self.requests:
+                print(f"  {method} {url} {status} {seconds * 1000:.1f} ms", file=file)
+
+
+def enable(clock=time.perf_counter):
+    """Start collecting timings of this run."""
+    global _timings
+    _timings = Timings(clock)
+    return _timings
+
+
+def disable():
+    global _timings
+    _timings = None
+
+
+def enabled():
+    return _timings is not None
+
+
+def stage(name):
+    """Context manager timing a stage of the run, does nothing unless enabled."""
+    return _timings.stage(name) if _timings else nullcontext()
+
+
+def filtered(label, rows_in, rows_out):
+    if _timings:
+        _timings.filtered(label, rows_in, rows_out)
+
+
+def request(method, url, status, seconds):
+    """Hook called by the API clients after every HTTP request."""
+    if _timings:
+        _timings.request(method, url, status, seconds)
+
+
+def report(file=None):
+    if _timings:
+        _timings.report(file)
+
+
+@contextmanager
+def profile(path):
+    """cProfile everything run within, stats are dumped to path for pstats or snakeviz."""
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
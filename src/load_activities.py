@@ -1,18 +1,68 @@
-import json
-import os
-
-from src import ACTIVITIES_DIR
-
-
-def load():
-    if (not os.path.exists(ACTIVITIES_DIR) or
-            len(os.listdir(ACTIVITIES_DIR)) == 0):
-        raise FileNotFoundError('activities directory empty or does not exist.')
-    files = os.listdir(ACTIVITIES_DIR)
-    data = []
-    for file in files:
-        file = os.path.join(ACTIVITIES_DIR, file)
-        with open(file, 'r') as f:
-            activities = json.load(f)
-        data.extend(activities)
-    return data
+from src import instrument, snapshot, store
+from src.query import execute, execute_table, stream
+
+
+def open_store():
+    """Connection to a store holding activities, nothing is created on a fresh install."""
+    if not store.exists():
+        raise FileNotFoundError('activity store empty, run the download command first.')
+    conn = store.connect()
+    if store.count(conn) == 0:
+        conn.close()
+        raise FileNotFoundError('activity store empty, run the download command first.')
+    return conn
+
+
+def load(where=None, params=()):
+    """Load activities from the local store, optionally narrowed by an SQL condition."""
+    conn = open_store()
+    try:
+        return store.select(conn, where, params)
+    finally:
+        conn.close()
+
+
+def query(plan):
+    """Load activities selected by a query plan.
+    Runs in memory on the snapshot when it is up to date, on the store otherwise."""
+    with instrument.stage('load snapshot'):
+        table = snapshot.load()
+    if table is not None:
+        return execute_table(plan, table)
+    conn = open_store()
+    try:
+        with instrument.stage('query store'):
+            return execute(plan, conn)
+    finally:
+        conn.close()
+
+
+def stream_query(plan):
+    """Lazily yield activities selected by a query plan, see query."""
+    with instrument.stage('load snapshot'):
+        table = snapshot.load()
+    if table is not None:
+        yield from execute_table(plan, table)
+        return
+    conn = open_store()
+    try:
+        yield from stream(plan, conn)
+    finally:
+        conn.close()
+
+
+def summarize(plan, periods):
+    """Stats of the activities selected by the plan for each (period, number of periods).
+    Served from the store rollups when the plan only filters by type and gear."""
+    from src.stats import period_stats, rollup_stats
+    if plan.uses_rollups():
+        conn = open_store()
+        try:
+            with instrument.stage('rollups'):
+                return [rollup_stats(conn, num_periods, period, plan.sql_where(), plan.params)
+                        for period, num_periods in periods]
+        finally:
+            conn.close()
+    data = query(plan)
+    with instrument.stage('stats'):
+        return [period_stats(data, num_periods, period) for period, num_periods in periods]
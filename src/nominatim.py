@@ -1,21 +1,70 @@
-import requests
+import time
 import xml.etree.ElementTree as ET
 
+import requests
+
+from src import instrument, store
+from src.api import TokenBucket
+
+URL = "https://nominatim.openstreetmap.org/reverse"
+# grid cell size in degrees, roughly 1 km, activities starting in the same cell share a lookup
+GRID = 0.01
+# smaller places are named by the first of these present in the address
+CITY_FIELDS = ['city', 'town', 'village', 'municipality']
+
+# Nominatim usage policy allows at most one request per second
+limiter = TokenBucket(rate=1, capacity=1)
+
 
-def get_location(lat: float, lon: float) -> tuple[str, str]:
-    """Get country and city from coordinates using Nominatim. Request rates apply."""
-    url = "	https://nominatim.openstreetmap.org/reverse"
+def get_location(lat: float, lon: float, session=None) -> tuple[str, str]:
+    """Get country and city from coordinates using Nominatim. Request rates apply.
+    Either is None when Nominatim does not know it."""
+    limiter.acquire()
     params = {"lat": lat, "lon": lon}
     headers = {"user-agent": "strava-cli"}
-    response = requests.get(url=url, params=params, headers=headers)
+    start = time.perf_counter()
+    response = (session or requests).get(url=URL, params=params, headers=headers)
+    instrument.request('GET', URL, response.status_code, time.perf_counter() - start)
+    response.raise_for_status()
 
     xml_tree = ET.fromstring(response.content)
     address = xml_tree.find('addressparts')
-    country = address.find('country').text
-    city = address.find('city').text
+    if address is None:
+        return None, None
+    country = address.findtext('country')
+    city = next((address.findtext(field) for field in CITY_FIELDS
+                 if address.findtext(field)), None)
     return country, city
 
 
+def grid_cell(lat, lon):
+    return round(lat / GRID), round(lon / GRID)
+
+
+def cell_location(conn, cell, session=None):
+    """Country and city of a grid cell, from the store cache or looked up at its center."""
+    cached = store.cached_location(conn, cell)
+    if cached is not None:
+        return cached
+    country, city = get_location(cell[0] * GRID, cell[1] * GRID, session)
+    store.cache_location(conn, cell, country or '', city or '')
+    return country or '', city or ''
+
+
+def annotate(conn):
+    """Store country and city of all activities with start coordinates that lack them.
+    Nearby starts are looked up once, returns the number of annotated activities."""
+    cells = {}
+    for activity_id, lat, lon in store.ungeocoded(conn):
+        cells.setdefault(grid_cell(lat, lon), []).append(activity_id)
+    with requests.Session() as session:
+        for cell, ids in cells.items():
+            country, city = cell_location(conn, cell, session)
+            # saved per cell so an interrupted run keeps what it already looked up
+            store.set_locations(conn, [(country, city, activity_id) for activity_id in ids])
+    return sum(map(len, cells.values()))
+
+
 if __name__ == '__main__':
-    country, city = get_location()
+    country, city = get_location(41.98249167, 2.824075)
     print(country, city)
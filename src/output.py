@@ -0,0 +1,124 @@
+import csv
+import json
+import os
+import sys
+from itertools import islice
+
+from src import Attribute
+from src.utils import format_value, parse_datetime
+
+# flat columns of csv and parquet exports, values are kept in API units (m, s, m/s)
+EXPORT_COLUMNS = [
+    ('id', 'int'), ('name', 'str'), ('type', 'str'), ('sport_type', 'str'),
+    ('start_date', 'str'), ('start_date_local', 'str'), ('timezone', 'str'),
+    ('distance', 'float'), ('moving_time', 'int'), ('elapsed_time', 'int'),
+    ('total_elevation_gain', 'float'), ('average_speed', 'float'), ('max_speed', 'float'),
+    ('average_heartrate', 'float'), ('max_heartrate', 'float'), ('average_cadence', 'float'),
+    ('average_watts', 'float'), ('kilojoules', 'float'), ('gear_id', 'str'),
+    ('start_lat', 'float'), ('start_lng', 'float'), ('end_lat', 'float'), ('end_lng', 'float'),
+    ('kudos_count', 'int'), ('trainer', 'bool'), ('commute', 'bool'), ('manual', 'bool'),
+    ('private', 'bool'),
+]
+BATCH_SIZE = 10000
+BUFFER_SIZE = 1 << 20
+
+PLAIN_COLUMNS = ['date', 'type', 'name'] + [attr for attr in Attribute.__members__
+                                            if attr != 'date'] + ['url']
+
+
+def plain_row(activity):
+    """Activity attributes formatted for reading, in the order of PLAIN_COLUMNS."""
+    # keep one activity per line even for names with tabs or line breaks
+    name = ' '.join(activity['name'].split())
+    row = [str(parse_datetime(activity['start_date_local'])), activity['type'], name]
+    for attr in PLAIN_COLUMNS[3:-1]:
+        value = activity.get(Attribute[attr].value)
+        row.append('' if value is None else str(format_value(Attribute[attr].value, value)))
+    row.append(f"https://strava.com/activities/{activity['id']}")
+    return row
+
+
+def plain_print(data, file=None):
+    """Print activities as tab separated lines without any markup."""
+    file = file or sys.stdout
+    file.write('\t'.join(PLAIN_COLUMNS) + '\n')
+    for activity in data:
+        file.write('\t'.join(plain_row(activity)) + '\n')
+
+
+def json_print(data, file=None):
+    """Print activities as a JSON array of the original API objects."""
+    file = file or sys.stdout
+    file.write('[')
+    for index, activity in enumerate(data):
+        file.write((', ' if index else '') + json.dumps(activity))
+    file.write(']\n')
+
+
+def ndjson_print(data, file=None):
+    """Print activities as newline delimited JSON, one API object per line."""
+    file = file or sys.stdout
+    for activity in data:
+        file.write(json.dumps(activity) + '\n')
+
+
+def export_row(activity):
+    """Activity flattened into values of EXPORT_COLUMNS."""
+    start = activity.get('start_latlng') or [None, None]
+    end = activity.get('end_latlng') or [None, None]
+    coordinates = {'start_lat': start[0], 'start_lng': start[1],
+                   'end_lat': end[0], 'end_lng': end[1]}
+    return [coordinates[column] if column in coordinates else activity.get(column)
+            for column, _ in EXPORT_COLUMNS]
+
+
+def csv_print(data, file=None):
+    """Print activities as CSV with a header of EXPORT_COLUMNS."""
+    writer = csv.writer(file or sys.stdout)
+    writer.writerow(column for column, _ in EXPORT_COLUMNS)
+    writer.writerows(map(export_row, data))
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parquet_print(data, file=None):
+    """Write activities as a Parquet file, columns of EXPORT_COLUMNS in batches of rows."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet output requires pyarrow: pip install pyarrow") from e
+    types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string(), 'bool': pa.bool_()}
+    schema = pa.schema([(column, types[kind]) for column, kind in EXPORT_COLUMNS])
+    with pq.ParquetWriter(file or sys.stdout.buffer, schema) as writer:
+        for batch in batches(map(export_row, data), BATCH_SIZE):
+            arrays = [pa.array(values, type=field.type)
+                      for values, field in zip(zip(*batch), schema)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+
+
+WRITERS = {'plain': plain_print, 'json': json_print, 'ndjson': ndjson_print,
+           'csv': csv_print, 'parquet': parquet_print}
+BINARY_FORMATS = {'parquet'}
+
+
+def write(output_format, data, path=None):
+    """Write activities as they come to a file or stdout, stops quietly when the reader
+    goes away, e.g. strava-cli --format plain | head."""
+    writer = WRITERS[output_format]
+    if path:
+        binary = output_format in BINARY_FORMATS
+        with open(path, 'wb' if binary else 'w', buffering=BUFFER_SIZE,
+                  **({} if binary else {'newline': '', 'encoding': 'utf-8'})) as f:
+            writer(data, f)
+        return
+    try:
+        writer(data)
+        sys.stdout.flush()
+    except BrokenPipeError:
+        # python flushes stdout on exit again, point it somewhere harmless
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
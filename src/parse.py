@@ -1,20 +1,38 @@
-from src import ActivityType, Attribute
-from src.authorize import authorize
-from src.commands import list_gear
-from src.get_data import download
-from src.load_activities import load
-from src.printer import pprint, weekly_table, print_gears
-from src.utils import pace_from_string, strip_accents, \
-    format_value, timedelta_from_string, add_pace_attribute
+from src import ActivityType, Attribute, instrument
+from src.utils import fold, pace_from_string, timedelta_from_string
 
 import datetime
-import re
-from argparse import ArgumentParser, RawTextHelpFormatter
+import sys
+from argparse import ArgumentParser, ArgumentTypeError, RawTextHelpFormatter
+
+
+# km around --near coordinates when --radius isn't given
+DEFAULT_RADIUS = 5
+
+
+def parse_filter_value(value, attribute):
+    try:
+        if attribute == "start_date_local":
+            return datetime.datetime.strptime(value, '%Y-%m-%d').date()
+        elif attribute == "average_pace":
+            return pace_from_string(value)
+        elif attribute == "moving_time":
+            return timedelta_from_string(value)
+        return float(value)
+    except ValueError:
+        raise ValueError(f'Specified value: {value} is not correct.')
 
 
 def validate_attr_filter(filtr, attribute):
     """Make sure that attribute based filter specified by user is in correct format.
-    (symbol:value) where symbol is from [>, <, ==, <=, >=] and value is float or pace[mm:ss]."""
+    (symbol:value) where symbol is from [>, <, ==, <=, >=] and value is float or pace[mm:ss],
+    or an inclusive range 'low..high' where either side may be left out."""
+    if ' ' not in filtr and '..' in filtr:
+        low, high = filtr.split('..', 1)
+        if not low and not high:
+            raise ValueError(f"Incorrect range specified: {filtr}")
+        return {'symbol': '..', 'value': tuple(parse_filter_value(value, attribute) if value
+                                               else None for value in (low, high))}
     try:
         symbol, value = filtr.split(' ')
     except ValueError:
@@ -22,58 +40,33 @@ def validate_attr_filter(filtr, attribute):
                          f"maybe a missing space between symbol and value")
     if symbol not in ['>', '<', '==', '>=', '<=']:
         raise ValueError(f'Incorrect equality symbol: {symbol}.')
-    try:
-        if attribute == "start_date_local":
-            value = datetime.datetime.strptime(value, '%Y-%m-%d').date()
-        elif attribute == "average_pace":
-            value = pace_from_string(value)
-        elif attribute == "moving_time":
-            value = timedelta_from_string(value)
-        else:
-            value = float(value)
-    except ValueError:
-        raise ValueError(f'Specified value: {value} is not correct.')
-    return {'symbol': symbol, 'value': value}
+    return {'symbol': symbol, 'value': parse_filter_value(value, attribute)}
 
 
 def generate_condition(value, filtr):
-    """"""
-    if filtr['symbol'] == '>':
-        return value > filtr['value']
-    elif filtr['symbol'] == '>=':
-        return value >= filtr['value']
-    elif filtr['symbol'] == '==':
-        return value == filtr['value']
-    elif filtr['symbol'] == '<=':
-        return value <= filtr['value']
-    elif filtr['symbol'] == '<':
-        return value < filtr['value']
+    """Compare value with a validated filter."""
+    from src.predicates import OPERATORS
+    return OPERATORS[filtr['symbol']](value, filtr['value'])
 
 
 def apply_attr_filters(data, attribute, filtr):
     """Filter activities by specified attribute filters.
     E.g.: attribute 'distance', filter: '> 10'."""
-    filtered_data = []
-    for activity in data:
-        if attribute not in Attribute.list():
-            raise KeyError("Incorrect attribute specified.")
-        try:
-            value = format_value(attribute, activity[attribute])
-        except KeyError:
-            continue
-        if generate_condition(value, filtr):
-            filtered_data.append(activity)
-    return filtered_data
+    from src.table import as_table, attribute_mask
+    table = as_table(data)
+    return table.take(attribute_mask(table, attribute, filtr['symbol'], filtr['value'])).rows
 
 
 def filter_activity_types(data, types):
     """Filter list of activities by specific activity types, one or more."""
-    data = [activity for activity in data if activity['type'].lower() in types]
-    return data
+    from src.table import as_table
+    table = as_table(data)
+    return table.take(table.code_mask('type', [value for value in table.dictionaries['type']
+                                               if value and value.lower() in types])).rows
 
 
-def sort_by_attr(data, sort_arg):
-    """Sort activities by specified attribute and order in format 'attribute:[asc/desc]'."""
+def parse_sort_arg(sort_arg):
+    """Split sorting argument 'attribute:[asc/desc]' into API attribute and reverse flag."""
     if ':' not in sort_arg:
         raise ValueError("Sorting argument should be in format 'attribute:[asc/desc]'")
     attribute, order = sort_arg.split(':')
@@ -83,65 +76,205 @@ def sort_by_attr(data, sort_arg):
         attribute = Attribute[attribute].value
     except KeyError as e:
         raise KeyError(f"Incorrect attribute specified in sortby: {attribute}") from e
-    reverse_order = (order.lower() == 'desc')
-    # remove data with missing attribute
-    data = [activity for activity in data if activity.get(attribute)]
-    data = sorted(data, key=lambda x: x[attribute], reverse=reverse_order)
-    return data
+    return attribute, order.lower() == 'desc'
+
+
+def parse_sort_args(sort_args):
+    """Split comma separated sorting arguments, e.g. 'distance:desc,date:asc'."""
+    return [parse_sort_arg(sort_arg) for sort_arg in sort_args.split(',')]
+
+
+def sort_by_attr(data, sort_arg):
+    """Sort activities by specified attribute and order in format 'attribute:[asc/desc]',
+    more attributes separated by commas break ties."""
+    keys = parse_sort_args(sort_arg)
+    from src.table import as_table, top_order
+    # activities with missing first attribute are left out
+    table = as_table(data)
+    return table.take(top_order(table, keys)).rows
 
 
 def match_field(data, pattern, field):
     """Filter list of activities by matching a part or the whole field of activity."""
-    filtered_data = []
-    for activity in data:
-        stripped = strip_accents(activity[field])
-        if re.search(pattern, stripped, flags=re.IGNORECASE):
-            filtered_data.append(activity)
-    return filtered_data
+    from src.search import NameIndex
+    from src.table import as_table
+    table = as_table(data)
+    index = table.name_index() if field == 'name' else NameIndex(row[field] for row in table)
+    return table.take(index.mask(pattern)).rows
 
 
 def query_gear_by_name(gear_name):
     """Query gear by name. Improved matching without accents and case.
     Returns None if no gear found."""
-    bikes, shoes = list_gear()
-    all_gear = bikes + shoes
-    for gear in all_gear:
-        stripped_gear = strip_accents(gear['name'])
-        if re.search(gear_name, stripped_gear, flags=re.IGNORECASE):
-            return gear
-    return None
+    from src.commands import gear_index
+    index, gears = gear_index()
+    matches = index.search(gear_name)
+    return gears[matches[0]] if len(matches) else None
+
+
+def build_query_plan(args, gear=None):
+    """Compile parsed cli arguments into a single query plan.
+    Type, gear, place, name and attribute filters and ordering are pushed down to the store,
+    only the distance from coordinates is checked after loading."""
+    from src.query import QueryPlan
+    from src.predicates import compile_filter
+    from src.table import name_mask
+    plan = QueryPlan()
+
+    if args.type:
+        types = [t.value for t in ActivityType if t.value.lower() in args.type]
+        plan.where(f"type IN ({', '.join('?' * len(types))})", *types,
+                   mask=lambda table: table.code_mask('type', types), rollup=True)
+
+    if args.gear:
+        gear_id = gear['id'] if gear else None
+        plan.where('gear_id = ?', gear_id,
+                   mask=lambda table: table.code_mask('gear_id', [gear_id] if gear_id else []),
+                   rollup=True)
+
+    for column in ['country', 'city']:
+        place = getattr(args, column)
+        if place:
+            plan.where(f'fold({column}) = ?', fold(place),
+                       mask=lambda table, column=column, place=place:
+                       table.place_mask(column, place))
+
+    if args.radius is not None and not args.near:
+        raise ValueError('--radius needs --near coordinates')
+    if args.near:
+        from src.spatial import near_mask, parse_coordinates
+        lat, lon = parse_coordinates(args.near)
+        radius = args.radius or DEFAULT_RADIUS
+        plan.filter(lambda table: near_mask(table, lat, lon, radius),
+                    label=f'near {lat},{lon} within {radius} km')
+
+    if args.name:
+        # names are stored accent stripped, see store.to_row
+        name = args.name
+        plan.where('name_norm REGEXP ?', name, mask=lambda table: name_mask(table, name))
+
+    for attribute, filters in vars(args).items():
+        # skip if filter not specified or not attribute filter [dist, elev, hr, ..]
+        if filters is None or attribute not in Attribute.__members__:
+            continue
+        attribute = Attribute[attribute].value
+        for filtr in filters:
+            filtr = validate_attr_filter(filtr, attribute)
+            predicate = compile_filter(attribute, filtr['symbol'], filtr['value'])
+            condition, params = predicate.sql()
+            plan.where(condition, *params, mask=predicate.mask)
+
+    if args.sortby:
+        for attribute, reverse_order in parse_sort_args(args.sortby):
+            # pace is stored as speed, see add_pace_attribute
+            plan.sort_by('average_speed' if attribute == 'average_pace' else attribute,
+                         reverse_order)
+
+    plan.limit = args.limit
+    return plan
 
 
-def parse_cli_args():
+def positive(number_type):
+    """Argument type accepting only positive numbers of number_type."""
+    def parse(value):
+        try:
+            number = number_type(value)
+        except ValueError:
+            raise ArgumentTypeError(f'invalid {number_type.__name__} value: {value!r}')
+        if number <= 0:
+            raise ArgumentTypeError(f'{value} is not a positive number')
+        return number
+    return parse
+
+
+def cli_parser():
     argparser = ArgumentParser(description=f"""Filter strava activities by your parameters.
 All attribute filters are specified as \"symbol value\" \
-string where symbol is one of [>, <, ==, >=, <=]
+string where symbol is one of [>, <, ==, >=, <=], or as an inclusive range \"low..high\"
 Available attributes to filter by: {list(Attribute.__members__)}
 Available activity types: {[act.value for act in ActivityType]}""",
                                formatter_class=RawTextHelpFormatter)
     subparser = argparser.add_subparsers(title="Subcommands", dest="subcommand",
                                          help="Available subcommands")
     subparser.add_parser("authorize", help="Authorize app to access data")
-    subparser.add_parser("download", help="Download activity data")
-    subparser.add_parser("list-gear", help="List bikes and shoes of authenticated user")
+    download_parser = subparser.add_parser("download", help="Download activity data")
+    download_parser.add_argument('--full', action='store_true',
+                                 help='discard local activities and download all of them again')
+    download_parser.add_argument('--geocode', action='store_true',
+                                 help='look up country and city of activities from their start, '
+                                      'about one second per new place')
+    download_parser.add_argument('--streams', action='store_true',
+                                 help='also download GPS, heartrate, power and cadence samples '
+                                      'of activities, one request per activity')
+    bests_parser = subparser.add_parser("bests",
+                                        help="Best efforts of activities with downloaded streams, "
+                                             "selected by the filters given before bests")
+    bests_parser.add_argument('--top', type=int, default=1,
+                              help='number of best activities listed for each effort')
+    routes_parser = subparser.add_parser("routes",
+                                         help="Group activities with a map that follow the same "
+                                              "route, selected by the filters given before routes")
+    routes_parser.add_argument('--like', type=int, metavar='ID',
+                               help='list activities on the same route as the activity with id')
+    routes_parser.add_argument('--min-count', type=int, default=2,
+                               help='least number of activities of a listed route, 2 by default')
+    serve_parser = subparser.add_parser("serve",
+                                        help="Keep activities in memory and answer queries of "
+                                             "other strava-cli calls on a unix socket")
+    serve_parser.add_argument('--socket', type=str, metavar='PATH',
+                              help='socket to listen on, queries look for the default one')
+    subparser.add_parser("shell", help="Interactive prompt for running queries one by one "
+                                       "on activities kept in memory")
+    http_parser = subparser.add_parser("http", help="Serve activities and stats as JSON over "
+                                                    "HTTP, filtered by query parameters")
+    http_parser.add_argument('--host', type=str, default='127.0.0.1',
+                             help='address to listen on, 127.0.0.1 by default')
+    http_parser.add_argument('--port', type=int, default=8000,
+                             help='port to listen on, 8000 by default, 0 picks a free one')
+    gear_parser = subparser.add_parser("list-gear",
+                                       help="List bikes and shoes of authenticated user")
+    gear_parser.add_argument('--refresh', action='store_true',
+                             help='fetch gear from Strava instead of the local cache')
     basic_group = argparser.add_argument_group('Basic filters')
     basic_group.add_argument('--name', type=str,
                              help='filter by keywords present in activity name')
     basic_group.add_argument('--type', type=str.lower,
                              choices=[t.value.lower() for t in ActivityType],
                              help='filter by specific activity type', nargs='*', action='extend')
-    basic_group.add_argument('-l', '--limit', type=int,
+    basic_group.add_argument('-l', '--limit', type=positive(int),
                              help='limit output to number of results')
     basic_group.add_argument('--sortby', type=str,
                              help="Sort by specific attribute and order: "
-                                  "'attribute_name:[desc/asc]'")
-    basic_group.add_argument('--weekly', type=int,
+                                  "'attribute_name:[desc/asc]', more attributes separated by "
+                                  "commas break ties, e.g.: 'distance:desc,date:asc'")
+    basic_group.add_argument('--weekly', type=positive(int),
                              help="Print weekly statistics")
+    basic_group.add_argument('--monthly', type=positive(int),
+                             help="Print monthly statistics")
+    basic_group.add_argument('--yearly', type=positive(int),
+                             help="Print yearly statistics")
     basic_group.add_argument('--gear', type=str,
                              help='filter by name of a gear used in the activity')
+    basic_group.add_argument('--format', type=str,
+                             choices=['rich', 'plain', 'json', 'ndjson', 'csv', 'parquet'],
+                             default='rich', help='output format of the listed activities, '
+                                                  'all but rich are streamed, csv and parquet '
+                                                  'keep API units (m, s, m/s)')
+    basic_group.add_argument('-o', '--output', type=str,
+                             help='write activities to a file instead of the terminal')
+    place_group = argparser.add_argument_group('Location filters')
+    place_group.add_argument('--near', type=str, metavar='LAT,LON',
+                             help='filter by activities starting near coordinates, '
+                                  'e.g.: \'49.19,16.61\'')
+    place_group.add_argument('--radius', type=positive(float), metavar='KM',
+                             help='distance from --near coordinates[km], 5 by default')
+    place_group.add_argument('--country', type=str,
+                             help='filter by country of activity start, needs download --geocode')
+    place_group.add_argument('--city', type=str,
+                             help='filter by city of activity start, needs download --geocode')
     attr_group = argparser.add_argument_group('Attribute filters')
     attr_group.add_argument('-dis', '--distance', type=str, nargs='*', action='extend',
-                            help='set the distance filters[km], e.g.: \'> 90\'')
+                            help='set the distance filters[km], e.g.: \'> 90\' or \'10..42\'')
     attr_group.add_argument('-dat', '--date', type=str, nargs='*', action='extend',
                             help='set the date filters[YYYY-MM-DD], e.g.: \'> 2023-12-06\'')
     attr_group.add_argument('-eg', '--elevation_gain', type=str, nargs='*', action='extend',
@@ -154,57 +287,153 @@ Available activity types: {[act.value for act in ActivityType]}""",
                             help='set the moving time filter[s], e.g.: \'< 3600\'')
     attr_group.add_argument('-pc', '--average_pace', type=str, nargs='*', action='extend',
                             help='set the average pace filter[mm:ss/km], e.g.: \'< 05:30\'')
+    diagnostics_group = argparser.add_argument_group('Diagnostics')
+    diagnostics_group.add_argument('--timings', action='store_true',
+                                   help='report time spent in each stage, rows passing each '
+                                        'filter and HTTP requests made, on stderr')
+    diagnostics_group.add_argument('--profile', type=str, metavar='FILE',
+                                   help='write a cProfile of the run to a file, '
+                                        'e.g.: \'out.prof\'')
+
+    return argparser
+
 
-    return argparser.parse_args()
+def parse_cli_args(argv=None):
+    return cli_parser().parse_args(argv)
+
+
+def like_missing_reason(activity_id, activities):
+    """Why routes --like found no route of the activity among the selected activities."""
+    if any(activity['id'] == activity_id for activity in activities):
+        return f"Activity {activity_id} has no map to compare routes with."
+    from src.load_activities import load
+    if load('id = ?', (activity_id,)):
+        return f"Activity {activity_id} is left out by the filters."
+    return f"Activity {activity_id} isn't among the downloaded activities."
+
+
+def print_activities(args, activities):
+    """Print activities in the output format and destination given by the cli arguments."""
+    with instrument.stage('output'):
+        if args.format == 'rich' and not args.output:
+            from src.printer import pprint
+            pprint(activities)
+            return
+        from src.output import write
+        # rich markup makes no sense in a file, fall back to plain text
+        output_format = 'plain' if args.format == 'rich' else args.format
+        write(output_format, activities, args.output)
 
 
 def main():
     args = parse_cli_args()
+    if not (args.timings or args.profile):
+        from src.daemon import QUERY_COMMANDS, forward
+        # answered by strava-cli serve when it runs, without loading anything here
+        if args.subcommand in QUERY_COMMANDS and forward(sys.argv[1:]):
+            return
+    run(args)
+
+
+def run(args):
+    """Run the command given by parsed cli arguments, timed or profiled when asked to."""
+    if args.timings:
+        instrument.enable()
+    try:
+        if args.profile:
+            with instrument.profile(args.profile):
+                dispatch(args)
+        else:
+            dispatch(args)
+    finally:
+        instrument.report()
+        instrument.disable()
+
+
+def dispatch(args):
+    # subcommands import their dependencies on demand to keep the startup fast,
+    # e.g. local queries don't need requests and plain output doesn't need rich
     if args.subcommand == 'authorize':
+        from src.authorize import authorize
         authorize()
         return
     elif args.subcommand == 'download':
-        download()
+        from src.get_data import download
+        download(full=args.full, geocode=args.geocode, streams=args.streams)
+        return
+    elif args.subcommand == 'serve':
+        from src.daemon import serve
+        serve(args.socket)
+        return
+    elif args.subcommand == 'http':
+        from src.http_api import serve
+        serve(args.host, args.port)
+        return
+    elif args.subcommand == 'shell':
+        from src.shell import shell
+        shell()
         return
     elif args.subcommand == 'list-gear':
-        bikes, shoes = list_gear()
+        from src.commands import ATHLETE_TTL, list_gear
+        from src.printer import print_gears
+        bikes, shoes = list_gear(max_age=0 if args.refresh else ATHLETE_TTL)
         print_gears(bikes, shoes)
         return
 
-    data = load()
-    data = add_pace_attribute(data)
-
-    if args.name:
-        data = match_field(data, args.name, 'name')
-
-    if args.type:
-        data = filter_activity_types(data, args.type)
-
-    if args.gear:
-        if gear := query_gear_by_name(args.gear):
-            data = [x for x in data if x['gear_id'] == gear['id']]
-        else:
-            data = []
-
-    for attribute, filters in vars(args).items():
-        # skip if filter not specified or not attribute filter [dist, elev, hr, ..]
-        if filters is None or attribute not in Attribute.__members__:
-            continue
-        attribute = Attribute[attribute].value
-        filters = [validate_attr_filter(filtr, attribute) for filtr in filters]
-        for filtr in filters:
-            data = apply_attr_filters(data, attribute, filtr)
+    with instrument.stage('gear lookup'):
+        gear = query_gear_by_name(args.gear) if args.gear else None
+    with instrument.stage('query plan'):
+        plan = build_query_plan(args, gear)
 
-    if args.sortby:
-        data = sort_by_attr(data, args.sortby)
+    if args.subcommand == 'bests':
+        from src.bests import history_bests, load_bests
+        from src.load_activities import query
+        from src.printer import bests_table
+        activities = list(query(plan))
+        with instrument.stage('bests'):
+            bests = load_bests(activity['id'] for activity in activities)
+            ranking = history_bests(activities, bests, args.top)
+        with instrument.stage('output'):
+            bests_table(ranking)
+        return
 
-    if args.limit:
-        data = data[0:args.limit]
+    if args.subcommand == 'routes':
+        from src.load_activities import query
+        from src.routes import cluster, load_routes
+        activities = list(query(plan))
+        with instrument.stage('routes'):
+            clusters = cluster(load_routes(activities))
+        if args.like is not None:
+            same_route = next((ids for ids in clusters if args.like in ids), None)
+            if same_route is None:
+                print(like_missing_reason(args.like, activities))
+                return
+            print_activities(args, [activity for activity in activities
+                                    if activity['id'] in same_route])
+            return
+        from src.printer import routes_table
+        by_id = {activity['id']: activity for activity in activities}
+        with instrument.stage('output'):
+            routes_table([[by_id[activity_id] for activity_id in ids] for ids in clusters
+                          if len(ids) >= args.min_count])
+        return
 
-    if args.weekly:
-        weekly_table(data, args.weekly)
+    periods = [(period, num_periods) for period, num_periods in
+               [('week', args.weekly), ('month', args.monthly), ('year', args.yearly)]
+               if num_periods]
+    if periods:
+        from src.load_activities import summarize
+        from src.printer import period_table
+        summaries = summarize(plan, periods)
+        with instrument.stage('output'):
+            for (period, _), stats in zip(periods, summaries):
+                period_table(stats, period)
+    elif args.format == 'rich' and not args.output:
+        from src.load_activities import query
+        print_activities(args, query(plan))
     else:
-        pprint(data)
+        from src.load_activities import stream_query
+        print_activities(args, stream_query(plan))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,129 @@
+import datetime
+import operator
+
+import numpy as np
+
+from src import Attribute
+from src.table import display_units
+
+OPERATORS = {'>': operator.gt, '>=': operator.ge, '==': operator.eq,
+             '<=': operator.le, '<': operator.lt}
+SQL_OPERATORS = {operator.gt: '>', operator.ge: '>=', operator.le: '<=', operator.lt: '<'}
+# comparisons of a decreasing display value turned into comparisons of the raw value
+FLIPPED = {operator.ge: operator.le, operator.lt: operator.gt}
+# store and ActivityTable column holding each attribute, pace is derived from speed
+COLUMNS = {attribute: attribute for attribute in Attribute.list()}
+COLUMNS['average_pace'] = 'average_speed'
+DECIMALS = {'distance': 2, 'average_speed': 2}
+GUESS = {'distance': lambda target: (target - 0.005) * 1000,
+         'average_speed': lambda target: (target - 0.005) / 3.6,
+         # pace in seconds per km of speed in m/s, negated so that it grows with the raw value
+         'average_pace': lambda target: -1000 / target}
+DAY = np.timedelta64(1, 'D')
+
+
+def first_raw(attribute, guess, target):
+    """Smallest raw value displayed as at least target, searched from a close guess.
+    Rounding moves the exact boundary a few ulps away from the inverse conversion."""
+    def display(raw):
+        return display_units(attribute, -raw if attribute == 'average_pace' else raw)
+    raw = np.float64(guess)
+    while display(raw) >= target:
+        raw = np.nextafter(raw, -np.inf)
+    while display(raw) < target:
+        raw = np.nextafter(raw, np.inf)
+    return raw
+
+
+def displayed_above(attribute, value, strict):
+    """Smallest value that can be displayed and is at least, or above when strict, value."""
+    if attribute == 'average_pace':
+        return np.floor(value) + 1 if strict else np.ceil(value)
+    decimals = DECIMALS[attribute]
+    target = np.round(value, decimals)
+    if target < value or (strict and target == value):
+        target = np.round(target + 10.0 ** -decimals, decimals)
+    return target
+
+
+def raw_bounds(attribute, value):
+    """Raw bounds (low, high) of a displayed value, rows display at least value exactly
+    when their raw value >= low and above value when raw value >= high."""
+    if attribute == 'start_date_local':
+        low = np.datetime64(value, 'D')
+        return low.astype('datetime64[s]'), (low + DAY).astype('datetime64[s]')
+    if attribute not in GUESS:
+        # displayed as is
+        return value, np.nextafter(value, np.inf)
+    bounds = []
+    for strict in (False, True):
+        target = displayed_above(attribute, value, strict)
+        if attribute == 'average_pace' and target <= 0:
+            bounds.append(np.float64(-np.inf))
+        else:
+            bounds.append(first_raw(attribute, GUESS[attribute](target), target))
+    return tuple(bounds)
+
+
+def raw_value(value):
+    """Filter value in the units of ActivityTable.formatted."""
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    return value
+
+
+class Predicate:
+    """Filter on one attribute compiled into comparisons of its raw column with bounds
+    already converted to API units, so rows are never converted for comparing."""
+    def __init__(self, column, comparisons, zero=None):
+        self.column = column
+        self.comparisons = comparisons
+        # set for pace, rows with zero speed are displayed as zero pace
+        self.zero = zero
+
+    def mask(self, table):
+        values = table.columns[self.column]
+        mask = np.ones(len(values), dtype=bool)
+        for compare, bound in self.comparisons:
+            mask &= compare(values, bound)
+        if self.zero is not None:
+            mask = (mask & (values > 0)) | ((values == 0) & self.zero)
+        return mask
+
+    def sql(self):
+        """Equivalent store condition with its parameters."""
+        condition = ' AND '.join(f'{self.column} {SQL_OPERATORS[compare]} ?'
+                                 for compare, _ in self.comparisons) or 'TRUE'
+        params = [str(bound.astype('datetime64[D]')) if isinstance(bound, np.datetime64)
+                  else float(bound) for _, bound in self.comparisons]
+        if self.zero is not None:
+            condition = f'{self.column} > 0 AND {condition}'
+            if self.zero:
+                condition = f'{condition} OR {self.column} = 0'
+        return condition, params
+
+
+def comparisons(symbol, low, high):
+    """Raw comparisons selecting rows displayed as symbol value, from raw_bounds of value."""
+    return {'>=': [(operator.ge, low)], '>': [(operator.ge, high)],
+            '<': [(operator.lt, low)], '<=': [(operator.lt, high)],
+            '==': [(operator.ge, low), (operator.lt, high)]}[symbol]
+
+
+def compile_filter(attribute, symbol, value):
+    """Compile a filter comparing the displayed attribute, e.g. distance > 10 [km].
+    A '..' symbol takes a (low, high) value, inclusive with None for an open side."""
+    if attribute not in COLUMNS:
+        raise KeyError("Incorrect attribute specified.")
+    filters = ([(symbol, raw_value(value))] if symbol != '..' else
+               [(limit_symbol, raw_value(limit)) for limit_symbol, limit
+                in zip(('>=', '<='), value) if limit is not None])
+    compiled = []
+    for filter_symbol, filter_value in filters:
+        compiled += comparisons(filter_symbol, *raw_bounds(attribute, filter_value))
+    if attribute != 'average_pace':
+        return Predicate(COLUMNS[attribute], compiled)
+    compiled = [(FLIPPED[compare], -bound) for compare, bound in compiled]
+    zero = all(OPERATORS[filter_symbol](0, filter_value)
+               for filter_symbol, filter_value in filters)
+    return Predicate(COLUMNS[attribute], compiled, zero)
@@ -1,15 +1,22 @@
+import datetime
+
 from src.utils import parse_datetime, format_value
-from src.stats import weekly_stats, generate_weekly_ranges
 from src import Attribute, Units
 
-from rich.console import Console
-from rich.table import Table
-
 MAIN_COLOR = "#C45016"
 SECOND_COLOR = "#C47C16"
 THIRD_COLOR = "#F5F2C1"
 
-console = Console()
+_console = None
+
+
+def get_console():
+    """Shared rich console, created on first use since importing rich is slow."""
+    global _console
+    if _console is None:
+        from rich.console import Console
+        _console = Console()
+    return _console
 
 
 def bold(text):
@@ -32,32 +39,49 @@ def color(text, color):
     return f"[{color}]{text}[/{color}]"
 
 
-def weekly_table(data, num_weeks=4):
-    ranges = generate_weekly_ranges(num_weeks)
-    stats = weekly_stats(data, num_weeks)
+def period_label(period_range, period):
+    if period == "week":
+        return (f"{period_range['start'].strftime('%d %b %Y')} - "
+                f"{period_range['end'].strftime('%d %b %Y')}")
+    elif period == "month":
+        return period_range['start'].strftime('%b %Y')
+    return period_range['start'].strftime('%Y')
+
+
+def period_table(stats, period="week"):
+    """Print stats of the most recent periods, the current one first."""
+    from rich.table import Table
+    from src.stats import generate_ranges
+    ranges = generate_ranges(len(stats), period)
 
     table = Table(show_header=True, header_style=f"bold {SECOND_COLOR}",
                   show_lines=True, row_styles=["dim", ""])
-    table.add_column("Week")
+    table.add_column(period.capitalize())
     table.add_column("Moving time")
     table.add_column("Distance")
     table.add_column("Elevation")
-    for week, stat in zip(ranges, stats):
-        table.add_row(f"{week['start'].strftime('%d %b %Y')} - {week['end'].strftime('%d %b %Y')}",
+    for period_range, stat in zip(ranges, stats):
+        table.add_row(period_label(period_range, period),
                       f"{stat['moving_time']} h",
                       f"{stat['covered_distance']} km",
                       f"{stat['covered_elevation']} m")
 
-    console.print(table)
+    get_console().print(table)
+
+
+def weekly_table(data, num_weeks=4):
+    from src.stats import weekly_stats
+    period_table(weekly_stats(data, num_weeks), "week")
 
 
 def pprint(data):
+    console = get_console()
     print(f"Total activities: {len(data)}")
     for activity in data:
         header = [
             bold(main_color(activity['name'])),
             bold(second_color(f"[{activity['type']}]")),
-            parse_datetime(activity['start_date_local'])
+            str(parse_datetime(activity['start_date_local']))
         ]
 
         stats = []
@@ -73,13 +97,56 @@ def pprint(data):
 
         url = third_color(f"https://strava.com/activities/{activity['id']}")  # noqa: E231
 
-        console.print(*header, highlight=False)
-        console.print(url)
-        console.print(*stats, highlight=False, sep='\n')
-        console.print('\n')
+        # single print per activity, rendering through rich is the slow part
+        console.print('\n'.join([' '.join(header), url, *stats, '\n']), highlight=False)
+
+
+def effort_value(name, value):
+    if name.endswith('power'):
+        return f"{value} W"
+    elif name.endswith('heartrate'):
+        return f"{value} bpm"
+    return str(datetime.timedelta(seconds=value))
+
+
+def bests_table(ranking):
+    """Print the best activities of each effort, see bests.history_bests."""
+    from rich.table import Table
+    table = Table(show_header=True, header_style=f"bold {SECOND_COLOR}",
+                  show_lines=True, row_styles=["dim", ""])
+    table.add_column("Effort")
+    table.add_column("Best")
+    table.add_column("Activity")
+    table.add_column("Date")
+    for name, efforts in ranking:
+        for value, activity in efforts:
+            table.add_row(name, effort_value(name, value), activity['name'],
+                          str(parse_datetime(activity['start_date_local']).date()))
+    get_console().print(table)
+
+
+def routes_table(routes):
+    """Print routes, each a list of its activities, with the most recent activity's name."""
+    from rich.table import Table
+    table = Table(show_header=True, header_style=f"bold {SECOND_COLOR}",
+                  show_lines=True, row_styles=["dim", ""])
+    table.add_column("Activities")
+    table.add_column("Route")
+    table.add_column("Distance")
+    table.add_column("Last")
+    table.add_column("Id")
+    for activities in routes:
+        last = max(activities, key=lambda activity: activity['start_date_local'])
+        distances = sorted(activity.get('distance') or 0 for activity in activities)
+        table.add_row(str(len(activities)), last['name'],
+                      f"{format_value('distance', distances[len(distances) // 2])} km",
+                      str(parse_datetime(last['start_date_local']).date()), str(last['id']))
+    get_console().print(table)
 
 
 def print_gears(bikes, shoes):
+    from rich.table import Table
+    console = get_console()
     table = Table(show_header=True, header_style=f"bold {SECOND_COLOR}",
                   show_lines=True, row_styles=["dim", ""])
     table.add_column("Bike")
@@ -0,0 +1,154 @@
+from itertools import islice
+
+import numpy as np
+
+from src import instrument, store
+from src.table import ActivityTable, top_order
+from src.utils import add_pace_attribute
+
+CHUNK_SIZE = 1000
+
+
+class QueryPlan:
+    """Filters, ordering and limit of a single query.
+    Conditions on indexed columns can be pushed down to the store as SQL and carry an
+    equivalent mask for running in memory, the remaining predicates map an ActivityTable
+    to a boolean mask."""
+    def __init__(self):
+        self.conditions = []
+        self.params = []
+        self.masks = []
+        self.rollup = []
+        self.predicates = []
+        self.predicate_labels = []
+        self.sort = []
+        self.limit = None
+
+    def where(self, condition, *params, mask, rollup=False):
+        """Add store condition, rollup marks conditions that only refer to type and gear_id."""
+        self.conditions.append(condition)
+        self.params.extend(params)
+        self.masks.append(mask)
+        self.rollup.append(rollup)
+        return self
+
+    def filter(self, predicate, label=None):
+        """Add predicate checked after loading, label names it in --timings."""
+        self.predicates.append(predicate)
+        self.predicate_labels.append(label or getattr(predicate, '__name__', 'filter'))
+        return self
+
+    def sort_by(self, column, reverse=False):
+        """Add sort key, rows equal in the previous keys are ordered by the next one."""
+        self.sort.append((column, reverse))
+        return self
+
+    def uses_rollups(self):
+        """Totals of the selected activities can be read from the store rollups."""
+        return (all(self.rollup) and not self.predicates and not self.sort and
+                self.limit is None)
+
+    def sql_where(self):
+        conditions = list(self.conditions)
+        # activities with missing or zero first sort attribute are left out, same as top_order
+        if self.sort:
+            column = self.sort[0][0]
+            conditions.append(f'{column} IS NOT NULL AND {column} != 0')
+        return ' AND '.join(f'({condition})' for condition in conditions) or None
+
+    def labels(self):
+        """Readable store conditions with their parameters, one for each mask."""
+        params = iter(self.params)
+        labels = []
+        for condition in self.conditions:
+            parts = condition.split('?')
+            labels.append(''.join(part + repr(next(params)) for part in parts[:-1]) + parts[-1])
+        return labels
+
+    def sql_order_by(self):
+        # same order as the activities in memory when not sorted, missing values of the
+        # keys breaking ties last
+        keys = [f"{column} {'DESC' if reverse else 'ASC'}{' NULLS LAST' if index else ''}"
+                for index, (column, reverse) in enumerate(self.sort)]
+        return ', '.join(keys + ['id'])
+
+
+def select(table, predicates, labels=()):
+    """Rows matching all predicates, rows passing each of them are counted for --timings."""
+    mask = np.ones(len(table), dtype=bool)
+    counting = instrument.enabled()
+    for predicate, label in zip(predicates, labels or ['filter'] * len(predicates)):
+        rows_in = np.count_nonzero(mask) if counting else 0
+        mask &= predicate(table)
+        if counting:
+            instrument.filtered(label, rows_in, np.count_nonzero(mask))
+    return table.take(mask)
+
+
+def limit(table, count):
+    if count is not None and len(table) > count:
+        return table.take(np.arange(count))
+    return table
+
+
+def count_store(plan, conn, rows_out):
+    """Count rows in and out of the conditions run by the store for --timings."""
+    if plan.conditions and instrument.enabled():
+        instrument.filtered(' AND '.join(plan.labels()), store.count(conn), rows_out)
+
+
+def execute(plan, conn, chunk_size=CHUNK_SIZE):
+    """Run the plan against the store and return the selected activities as an ActivityTable."""
+    if plan.predicates and plan.limit is not None:
+        # stop reading the store once enough activities passed the predicates
+        with instrument.stage('read and filter'):
+            return ActivityTable(list(stream(plan, conn, chunk_size)))
+    # the store can apply the limit itself only when there is nothing left to filter
+    sql_limit = None if plan.predicates else plan.limit
+    with instrument.stage('read store'):
+        activities = list(store.iterate(conn, plan.sql_where(), plan.params,
+                                        plan.sql_order_by(), sql_limit))
+    count_store(plan, conn, len(activities))
+    with instrument.stage('add pace'):
+        activities = add_pace_attribute(activities)
+    with instrument.stage('build table'):
+        table = ActivityTable(activities)
+    if plan.predicates:
+        with instrument.stage('filter'):
+            table = select(table, plan.predicates, plan.predicate_labels)
+    return limit(table, plan.limit)
+
+
+def stream(plan, conn, chunk_size=CHUNK_SIZE):
+    """Yield activities selected by the plan as they are read from the store.
+    Rows are filtered in chunks, ordering is left to the store."""
+    sql_limit = None if plan.predicates else plan.limit
+    activities = store.iterate(conn, plan.sql_where(), plan.params, plan.sql_order_by(),
+                               sql_limit)
+
+    read = 0
+
+    def matches():
+        nonlocal read
+        while chunk := list(islice(activities, chunk_size)):
+            read += len(chunk)
+            table = ActivityTable(add_pace_attribute(chunk))
+            yield from (select(table, plan.predicates, plan.predicate_labels)
+                        if plan.predicates else table)
+
+    try:
+        yield from islice(matches(), plan.limit)
+    finally:
+        count_store(plan, conn, read)
+
+
+def execute_table(plan, table):
+    """Run the plan on activities already held in memory."""
+    with instrument.stage('filter'):
+        table = select(table, plan.masks + plan.predicates,
+                       plan.labels() + plan.predicate_labels)
+    if plan.sort:
+        with instrument.stage('sort'):
+            # partial sort of the rows that can make it within the limit
+            return table.take(top_order(table, plan.sort, plan.limit))
+    return limit(table, plan.limit)
@@ -0,0 +1,156 @@
+import math
+import os
+import pickle
+import zlib
+
+import numpy as np
+
+from src import ROUTES_PATH
+from src.spatial import KM_PER_DEGREE
+
+# points of a downsampled route
+POINTS = 64
+# cell size of route signatures in degrees, about 500 m north-south
+CELL = 0.005
+# fraction of signature cells two routes must share to be compared point by point
+MIN_SHARED = 0.5
+# largest Hausdorff distance in metres of two rides of the same route
+TOLERANCE = 200
+# bump whenever the cached routes change their layout
+ROUTES_VERSION = 1
+
+
+def decode_polyline(text):
+    """Decode a Google encoded polyline into an array of (lat, lon) in degrees."""
+    chunks = np.frombuffer(text.encode('ascii'), dtype=np.uint8).astype(np.int64) - 63
+    if not len(chunks):
+        return np.empty((0, 2))
+    # each value is split into 5 bit chunks, least significant first, all but the last
+    # one flagged with 0x20
+    last = (chunks & 0x20) == 0
+    value_index = np.concatenate([[0], np.cumsum(last)[:-1]])
+    starts = np.flatnonzero(np.concatenate([[True], last[:-1]]))
+    shifts = 5 * (np.arange(len(chunks)) - starts[value_index])
+    values = np.bincount(value_index, weights=(chunks & 0x1f) << shifts).astype(np.int64)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+    return np.cumsum(deltas[:len(deltas) // 2 * 2].reshape(-1, 2), axis=0) / 1e5
+
+
+def project(points, lat):
+    """Equirectangular projection to metres around latitude, accurate over a route."""
+    scale = KM_PER_DEGREE * 1000
+    return np.column_stack([points[:, 1] * math.cos(math.radians(lat)), points[:, 0]]) * scale
+
+
+def downsample(points, count=POINTS):
+    """count points evenly spaced along the route."""
+    if len(points) < 2:
+        return points
+    steps = np.hypot(*np.diff(project(points, points[0, 0]), axis=0).T)
+    along = np.concatenate([[0], np.cumsum(steps)])
+    if along[-1] == 0:
+        return points[:1]
+    at = np.linspace(0, along[-1], count)
+    return np.column_stack([np.interp(at, along, points[:, 0]),
+                            np.interp(at, along, points[:, 1])])
+
+
+def signature(points):
+    """Grid cells the route passes through."""
+    cells = np.floor(points / CELL).astype(np.int64)
+    return set(zip(cells[:, 0].tolist(), cells[:, 1].tolist()))
+
+
+def hausdorff(a, b):
+    """Symmetric Hausdorff distance of two routes in metres."""
+    lat = a[0, 0]
+    a, b = project(a, lat), project(b, lat)
+    # the distance is at least the largest offset of the bounding boxes' sides
+    offset = max(np.abs(a.min(axis=0) - b.min(axis=0)).max(),
+                 np.abs(a.max(axis=0) - b.max(axis=0)).max())
+    if offset > TOLERANCE:
+        return offset
+    squared = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+    return float(np.sqrt(max(squared.min(axis=1).max(), squared.min(axis=0).max())))
+
+
+def read_cache(path=None):
+    try:
+        with open(path or ROUTES_PATH, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+    return cache['routes'] if cache.get('version') == ROUTES_VERSION else {}
+
+
+def write_cache(routes, path=None):
+    path = path or ROUTES_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'wb') as f:
+        pickle.dump({'version': ROUTES_VERSION, 'routes': routes}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f'{path}.tmp', path)
+
+
+def load_routes(activities, path=None):
+    """Downsampled routes by activity id of activities with a map.
+    Polylines are decoded only for activities that are new or changed since the last run."""
+    cache = read_cache(path)
+    routes = {}
+    changed = False
+    for activity in activities:
+        polyline = (activity.get('map') or {}).get('summary_polyline')
+        if not polyline:
+            continue
+        checksum = zlib.crc32(polyline.encode('ascii'))
+        cached = cache.get(activity['id'])
+        if cached is None or cached[0] != checksum:
+            cached = cache[activity['id']] = checksum, downsample(decode_polyline(polyline))
+            changed = True
+        if len(cached[1]) > 1:
+            routes[activity['id']] = cached[1]
+    if changed:
+        write_cache(cache, path)
+    return routes
+
+
+def candidates(signatures):
+    """Yield each route with the later routes sharing at least MIN_SHARED of their cells.
+    Shared cells with all other routes are counted at once from an inverted index."""
+    route_ids = list(signatures)
+    sizes = np.array([len(cells) for cells in signatures.values()])
+    index = {}
+    for position, cells in enumerate(signatures.values()):
+        for cell in cells:
+            index.setdefault(cell, []).append(position)
+    index = {cell: np.array(positions) for cell, positions in index.items()}
+    for position, (route_id, cells) in enumerate(signatures.items()):
+        shared = np.bincount(np.concatenate([index[cell] for cell in cells]),
+                             minlength=len(route_ids))
+        others = np.flatnonzero(shared >= MIN_SHARED * np.maximum(sizes, sizes[position]))
+        yield route_id, [route_ids[other] for other in others[others > position]]
+
+
+def cluster(routes):
+    """Group routes into clusters of the same route, largest first.
+    Candidates from the signatures are confirmed by their Hausdorff distance and joined
+    with union-find, pairs already in one cluster are not compared."""
+    parent = {route_id: route_id for route_id in routes}
+
+    def find(route_id):
+        while parent[route_id] != route_id:
+            parent[route_id] = parent[parent[route_id]]
+            route_id = parent[route_id]
+        return route_id
+
+    signatures = {route_id: signature(points) for route_id, points in routes.items()
+                  if len(points)}
+    for a, others in candidates(signatures):
+        for b in others:
+            root_a, root_b = find(a), find(b)
+            if root_a != root_b and hausdorff(routes[a], routes[b]) <= TOLERANCE:
+                parent[root_b] = root_a
+    clusters = {}
+    for route_id in routes:
+        clusters.setdefault(find(route_id), []).append(route_id)
+    return sorted(clusters.values(), key=len, reverse=True)
@@ -0,0 +1,67 @@
+from functools import reduce
+
+import numpy as np
+
+from src.utils import compile_pattern, strip_accents
+
+REGEX_CHARS = set('.^$*+?{}[]\\|()')
+EMPTY = np.array([], dtype=np.int64)
+
+
+def is_literal(pattern):
+    return not REGEX_CHARS.intersection(pattern)
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """Accent stripped names, normalized once, searched by regular expression.
+    Literal patterns are looked up in a trigram index instead, built by the second such
+    search so that only long running processes pay for it."""
+    def __init__(self, names):
+        self.names = [strip_accents(name or '') for name in names]
+        self.folded = [name.lower() for name in self.names]
+        self.postings = None
+        self.literal_searches = 0
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getstate__(self):
+        # the trigram index is cheaper to rebuild than to unpickle on every start
+        return {**self.__dict__, 'postings': None, 'literal_searches': 0}
+
+    def build_trigrams(self):
+        postings = {}
+        for row, name in enumerate(self.folded):
+            for gram in trigrams(name):
+                postings.setdefault(gram, []).append(row)
+        self.postings = {gram: np.array(rows, dtype=np.int64) for gram, rows in postings.items()}
+
+    def candidates(self, needle):
+        """Rows containing every trigram of needle, rarest trigram first."""
+        lists = sorted((self.postings.get(gram, EMPTY) for gram in trigrams(needle)), key=len)
+        return reduce(lambda rows, other: np.intersect1d(rows, other, assume_unique=True), lists)
+
+    def search(self, pattern):
+        """Rows whose name matches pattern ignoring case and accents, in ascending order."""
+        if not is_literal(pattern):
+            compiled = compile_pattern(pattern)
+            rows = [row for row, name in enumerate(self.names) if compiled.search(name)]
+            return np.array(rows, dtype=np.int64)
+        needle = strip_accents(pattern).lower()
+        self.literal_searches += 1
+        if len(needle) >= 3 and self.postings is None and self.literal_searches > 1:
+            self.build_trigrams()
+        if len(needle) >= 3 and self.postings is not None:
+            rows = self.candidates(needle)
+        else:
+            rows = range(len(self.folded))
+        return np.array([row for row in rows if needle in self.folded[row]], dtype=np.int64)
+
+    def mask(self, pattern):
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.search(pattern)] = True
+        return mask
@@ -0,0 +1,52 @@
+import cmd
+import shlex
+
+from src import snapshot
+from src.daemon import QUERY_COMMANDS
+from src.parse import parse_cli_args, run
+
+
+class Shell(cmd.Cmd):
+    """Interactive prompt taking the same arguments as strava-cli, one command per line.
+    Activities are loaded once and kept in memory for the whole session."""
+    intro = "Type strava-cli arguments, e.g. --type run --limit 5, help or exit."
+    prompt = 'strava-cli> '
+
+    def default(self, line):
+        try:
+            args = parse_cli_args(shlex.split(line))
+        except (SystemExit, ValueError):
+            # argparse already printed what is wrong, shlex fails on unbalanced quotes
+            return
+        if args.subcommand in ('serve', 'shell', 'http'):
+            print(f"{args.subcommand} can't be run from the shell")
+            return
+        try:
+            if args.subcommand in QUERY_COMMANDS:
+                snapshot.current()
+            run(args)
+        except Exception as e:
+            print(f"{type(e).__name__}: {e}")
+
+    def emptyline(self):
+        # don't repeat the last command
+        pass
+
+    def do_help(self, arg):
+        self.default('--help')
+
+    def do_exit(self, arg):
+        return True
+
+    do_quit = do_exit
+
+    def do_EOF(self, arg):
+        print()
+        return True
+
+
+def shell():
+    try:
+        Shell().cmdloop()
+    except KeyboardInterrupt:
+        print()
@@ -0,0 +1,73 @@
+import os
+import pickle
+
+from src import SNAPSHOT_PATH, STORE_PATH, store
+from src.table import ActivityTable, RawRows
+
+# bump whenever the layout of ActivityTable changes
+SNAPSHOT_VERSION = 3
+
+# tables loaded by this process by snapshot path, reused while neither file changes,
+# so long running processes like serve and shell keep the activities hot
+_loaded = {}
+
+
+def fingerprint(path):
+    """Identify the state of the activity store, changes whenever the store is written."""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def save(table, source, path=None):
+    path = path or SNAPSHOT_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    payload = {'version': SNAPSHOT_VERSION, 'source': source, 'raw': table.rows.raw,
+               'columns': table.columns, 'dictionaries': table.dictionaries,
+               'spatial': table.spatial_index(), 'names': table.name_index()}
+    # write aside and rename, so a reader never sees a partial snapshot
+    with open(f'{path}.tmp', 'wb') as f:
+        pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f'{path}.tmp', path)
+    _loaded[path] = (SNAPSHOT_VERSION, fingerprint(path), source), table
+
+
+def load(path=None, store_path=None):
+    """Activities from the snapshot, None if it is missing or older than the store."""
+    path, store_path = path or SNAPSHOT_PATH, store_path or STORE_PATH
+    if not os.path.exists(path) or not os.path.exists(store_path):
+        return None
+    key, table = _loaded.get(path, (None, None))
+    if key == (SNAPSHOT_VERSION, fingerprint(path), fingerprint(store_path)):
+        return table
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return None
+    if (payload.get('version') != SNAPSHOT_VERSION or
+            payload.get('source') != fingerprint(store_path)):
+        return None
+    table = ActivityTable(RawRows(payload['raw']), payload['columns'], payload['dictionaries'])
+    table.spatial, table.names = payload['spatial'], payload['names']
+    _loaded[path] = (SNAPSHOT_VERSION, fingerprint(path), payload['source']), table
+    return table
+
+
+def refresh(path=None, store_path=None):
+    """Rebuild the snapshot from the activity store."""
+    store_path = store_path or STORE_PATH
+    conn = store.connect(store_path)
+    try:
+        table = ActivityTable.from_json(store.iterate_raw(conn))
+    finally:
+        conn.close()
+    save(table, fingerprint(store_path), path)
+    return table
+
+
+def current(path=None, store_path=None):
+    """Activities from the snapshot, rebuilt first when the store changed since.
+    None when there is no store yet."""
+    if not os.path.exists(store_path or STORE_PATH):
+        return None
+    return load(path, store_path) or refresh(path, store_path)
@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS = 6371.0
+KM_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+# cell size in degrees, about 5.5 km north-south
+CELL = 0.05
+COLUMNS = round(360 / CELL)
+
+
+def haversine(lat, lon, lats, lons):
+    """Great-circle distances in km between a point and arrays of points, all in degrees."""
+    lat, lon, lats, lons = map(np.radians, (lat, lon, lats, lons))
+    a = (np.sin((lats - lat) / 2) ** 2 +
+         np.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def parse_coordinates(value):
+    """Split 'lat,lon' into floats in degrees."""
+    try:
+        lat, lon = map(float, value.split(','))
+    except ValueError:
+        raise ValueError(f"Coordinates should be in format 'lat,lon': {value}")
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError(f"Coordinates out of range: {value}")
+    return lat, lon
+
+
+class GridIndex:
+    """Activities bucketed by the grid cell of their start coordinates.
+    A radius query only measures distances to activities in the cells overlapping
+    the bounding box of the circle."""
+    def __init__(self, lats, lons):
+        self.lats, self.lons = lats, lons
+        present = np.flatnonzero(~np.isnan(lats) & ~np.isnan(lons))
+        rows = np.floor(lats[present] / CELL).astype(np.int64)
+        columns = np.floor(lons[present] / CELL).astype(np.int64) % COLUMNS
+        keys = rows * COLUMNS + columns
+        order = np.argsort(keys, kind='stable')
+        self.indices = present[order]
+        keys = keys[order]
+        starts = np.flatnonzero(np.diff(keys, prepend=keys[:1] - 1))
+        ends = np.r_[starts[1:], len(keys)]
+        self.cells = {int(keys[start]): (start, end) for start, end in zip(starts, ends)}
+
+    def cell_keys(self, lat, lon, radius):
+        dlat = radius / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90)))
+        dlon = dlat / cos_lat if cos_lat > 1e-9 else 180
+        rows = range(math.floor((lat - dlat) / CELL), math.floor((lat + dlat) / CELL) + 1)
+        if dlon >= 180:
+            columns = range(COLUMNS)
+        else:
+            columns = range(math.floor((lon - dlon) / CELL), math.floor((lon + dlon) / CELL) + 1)
+        if len(rows) * len(columns) > len(self.cells):
+            # scanning the occupied cells is cheaper than probing the whole box
+            return list(self.cells)
+        return {row * COLUMNS + column % COLUMNS for row in rows for column in columns}
+
+    def near(self, lat, lon, radius):
+        """Indices of activities starting within radius km of the point, in ascending order."""
+        slices = [self.cells[key] for key in self.cell_keys(lat, lon, radius)
+                  if key in self.cells]
+        if not slices:
+            return np.array([], dtype=np.int64)
+        candidates = np.concatenate([self.indices[start:end] for start, end in slices])
+        distances = haversine(lat, lon, self.lats[candidates], self.lons[candidates])
+        return np.sort(candidates[distances <= radius])
+
+
+def near_mask(table, lat, lon, radius):
+    """Rows of an ActivityTable starting within radius km of the point."""
+    mask = np.zeros(len(table), dtype=bool)
+    mask[table.spatial_index().near(lat, lon, radius)] = True
+    return mask
@@ -1,48 +1,122 @@
 import datetime
 
-from src.utils import format_value
+import numpy as np
+
+from src import store
+from src.table import as_table
+
+PERIODS = ['week', 'month', 'year']
 
 
 def calculate_stats(data):
+    table = as_table(data)
     stats = {}
-    stats["covered_distance"] = round(
-        sum([format_value("distance", activity["distance"]) for activity in data]), 2
-    )
-    stats["moving_time"] = sum(
-        [format_value("moving_time", activity["moving_time"]) for activity in data],
-        datetime.timedelta(),
-    )
-    stats["covered_elevation"] = round(
-        sum([activity["total_elevation_gain"] for activity in data]), 2
-    )
+    stats["covered_distance"] = round(float(np.nansum(table.columns["distance"])) / 1000, 2)
+    stats["moving_time"] = datetime.timedelta(
+        seconds=int(np.nansum(table.columns["moving_time"])))
+    stats["covered_elevation"] = round(float(np.nansum(table.columns["total_elevation_gain"])), 2)
 
     return stats
 
 
-def generate_weekly_ranges(num_weeks=4):
+def period_start(day, period):
+    """First day of the week (Monday), month or year containing day."""
+    if period == "week":
+        return day - datetime.timedelta(days=day.weekday())
+    elif period == "month":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def previous_period(start, period):
+    if period == "week":
+        return start - datetime.timedelta(days=7)
+    return period_start(start - datetime.timedelta(days=1), period)
+
+
+def generate_ranges(num_periods=4, period="week"):
+    """Ranges of the last num_periods periods, the current one first."""
     ranges = []
-    day = datetime.datetime.today().date()
-    for _ in range(num_weeks):
-        start = day - datetime.timedelta(days=day.weekday())
-        end = start + datetime.timedelta(days=6)
+    start = period_start(datetime.datetime.today().date(), period)
+    for _ in range(num_periods):
+        if period == "week":
+            end = start + datetime.timedelta(days=6)
+        elif period == "month":
+            end = period_start(start + datetime.timedelta(days=31), period) - \
+                datetime.timedelta(days=1)
+        else:
+            end = start.replace(month=12, day=31)
         ranges.append({"start": start, "end": end})
-        day = day - datetime.timedelta(days=7)
+        start = previous_period(start, period)
 
     return ranges
 
 
-def data_by_weeks(data, num_weeks):
-    ranges = generate_weekly_ranges(num_weeks)
-    weekly_collections = [[] for _ in range(len(ranges))]
-    for activity in data:
-        date = format_value("start_date_local", activity["start_date_local"])
-        for idx, week in enumerate(ranges):
-            if date >= week["start"] and date <= week["end"]:
-                weekly_collections[idx].append(activity)
+def generate_weekly_ranges(num_weeks=4):
+    return generate_ranges(num_weeks, "week")
+
+
+def bucket_index(table, period, today=None):
+    """Number of periods between each activity and the current period, 0 for the current one.
+    Computed directly from the start date, -1 for activities without a date."""
+    days = table.formatted("start_date_local")
+    today = np.datetime64(today or datetime.datetime.today().date(), "D")
+    if period == "week":
+        # 1970-01-01 was a Thursday, shift so that weeks start on Monday
+        weeks = (days.astype(np.int64) + 3) // 7
+        index = (today.astype(np.int64) + 3) // 7 - weeks
+    else:
+        unit = "M" if period == "month" else "Y"
+        index = today.astype(f"datetime64[{unit}]").astype(np.int64) - \
+            days.astype(f"datetime64[{unit}]").astype(np.int64)
+    return np.where(np.isnat(days), -1, index)
+
 
-    return weekly_collections
+def period_stats(data, num_periods=4, period="week"):
+    """Stats of the last num_periods periods in a single pass over activities."""
+    table = as_table(data)
+    index = bucket_index(table, period)
+    valid = (index >= 0) & (index < num_periods)
+    index = index[valid]
+
+    def total(values):
+        return np.bincount(index, weights=np.nan_to_num(values[valid]), minlength=num_periods)
+
+    distances = total(table.columns["distance"])
+    moving_times = total(table.columns["moving_time"])
+    elevations = total(table.columns["total_elevation_gain"])
+    return [make_stats(*totals) for totals in zip(distances, moving_times, elevations)]
+
+
+def make_stats(distance, moving_time, elevation):
+    """Stats from totals in API units."""
+    return {"covered_distance": round(float(distance) / 1000, 2),
+            "moving_time": datetime.timedelta(seconds=int(moving_time)),
+            "covered_elevation": round(float(elevation), 2)}
+
+
+def rollup_stats(conn, num_periods=4, period="week", where=None, params=()):
+    """Stats of the last num_periods periods read from the precomputed store rollups."""
+    ranges = generate_ranges(num_periods, period)
+    since = ranges[-1]["start"].isoformat() if ranges else datetime.date.max.isoformat()
+    totals = {start: (distance, moving_time, elevation) for start, _, distance, moving_time,
+              elevation in store.rollups(conn, period, since, where, params)}
+    return [make_stats(*totals.get(period_range["start"].isoformat(), (0, 0, 0)))
+            for period_range in ranges]
+
+
+def data_by_periods(data, num_periods, period="week"):
+    table = as_table(data)
+    index = bucket_index(table, period)
+    valid = np.flatnonzero((index >= 0) & (index < num_periods))
+    order = valid[np.argsort(index[valid], kind="stable")]
+    bounds = np.searchsorted(index[order], np.arange(num_periods + 1))
+    return [table.take(order[start:end]) for start, end in zip(bounds, bounds[1:])]
+
+
+def data_by_weeks(data, num_weeks):
+    return data_by_periods(data, num_weeks, "week")
 
 
 def weekly_stats(data, num_weeks=4):
-    weekly_data = data_by_weeks(data, num_weeks)
-    return [calculate_stats(week) for week in weekly_data]
+    return period_stats(data, num_weeks, "week")
@@ -0,0 +1,281 @@
+import calendar
+import json
+import os
+import re
+import sqlite3
+
+from src import STORE_PATH
+from src.utils import compile_pattern, fold, parse_datetime, strip_accents
+
+# Per day, week (starting on Monday), month and year totals per type and gear of activities,
+# kept up to date by triggers on the activities table.
+ROLLUP_PERIODS = "SELECT 'day' AS period UNION ALL SELECT 'week' UNION ALL " \
+                 "SELECT 'month' UNION ALL SELECT 'year'"
+ROLLUP_START = """CASE {period}
+    WHEN 'day' THEN date({row}.start_date_local)
+    WHEN 'week' THEN date({row}.start_date_local, 'weekday 0', '-6 days')
+    WHEN 'month' THEN date({row}.start_date_local, 'start of month')
+    ELSE date({row}.start_date_local, 'start of year') END"""
+ROLLUP_ADD = f"""
+        INSERT INTO rollups
+            SELECT period, {ROLLUP_START.format(period='period', row='NEW')},
+                   coalesce(NEW.type, ''), coalesce(NEW.gear_id, ''), 1,
+                   coalesce(NEW.distance, 0), coalesce(NEW.moving_time, 0),
+                   coalesce(NEW.total_elevation_gain, 0)
+            FROM ({ROLLUP_PERIODS}) WHERE NEW.start_date_local IS NOT NULL
+            ON CONFLICT (period, start, type, gear_id) DO UPDATE SET
+                count = count + excluded.count,
+                distance = distance + excluded.distance,
+                moving_time = moving_time + excluded.moving_time,
+                total_elevation_gain = total_elevation_gain + excluded.total_elevation_gain;"""
+ROLLUP_SUBTRACT = f"""
+        UPDATE rollups SET
+            count = count - 1,
+            distance = distance - coalesce(OLD.distance, 0),
+            moving_time = moving_time - coalesce(OLD.moving_time, 0),
+            total_elevation_gain = total_elevation_gain - coalesce(OLD.total_elevation_gain, 0)
+        WHERE start = {ROLLUP_START.format(period='period', row='OLD')}
+            AND type = coalesce(OLD.type, '') AND gear_id = coalesce(OLD.gear_id, '');
+        DELETE FROM rollups WHERE count <= 0;"""
+
+# Each entry upgrades the schema by one version, applied in order based on PRAGMA user_version.
+MIGRATIONS = [
+    """
+    CREATE TABLE activities (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        type TEXT,
+        start_date TEXT,
+        start_date_local TEXT,
+        gear_id TEXT,
+        distance REAL,
+        moving_time INTEGER,
+        total_elevation_gain REAL,
+        average_speed REAL,
+        average_heartrate REAL,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX activities_start_date_local ON activities (start_date_local);
+    CREATE INDEX activities_type ON activities (type);
+    CREATE INDEX activities_gear_id ON activities (gear_id);
+    CREATE INDEX activities_distance ON activities (distance);
+    """,
+    f"""
+    CREATE TABLE rollups (
+        period TEXT NOT NULL,
+        start TEXT NOT NULL,
+        type TEXT NOT NULL,
+        gear_id TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        distance REAL NOT NULL,
+        moving_time INTEGER NOT NULL,
+        total_elevation_gain REAL NOT NULL,
+        PRIMARY KEY (period, start, type, gear_id)
+    );
+    CREATE TRIGGER activities_rollup_insert AFTER INSERT ON activities BEGIN
+        {ROLLUP_ADD}
+    END;
+    CREATE TRIGGER activities_rollup_delete AFTER DELETE ON activities BEGIN
+        {ROLLUP_SUBTRACT}
+    END;
+    CREATE TRIGGER activities_rollup_update AFTER UPDATE ON activities BEGIN
+        {ROLLUP_SUBTRACT}
+        {ROLLUP_ADD}
+    END;
+    INSERT INTO rollups
+        SELECT period, start, type, gear_id, count(*), sum(distance), sum(moving_time),
+               sum(total_elevation_gain)
+        FROM (SELECT period, {ROLLUP_START.format(period='period', row='activities')} AS start,
+                     coalesce(type, '') AS type, coalesce(gear_id, '') AS gear_id,
+                     coalesce(distance, 0) AS distance,
+                     coalesce(moving_time, 0) AS moving_time,
+                     coalesce(total_elevation_gain, 0) AS total_elevation_gain
+              FROM activities, ({ROLLUP_PERIODS})
+              WHERE start_date_local IS NOT NULL)
+        GROUP BY period, start, type, gear_id;
+    """,
+    f"""
+    ALTER TABLE activities ADD COLUMN country TEXT;
+    ALTER TABLE activities ADD COLUMN city TEXT;
+    CREATE INDEX activities_country ON activities (country);
+    CREATE INDEX activities_city ON activities (city);
+    CREATE TABLE geocode (
+        lat_cell INTEGER NOT NULL,
+        lon_cell INTEGER NOT NULL,
+        country TEXT NOT NULL,
+        city TEXT NOT NULL,
+        PRIMARY KEY (lat_cell, lon_cell)
+    );
+    DROP TRIGGER activities_rollup_update;
+    CREATE TRIGGER activities_rollup_update AFTER UPDATE OF
+            type, gear_id, start_date_local, distance, moving_time, total_elevation_gain
+            ON activities BEGIN
+        {ROLLUP_SUBTRACT}
+        {ROLLUP_ADD}
+    END;
+    """,
+    """
+    ALTER TABLE activities ADD COLUMN name_norm TEXT;
+    UPDATE activities SET name_norm = strip_accents(coalesce(name, ''));
+    """,
+    # sorting with a limit reads the first rows of an index instead of sorting everything
+    """
+    CREATE INDEX activities_moving_time ON activities (moving_time);
+    CREATE INDEX activities_total_elevation_gain ON activities (total_elevation_gain);
+    CREATE INDEX activities_average_speed ON activities (average_speed);
+    CREATE INDEX activities_average_heartrate ON activities (average_heartrate);
+    """,
+]
+
+COLUMNS = ['id', 'name', 'type', 'start_date', 'start_date_local', 'gear_id', 'distance',
+           'moving_time', 'total_elevation_gain', 'average_speed', 'average_heartrate']
+
+LEGACY_FILE = re.compile(r'activities_\d+\.json')
+
+
+def migrate(conn):
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for index, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            conn.executescript(script)
+            conn.execute(f'PRAGMA user_version = {index}')
+
+
+def import_legacy_files(conn, directory):
+    """Move activities from per-page json files of older versions into the store."""
+    files = [f for f in os.listdir(directory) if LEGACY_FILE.fullmatch(f)]
+    for file in files:
+        with open(os.path.join(directory, file), 'r') as f:
+            upsert(conn, json.load(f))
+    for file in files:
+        os.remove(os.path.join(directory, file))
+
+
+def connect(path=None):
+    """Open the activity store, creating or upgrading it when needed."""
+    path = path or STORE_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    # accent and case insensitive matching of places, see utils.fold
+    conn.create_function('fold', 1, lambda value: value and fold(value), deterministic=True)
+    conn.create_function('strip_accents', 1, strip_accents, deterministic=True)
+    # name_norm REGEXP pattern, see utils.compile_pattern
+    conn.create_function('regexp', 2, lambda pattern, value: value is not None and
+                         compile_pattern(pattern).search(value) is not None, deterministic=True)
+    migrate(conn)
+    import_legacy_files(conn, os.path.dirname(path))
+    return conn
+
+
+def exists(path=None):
+    """Whether there is a store or json pages of older versions to import into one,
+    checked without creating the store as connect does."""
+    path = path or STORE_PATH
+    directory = os.path.dirname(path)
+    return os.path.exists(path) or (os.path.isdir(directory) and
+                                    any(LEGACY_FILE.fullmatch(f) for f in os.listdir(directory)))
+
+
+def to_row(activity):
+    return [activity.get(column) for column in COLUMNS] + [
+        strip_accents(activity.get('name') or ''), json.dumps(activity)]
+
+
+def upsert(conn, activities):
+    """Insert activities, updating stored ones with the same id.
+    Country and city of already geocoded activities are kept."""
+    placeholders = ', '.join('?' * (len(COLUMNS) + 2))
+    updates = ', '.join(f'{column} = excluded.{column}' for column in COLUMNS[1:] + ['name_norm'])
+    updates += (", data = CASE WHEN activities.country IS NULL THEN excluded.data "
+                "ELSE json_set(excluded.data, '$.country', nullif(activities.country, ''), "
+                "'$.city', nullif(activities.city, '')) END")
+    with conn:
+        conn.executemany(f"INSERT INTO activities ({', '.join(COLUMNS)}, name_norm, data) "
+                         f"VALUES ({placeholders}) ON CONFLICT (id) DO UPDATE SET {updates}",
+                         map(to_row, activities))
+
+
+def clear(conn):
+    with conn:
+        conn.execute('DELETE FROM activities')
+
+
+def count(conn):
+    return conn.execute('SELECT count(*) FROM activities').fetchone()[0]
+
+
+def newest_start(conn):
+    """Epoch timestamp of the most recent activity start, None for an empty store."""
+    newest = conn.execute('SELECT max(start_date) FROM activities').fetchone()[0]
+    if newest is None:
+        return None
+    return calendar.timegm(parse_datetime(newest).timetuple())
+
+
+def ids(conn):
+    """Ids of all activities, the most recent first."""
+    return [activity_id for activity_id, in
+            conn.execute('SELECT id FROM activities ORDER BY start_date DESC, id DESC')]
+
+
+def iterate(conn, where=None, params=(), order_by=None, limit=None):
+    """Lazily load activities matching an optional SQL condition on the indexed columns."""
+    query = 'SELECT data FROM activities'
+    if where:
+        query += f' WHERE {where}'
+    if order_by:
+        query += f' ORDER BY {order_by}'
+    if limit is not None:
+        query += f' LIMIT {int(limit)}'
+    for data, in conn.execute(query, params):
+        yield json.loads(data)
+
+
+def iterate_raw(conn):
+    """All activities as stored JSON text, in id order."""
+    for data, in conn.execute('SELECT data FROM activities ORDER BY id'):
+        yield data
+
+
+def ungeocoded(conn):
+    """Ids and start coordinates of activities without country and city yet."""
+    return conn.execute("SELECT id, json_extract(data, '$.start_latlng[0]'), "
+                        "json_extract(data, '$.start_latlng[1]') FROM activities "
+                        "WHERE country IS NULL AND "
+                        "json_array_length(data, '$.start_latlng') = 2").fetchall()
+
+
+def set_locations(conn, locations):
+    """Store (country, city, id) of activities, empty strings when the place is unknown.
+    Also set in the activity data, with null for unknown."""
+    with conn:
+        conn.executemany("UPDATE activities SET country = ?1, city = ?2, "
+                         "data = json_set(data, '$.country', nullif(?1, ''), "
+                         "'$.city', nullif(?2, '')) WHERE id = ?3", locations)
+
+
+def cached_location(conn, cell):
+    """Country and city of a geocode grid cell, None when not looked up yet."""
+    return conn.execute('SELECT country, city FROM geocode WHERE lat_cell = ? AND lon_cell = ?',
+                        cell).fetchone()
+
+
+def cache_location(conn, cell, country, city):
+    with conn:
+        conn.execute('INSERT OR REPLACE INTO geocode VALUES (?, ?, ?, ?)',
+                     (*cell, country, city))
+
+
+def rollups(conn, period, since, where=None, params=()):
+    """Totals per period start from the rollups, for periods starting at or after since.
+    The condition may only refer to type and gear_id."""
+    query = ('SELECT start, sum(count), sum(distance), sum(moving_time), '
+             'sum(total_elevation_gain) FROM rollups WHERE period = ? AND start >= ?')
+    if where:
+        query += f' AND {where}'
+    query += ' GROUP BY start ORDER BY start'
+    return conn.execute(query, (period, since, *params)).fetchall()
+
+
+def select(conn, where=None, params=(), order_by=None, limit=None):
+    return list(iterate(conn, where, params, order_by, limit))
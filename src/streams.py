@@ -0,0 +1,103 @@
+import os
+import shutil
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from src import STREAMS_DIR, api
+
+# stream types kept and their array types, missing samples of float streams are NaN
+STREAM_TYPES = {'time': np.int32, 'distance': np.float32, 'latlng': np.float32,
+                'altitude': np.float32, 'heartrate': np.float32, 'watts': np.float32,
+                'cadence': np.float32}
+STREAM_WORKERS = 4
+
+
+def stream_dir(activity_id, directory=None):
+    return os.path.join(directory or STREAMS_DIR, str(activity_id))
+
+
+def has_streams(activity_id, directory=None):
+    """Streams of the activity were downloaded, possibly none when it has no samples."""
+    return os.path.isdir(stream_dir(activity_id, directory))
+
+
+def to_array(key, data):
+    if STREAM_TYPES[key] is np.int32:
+        return np.array(data, dtype=np.int32)
+    # None samples become NaN
+    return np.array(data, dtype=np.float64).astype(STREAM_TYPES[key])
+
+
+def save(activity_id, streams, directory=None):
+    """Store streams as one .npy file per type, replacing the activity's directory at once."""
+    path = stream_dir(activity_id, directory)
+    tmp_path = f'{path}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    for key, array in streams.items():
+        # empty arrays can't be memory mapped, a missing file reads as no samples
+        if len(array):
+            np.save(os.path.join(tmp_path, f'{key}.npy'), array)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load(activity_id, keys=None, directory=None):
+    """Streams of an activity as read-only memory mapped arrays, by type.
+    Types missing for the activity are left out."""
+    path = stream_dir(activity_id, directory)
+    streams = {}
+    for key in keys or STREAM_TYPES:
+        file = os.path.join(path, f'{key}.npy')
+        if os.path.exists(file):
+            streams[key] = np.load(file, mmap_mode='r')
+    return streams
+
+
+def fetch_streams(session, access_token, activity_id):
+    response = api.get(f'activities/{activity_id}/streams', access_token, session=session,
+                       params={'keys': ','.join(STREAM_TYPES), 'key_by_type': 'true'})
+    if response.status_code == 404:
+        # manual activities have no streams
+        return {}
+    response.raise_for_status()
+    return {key: to_array(key, stream['data']) for key, stream in response.json().items()
+            if key in STREAM_TYPES}
+
+
+def download_streams(access_token, activity_ids, workers=STREAM_WORKERS, directory=None):
+    """Fetch and store streams of activities that don't have them yet, in the given order.
+    Up to `workers` activities are requested concurrently. Stops when the daily quota runs
+    out, keeping the streams already fetched, returns (number stored, number remaining).
+    Activities whose request fails are reported and requested again by the next run."""
+    missing = [activity_id for activity_id in activity_ids
+               if not has_streams(activity_id, directory)]
+    remaining = iter(missing)
+    count = failed = 0
+    with requests.Session() as session, ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit(activity_id):
+            return activity_id, executor.submit(fetch_streams, session, access_token, activity_id)
+        pending = deque(submit(activity_id) for _, activity_id in zip(range(workers), remaining))
+        exhausted = False
+        while pending:
+            activity_id, future = pending.popleft()
+            try:
+                streams = future.result()
+            except api.RateLimitExceeded:
+                # requests already in flight may still have made it
+                exhausted = True
+                continue
+            except requests.HTTPError as e:
+                # e.g. a private activity or a server error after retries, go on with the rest
+                print(f"Streams of activity {activity_id} not downloaded: {e}")
+                failed += 1
+                streams = None
+            if not exhausted and (next_id := next(remaining, None)) is not None:
+                pending.append(submit(next_id))
+            if streams is not None:
+                save(activity_id, streams, directory)
+                count += 1
+    return count, len(missing) - count - failed
@@ -0,0 +1,213 @@
+import json
+
+import numpy as np
+
+from src.utils import fold
+
+NUMERIC_COLUMNS = ['distance', 'moving_time', 'total_elevation_gain',
+                   'average_heartrate', 'average_speed']
+DICTIONARY_COLUMNS = ['type', 'gear_id', 'country', 'city']
+
+
+def encode(values):
+    """Dictionary encode values into (codes array, list of distinct values)."""
+    lookup = {}
+    codes = np.fromiter((lookup.setdefault(value, len(lookup)) for value in values),
+                        dtype=np.int32, count=len(values))
+    return codes, list(lookup)
+
+
+def start_timestamps(activities):
+    return np.array([activity['start_date_local'].rstrip('Z')
+                     if activity.get('start_date_local') else 'NaT'
+                     for activity in activities], dtype='datetime64[s]')
+
+
+def start_coordinates(activities):
+    """Latitude and longitude arrays of activity starts, NaN when missing."""
+    coordinates = np.array([activity.get('start_latlng') or (np.nan, np.nan)
+                            for activity in activities], dtype=np.float64).reshape(-1, 2)
+    return coordinates[:, 0].copy(), coordinates[:, 1].copy()
+
+
+def pace_seconds(speed):
+    """Vectorized utils.speed_to_pace, whole seconds per km, zero for zero speed."""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pace = np.floor(60 / (speed * 3.6) * 60)
+    return np.where(speed == 0, 0, pace)
+
+
+def display_units(attribute, values):
+    """Raw API values converted the same way as utils.format_value, as comparable numbers.
+    Durations are in seconds and dates in days since epoch."""
+    if attribute == 'distance':
+        return np.round(values / 1000, 2)
+    elif attribute == 'average_speed':
+        return np.round(values * 3.6, 2)
+    elif attribute == 'average_pace':
+        return pace_seconds(values)
+    elif attribute == 'start_date_local':
+        return values.astype('datetime64[D]')
+    return values
+
+
+def decode(text):
+    activity = json.loads(text)
+    # same as utils.add_pace_attribute
+    activity['average_pace'] = activity['average_speed']
+    return activity
+
+
+class RawRows:
+    """Activities kept as JSON text, decoded only when accessed."""
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, index):
+        return decode(self.raw[index])
+
+    def __iter__(self):
+        return map(decode, self.raw)
+
+    def take(self, indices):
+        return RawRows([self.raw[i] for i in indices])
+
+
+class ActivityTable:
+    """Columnar view of activities, built once on load.
+    Numeric attributes are kept in raw API units as NumPy arrays (NaN when missing),
+    type, gear and place as dictionary encoded codes. Iterating yields the original activities."""
+    def __init__(self, activities, columns=None, dictionaries=None):
+        self.rows = activities if isinstance(activities, RawRows) else list(activities)
+        self.spatial = None
+        self.names = None
+        if columns is not None:
+            self.columns, self.dictionaries = columns, dictionaries
+            return
+        self.columns = {column: np.array([activity.get(column) for activity in self.rows],
+                                         dtype=np.float64)
+                        for column in NUMERIC_COLUMNS}
+        # pace is derived from speed, see utils.add_pace_attribute
+        self.columns['average_pace'] = self.columns['average_speed']
+        self.columns['start_date_local'] = start_timestamps(self.rows)
+        self.columns['name'] = np.array([a.get('name') or '' for a in self.rows], dtype=object)
+        self.columns['start_lat'], self.columns['start_lng'] = start_coordinates(self.rows)
+        self.dictionaries = {}
+        for column in DICTIONARY_COLUMNS:
+            self.columns[column], self.dictionaries[column] = encode([a.get(column)
+                                                                      for a in self.rows])
+
+    @classmethod
+    def from_json(cls, raw):
+        """Build table from activities as JSON text, rows stay encoded until accessed."""
+        raw = list(raw)
+        table = cls(map(decode, raw))
+        table.rows = RawRows(raw)
+        return table
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def take(self, selection):
+        """Sub-table of rows selected by a boolean mask or an array of indices."""
+        indices = np.flatnonzero(selection) if selection.dtype == bool else selection
+        columns = {name: values[indices] for name, values in self.columns.items()}
+        rows = (self.rows.take(indices) if isinstance(self.rows, RawRows)
+                else [self.rows[i] for i in indices])
+        return ActivityTable(rows, columns, self.dictionaries)
+
+    def formatted(self, attribute):
+        """Column converted the same way as utils.format_value, see display_units."""
+        return display_units(attribute, self.columns[attribute])
+
+    def code_mask(self, column, values):
+        """Rows whose dictionary encoded column is one of values."""
+        codes = [code for code, value in enumerate(self.dictionaries[column]) if value in values]
+        return np.isin(self.columns[column], codes)
+
+    def place_mask(self, column, name):
+        """Rows whose country or city equals name, ignoring case and accents."""
+        return self.code_mask(column, [value for value in self.dictionaries[column]
+                                       if value and fold(value) == fold(name)])
+
+    def name_index(self):
+        """Normalized names for searching, built on first use."""
+        if self.names is None:
+            from src.search import NameIndex
+            self.names = NameIndex(self.columns['name'])
+        return self.names
+
+    def spatial_index(self):
+        """Grid index of start coordinates, built on first use."""
+        if self.spatial is None:
+            from src.spatial import GridIndex
+            self.spatial = GridIndex(self.columns['start_lat'], self.columns['start_lng'])
+        return self.spatial
+
+
+def as_table(data):
+    return data if isinstance(data, ActivityTable) else ActivityTable(data)
+
+
+def attribute_mask(table, attribute, symbol, value):
+    """Rows whose displayed attribute compares to value, see predicates.compile_filter."""
+    from src.predicates import compile_filter
+    return compile_filter(attribute, symbol, value).mask(table)
+
+
+def name_mask(table, pattern):
+    """Rows whose name matches pattern ignoring case and accents."""
+    return table.name_index().mask(pattern)
+
+
+def sort_key(table, attribute, reverse=False):
+    """Ascending sort key of a column with missing values last, and the mask of rows with
+    a present, non-zero value."""
+    values = table.columns[attribute]
+    if values.dtype.kind == 'M':
+        missing = np.isnat(values)
+        values = values.astype(np.int64)
+        values = -values if reverse else values
+        values[missing] = np.iinfo(np.int64).max
+        return values, ~missing
+    present = ~np.isnan(values) & (values != 0)
+    # NaN stays NaN negated and lexsort puts it last
+    return -values if reverse else values, present
+
+
+def top_order(table, keys, limit=None):
+    """Indices of rows ordered by keys, (attribute, reverse) pairs, ties in table order.
+    Rows with a missing or zero first key are left out, missing values of the other keys
+    sort last. With a limit, only rows that can make it into the first limit by the first
+    key are sorted."""
+    columns = []
+    for attribute, reverse in keys:
+        values, present = sort_key(table, attribute, reverse)
+        columns.append(values)
+        if len(columns) == 1:
+            indices = np.flatnonzero(present)
+    columns = [values[indices] for values in columns]
+    if limit is not None and limit < len(indices):
+        if limit <= 0:
+            return indices[:0]
+        # rows tied with the limit-th smallest first key are all kept for the full sort
+        kth = np.partition(columns[0], limit - 1)[limit - 1]
+        candidates = np.flatnonzero(columns[0] <= kth)
+        indices = indices[candidates]
+        columns = [values[candidates] for values in columns]
+    # lexsort is stable and sorts by the last key first
+    return indices[np.lexsort(columns[::-1])][:limit]
+
+
+def sort_order(table, attribute, reverse=False):
+    """Indices of rows with a present, non-zero attribute in stable sorted order."""
+    return top_order(table, [(attribute, reverse)])
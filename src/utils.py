@@ -1,6 +1,7 @@
 import datetime
 import re
 import unicodedata
+from functools import lru_cache
 
 
 def parse_datetime(date):
@@ -14,6 +15,17 @@ def strip_accents(string):
                    if unicodedata.category(c) != 'Mn')
 
 
+@lru_cache(maxsize=64)
+def compile_pattern(pattern):
+    """Case insensitive pattern for matching accent stripped names, compiled once."""
+    return re.compile(strip_accents(pattern), flags=re.IGNORECASE)
+
+
+def fold(string):
+    """Accent and case insensitive form of a string for equality matching."""
+    return strip_accents(string).casefold()
+
+
 def speed_to_pace(speed):
     """Calculate running pace from speed [m/s -> min/km]."""
     if speed == 0:
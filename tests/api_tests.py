@@ -0,0 +1,135 @@
+import unittest
+from unittest import mock
+
+import requests
+
+from src import api
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def response(status_code=200, headers=None):
+    return mock.Mock(status_code=status_code, headers=headers or {})
+
+
+class TestParseRateHeader(unittest.TestCase):
+    def test_correct_header(self):
+        self.assertEqual(api.parse_rate_header('600,30000'), (600, 30000))
+
+    def test_missing_header(self):
+        self.assertIsNone(api.parse_rate_header(None))
+
+    def test_malformed_header(self):
+        self.assertIsNone(api.parse_rate_header('abc'))
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_burst_up_to_capacity(self):
+        clock = FakeClock()
+        bucket = api.TokenBucket(rate=1, capacity=3, clock=clock, sleep=clock.sleep)
+        for _ in range(3):
+            bucket.acquire()
+        self.assertEqual(clock.sleeps, [])
+
+    def test_waits_for_refill(self):
+        clock = FakeClock()
+        bucket = api.TokenBucket(rate=0.5, capacity=1, clock=clock, sleep=clock.sleep)
+        bucket.acquire()
+        bucket.acquire()
+        self.assertEqual(clock.sleeps, [2])
+
+    def test_set_available(self):
+        clock = FakeClock()
+        bucket = api.TokenBucket(rate=1, capacity=10, clock=clock, sleep=clock.sleep)
+        bucket.set_available(0)
+        bucket.acquire()
+        self.assertEqual(clock.sleeps, [1])
+
+
+class TestRequestScheduler(unittest.TestCase):
+    def scheduler(self, clock):
+        return api.RequestScheduler(short_limit=100, daily_limit=1000, max_retries=2,
+                                    clock=clock, sleep=clock.sleep)
+
+    def test_success(self):
+        clock = FakeClock()
+        session = mock.Mock(request=mock.Mock(return_value=response()))
+        result = self.scheduler(clock).request('GET', 'url', session=session)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(clock.sleeps, [])
+
+    def test_retry_after_header(self):
+        clock = FakeClock()
+        session = mock.Mock(request=mock.Mock(
+            side_effect=[response(429, {'Retry-After': '7'}), response()]))
+        result = self.scheduler(clock).request('GET', 'url', session=session)
+        self.assertEqual(result.status_code, 200)
+        self.assertEqual(clock.sleeps, [7])
+
+    def test_exhausted_window_waits_for_reset(self):
+        clock = FakeClock(now=10 * 60)
+        headers = {'X-RateLimit-Limit': '100,1000', 'X-RateLimit-Usage': '100,500'}
+        session = mock.Mock(request=mock.Mock(side_effect=[response(429, headers), response()]))
+        self.scheduler(clock).request('GET', 'url', session=session)
+        self.assertEqual(clock.sleeps[0], 5 * 60)
+
+    def test_server_error_backoff(self):
+        clock = FakeClock()
+        session = mock.Mock(request=mock.Mock(
+            side_effect=[response(503), response(503), response()]))
+        self.scheduler(clock).request('GET', 'url', session=session)
+        self.assertEqual(clock.sleeps, [1, 2])
+
+    def test_gives_up_after_retries(self):
+        clock = FakeClock()
+        failed = response(503)
+        failed.raise_for_status.side_effect = requests.HTTPError
+        session = mock.Mock(request=mock.Mock(return_value=failed))
+        self.assertRaises(requests.HTTPError, self.scheduler(clock).request,
+                          'GET', 'url', session=session)
+        self.assertEqual(session.request.call_count, 3)
+
+    def test_daily_quota_exhausted(self):
+        clock = FakeClock()
+        headers = {'X-RateLimit-Limit': '100,1000', 'X-RateLimit-Usage': '10,1000'}
+        session = mock.Mock(request=mock.Mock(return_value=response(200, headers)))
+        scheduler = self.scheduler(clock)
+        # the response using up the quota is still returned, only the next one is refused
+        self.assertEqual(scheduler.request('GET', 'url', session=session).status_code, 200)
+        self.assertRaises(api.RateLimitExceeded, scheduler.request, 'GET', 'url',
+                          session=session)
+        self.assertEqual(session.request.call_count, 1)
+
+    def test_rate_limited_by_daily_quota(self):
+        clock = FakeClock()
+        headers = {'X-RateLimit-Limit': '100,1000', 'X-RateLimit-Usage': '10,1000'}
+        session = mock.Mock(request=mock.Mock(return_value=response(429, headers)))
+        self.assertRaises(api.RateLimitExceeded, self.scheduler(clock).request, 'GET', 'url',
+                          session=session)
+        self.assertEqual(session.request.call_count, 1)
+        self.assertEqual(clock.sleeps, [])
+
+    def test_usage_headers_throttle(self):
+        clock = FakeClock()
+        headers = {'X-RateLimit-Limit': '90,1000', 'X-RateLimit-Usage': '90,500'}
+        session = mock.Mock(request=mock.Mock(return_value=response(200, headers)))
+        scheduler = self.scheduler(clock)
+        scheduler.request('GET', 'url', session=session)
+        scheduler.request('GET', 'url', session=session)
+        # no quota left, next token arrives after 900 s / 90 requests
+        self.assertEqual(clock.sleeps, [10])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src import bests, streams
+
+
+def constant_run(seconds, speed):
+    time = np.arange(seconds, dtype=np.int32)
+    return {'time': time, 'distance': (time * speed).astype(np.float32)}
+
+
+class TestEfforts(unittest.TestCase):
+    def test_fastest_time(self):
+        time = np.arange(0, 600, dtype=np.int32)
+        # 2 m/s, then 5 m/s for the last 200 seconds
+        distance = np.cumsum(np.where(time < 400, 2.0, 5.0))
+        self.assertEqual(bests.fastest_time(time, distance, 1000), 200)
+        self.assertIsNone(bests.fastest_time(time, distance, 5000))
+
+    def test_best_average_skips_missing_samples(self):
+        time = np.arange(10, dtype=np.int32)
+        heartrate = np.array([100, 100, 200, np.nan, 190, 180, 100, 100, 100, 100])
+        self.assertEqual(bests.best_average(time, heartrate, 2, np.nan), 185.0)
+        self.assertIsNone(bests.best_average(time, heartrate, 20, np.nan))
+
+    def test_gaps_in_power_count_as_zero(self):
+        time = np.array([0, 1, 2, 10, 11], dtype=np.int32)
+        watts = np.array([300, 300, 300, 400, 400], dtype=np.float32)
+        self.assertEqual(bests.best_average(time, watts, 5, 0), 180.0)
+
+    def test_activity_bests(self):
+        efforts = bests.activity_bests(constant_run(3600, 4))
+        self.assertEqual((efforts['1k'], efforts['5k'], efforts['10k']), (250, 1250, 2500))
+        self.assertIsNone(efforts['5s power'])
+
+
+class TestLoadBests(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.streams_dir = os.path.join(self.tmp_dir.name, 'streams')
+        self.path = os.path.join(self.tmp_dir.name, 'bests.json')
+        streams.save(1, constant_run(600, 4), self.streams_dir)
+        streams.save(2, constant_run(600, 5), self.streams_dir)
+
+    def load(self, ids):
+        return bests.load_bests(ids, self.path, self.streams_dir)
+
+    def test_only_new_activities_computed(self):
+        self.load([1, 3])
+        with mock.patch.object(bests, 'activity_bests',
+                               wraps=bests.activity_bests) as activity_bests:
+            loaded = self.load([1, 2, 3])
+        self.assertEqual(activity_bests.call_count, 1)
+        self.assertEqual(sorted(loaded), [1, 2])
+        self.assertEqual(loaded[1]['1k'], 250)
+
+    def test_history_ranking(self):
+        activities = [{'id': 1, 'name': 'Slow'}, {'id': 2, 'name': 'Fast'},
+                      {'id': 3, 'name': 'No streams'}]
+        ranking = dict(bests.history_bests(activities, self.load([1, 2, 3]), top=2))
+        self.assertEqual([(value, activity['name']) for value, activity in ranking['1k']],
+                         [(200, 'Fast'), (250, 'Slow')])
+        self.assertEqual(ranking['20min power'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import requests
+
+from src import commands, parse
+
+ATHLETE = {'bikes': [{'id': 'b1', 'name': 'Horské kolo'}],
+           'shoes': [{'id': 'g1', 'name': 'Trail shoes'}]}
+
+
+class AthleteCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        path = os.path.join(self.tmp_dir.name, 'cache', 'athlete.json')
+        self.get_user = mock.Mock(return_value=ATHLETE)
+        for patcher in (mock.patch.object(commands, 'ATHLETE_PATH', path),
+                        mock.patch.object(commands, '_gear_index', None),
+                        mock.patch('src.get_data.get_user', self.get_user)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class TestLoadAthlete(AthleteCacheTestCase):
+    def test_fetched_once(self):
+        self.assertEqual(commands.load_athlete(), ATHLETE)
+        self.assertEqual(commands.load_athlete(), ATHLETE)
+        self.assertEqual(self.get_user.call_count, 1)
+
+    def test_expired_cache_refreshed(self):
+        commands.load_athlete()
+        with mock.patch('time.time', return_value=time.time() + commands.ATHLETE_TTL + 1):
+            commands.load_athlete()
+        self.assertEqual(self.get_user.call_count, 2)
+
+    def test_stale_cache_used_offline(self):
+        commands.load_athlete()
+        self.get_user.side_effect = requests.ConnectionError
+        self.assertEqual(commands.load_athlete(max_age=0), ATHLETE)
+
+    def test_offline_without_cache(self):
+        self.get_user.side_effect = requests.ConnectionError
+        self.assertRaises(requests.ConnectionError, commands.load_athlete)
+
+    def test_stale_cache_used_on_http_error(self):
+        commands.load_athlete()
+        self.get_user.side_effect = requests.HTTPError('401 Client Error: Unauthorized')
+        self.assertEqual(commands.load_athlete(max_age=0), ATHLETE)
+
+    def test_error_payload_not_cached(self):
+        self.get_user.return_value = {'message': 'Authorization Error', 'errors': []}
+        self.assertRaises(ValueError, commands.load_athlete)
+        self.assertIsNone(commands.read_athlete_cache())
+
+    def test_list_gear(self):
+        bikes, shoes = commands.list_gear()
+        self.assertEqual(bikes, ATHLETE['bikes'])
+        self.assertEqual(shoes, ATHLETE['shoes'])
+
+
+class TestQueryGearByName(AthleteCacheTestCase):
+    def test_accents_and_case_ignored(self):
+        self.assertEqual(parse.query_gear_by_name('horske')['id'], 'b1')
+
+    def test_partial_name(self):
+        self.assertEqual(parse.query_gear_by_name('trail')['id'], 'g1')
+
+    def test_no_gear(self):
+        self.assertIsNone(parse.query_gear_by_name('unicycle'))
+
+    def test_index_built_once(self):
+        parse.query_gear_by_name('trail')
+        parse.query_gear_by_name('horske')
+        self.assertEqual(self.get_user.call_count, 1)
+
+    def test_index_rebuilt_after_refresh(self):
+        self.assertIsNone(parse.query_gear_by_name('gravel'))
+        self.get_user.return_value = {**ATHLETE, 'bikes': [{'id': 'b2', 'name': 'Gravel'}]}
+        with mock.patch('time.time', return_value=time.time() + 1):
+            commands.refresh_athlete()
+        self.assertEqual(parse.query_gear_by_name('gravel')['id'], 'b2')
+
+    def test_expired_cache_refreshed(self):
+        parse.query_gear_by_name('trail')
+        with mock.patch('time.time', return_value=time.time() + commands.ATHLETE_TTL + 1):
+            parse.query_gear_by_name('trail')
+        self.assertEqual(self.get_user.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
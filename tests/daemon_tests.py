@@ -0,0 +1,105 @@
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from src import daemon, store
+from src.shell import Shell
+
+
+def load_example_data():
+    with open('tests/example_data.json') as f:
+        return json.load(f)
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+        self.store_path = os.path.join(self.dir, 'activities.db')
+        conn = store.connect(self.store_path)
+        store.upsert(conn, load_example_data())
+        conn.close()
+        for patcher in [mock.patch('src.store.STORE_PATH', self.store_path),
+                        mock.patch('src.snapshot.STORE_PATH', self.store_path),
+                        mock.patch('src.snapshot.SNAPSHOT_PATH',
+                                   os.path.join(self.dir, 'snapshot'))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class TestDaemon(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.socket_path = os.path.join(self.dir, 'strava-cli.sock')
+        server = daemon.Server(self.socket_path)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+    def query(self, *argv):
+        with daemon.connect(self.socket_path) as sock:
+            return daemon.send(sock, list(argv))
+
+    def test_query(self):
+        error, output = self.query('--format', 'json', '--type', 'run')
+        self.assertIsNone(error)
+        activities = json.loads(output)
+        self.assertTrue(activities)
+        self.assertTrue(all(a['type'] == 'Run' for a in activities))
+
+    def test_reloads_changed_store(self):
+        _, output = self.query('--format', 'ndjson')
+        count = len(output.splitlines())
+        conn = store.connect(self.store_path)
+        store.upsert(conn, [{**load_example_data()[0], 'id': 1, 'name': 'New one'}])
+        conn.close()
+        _, output = self.query('--format', 'ndjson')
+        self.assertEqual(len(output.splitlines()), count + 1)
+
+    def test_error(self):
+        error, output = self.query('--sortby', 'nope:asc')
+        self.assertIn('nope', error)
+        self.assertEqual(output, b'')
+
+    def test_refuses_other_subcommands(self):
+        error, _ = self.query('download')
+        self.assertIn('not served', error)
+
+    def test_invalid_arguments(self):
+        error, _ = self.query('--limit', 'many')
+        self.assertIn('invalid int value', error)
+
+    def test_output_file_relative_to_client(self):
+        with mock.patch('os.getcwd', return_value=self.dir):
+            error, _ = self.query('--format', 'csv', '-o', 'out.csv')
+        self.assertIsNone(error)
+        self.assertTrue(os.path.exists(os.path.join(self.dir, 'out.csv')))
+
+    def test_forward_without_daemon(self):
+        self.assertFalse(daemon.forward(['--limit', '1'], os.path.join(self.dir, 'none.sock')))
+
+
+class TestShell(StoreTestCase):
+    def run_shell(self, *lines):
+        output = io.StringIO()
+        with mock.patch('sys.stdout', output), mock.patch('sys.stderr', io.StringIO()):
+            shell = Shell(stdout=output)
+            for line in lines:
+                if shell.onecmd(line):
+                    return output.getvalue(), True
+        return output.getvalue(), False
+
+    def test_query(self):
+        output, _ = self.run_shell('--format json --type run')
+        self.assertTrue(all(a['type'] == 'Run' for a in json.loads(output)))
+
+    def test_invalid_line_keeps_shell(self):
+        output, stopped = self.run_shell('--limit many', "--name 'unbalanced",
+                                         '--sortby nope:asc', 'exit')
+        self.assertIn('KeyError', output)
+        self.assertTrue(stopped)
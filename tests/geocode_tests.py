@@ -0,0 +1,86 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import nominatim, store
+
+GIRONA = b"""<?xml version="1.0" encoding="UTF-8"?>
+<reversegeocode><result>Girona</result><addressparts>
+<town>Girona</town><country>Espa\xc3\xb1a</country></addressparts></reversegeocode>"""
+SEA = b"""<?xml version="1.0" encoding="UTF-8"?>
+<reversegeocode><error>Unable to geocode</error></reversegeocode>"""
+
+
+def activity(activity_id, latlng):
+    return {'id': activity_id, 'name': 'Run', 'type': 'Run', 'distance': 1000.0,
+            'moving_time': 300, 'total_elevation_gain': 0.0, 'average_speed': 3.3,
+            'start_date': '2023-01-01T10:00:00Z', 'start_date_local': '2023-01-01T11:00:00Z',
+            'start_latlng': latlng}
+
+
+def response(content):
+    return mock.Mock(content=content, raise_for_status=mock.Mock())
+
+
+class TestGetLocation(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(nominatim.limiter, 'acquire')
+        self.acquire = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_town_used_as_city(self):
+        session = mock.Mock(get=mock.Mock(return_value=response(GIRONA)))
+        self.assertEqual(nominatim.get_location(41.98, 2.82, session), ('España', 'Girona'))
+        self.acquire.assert_called_once()
+
+    def test_unknown_place(self):
+        session = mock.Mock(get=mock.Mock(return_value=response(SEA)))
+        self.assertEqual(nominatim.get_location(40.0, 5.0, session), (None, None))
+
+
+class TestAnnotate(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.conn = store.connect(os.path.join(self.tmp_dir.name, 'activities.db'))
+        self.addCleanup(self.conn.close)
+        patcher = mock.patch('src.nominatim.get_location', return_value=('España', 'Girona'))
+        self.get_location = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nearby_starts_looked_up_once(self):
+        store.upsert(self.conn, [activity(1, [41.9821, 2.8241]), activity(2, [41.9822, 2.8239]),
+                                 activity(3, None)])
+        self.assertEqual(nominatim.annotate(self.conn), 2)
+        self.get_location.assert_called_once()
+        located = [(a['id'], a.get('country'), a.get('city')) for a in store.select(self.conn)]
+        self.assertEqual(located, [(1, 'España', 'Girona'), (2, 'España', 'Girona'),
+                                   (3, None, None)])
+
+    def test_cached_cells_not_requested_again(self):
+        store.upsert(self.conn, [activity(1, [41.9821, 2.8241])])
+        nominatim.annotate(self.conn)
+        store.upsert(self.conn, [activity(2, [41.9822, 2.8239])])
+        self.assertEqual(nominatim.annotate(self.conn), 1)
+        self.get_location.assert_called_once()
+
+    def test_location_kept_when_activity_downloaded_again(self):
+        store.upsert(self.conn, [activity(1, [41.9821, 2.8241])])
+        nominatim.annotate(self.conn)
+        store.upsert(self.conn, [{**activity(1, [41.9821, 2.8241]), 'name': 'Renamed'}])
+        self.assertEqual(nominatim.annotate(self.conn), 0)
+        data = json.loads(self.conn.execute('SELECT data FROM activities').fetchone()[0])
+        self.assertEqual((data['name'], data['country']), ('Renamed', 'España'))
+
+    def test_unknown_place_not_retried(self):
+        self.get_location.return_value = (None, None)
+        store.upsert(self.conn, [activity(1, [40.0, 5.0])])
+        nominatim.annotate(self.conn)
+        self.assertEqual(nominatim.annotate(self.conn), 0)
+        self.assertIsNone(store.select(self.conn)[0]['country'])
+
+
+if __name__ == '__main__':
+    unittest.main()
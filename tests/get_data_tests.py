@@ -0,0 +1,161 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+
+from src import api, get_data, store
+from src.load_activities import load
+
+
+def load_example_data():
+    with open('tests/example_data.json') as f:
+        return json.load(f)
+
+
+class FakeSession:
+    """Session serving `num_pages` full pages, the last one `last_size` long when given,
+    followed by empty ones."""
+    def __init__(self, num_pages, last_size=None):
+        self.num_pages = num_pages
+        self.last_size = last_size
+        self.requested = []
+        self.authorization = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def request(self, method, url, params, headers):
+        self.requested.append(params['page'])
+        self.authorization = headers['Authorization']
+        size = params['per_page'] if params['page'] <= self.num_pages else 0
+        if params['page'] == self.num_pages and self.last_size is not None:
+            size = self.last_size
+        page = [{'id': params['page']}] * size
+        return mock.Mock(status_code=200, headers={}, json=mock.Mock(return_value=page))
+
+
+class TestFetchPages(unittest.TestCase):
+    def fetch(self, num_pages, params=None, last_size=None):
+        session = FakeSession(num_pages, last_size)
+        with mock.patch('requests.Session', return_value=session):
+            pages = list(get_data.fetch_pages({'access_token': 'abc'}, params))
+        return pages, session
+
+    def test_no_activities(self):
+        pages, _ = self.fetch(0)
+        self.assertEqual(pages, [])
+
+    def test_pages_in_order_past_old_cap(self):
+        pages, session = self.fetch(25)
+        self.assertEqual([page[0]['id'] for page in pages], list(range(1, 26)))
+        self.assertEqual(session.authorization, 'Bearer abc')
+
+    def test_stops_at_first_empty_page(self):
+        _, session = self.fetch(3)
+        self.assertLessEqual(max(session.requested), 3 + 2 * get_data.PAGE_WORKERS)
+
+    def test_stops_at_short_page(self):
+        pages, session = self.fetch(3, last_size=7)
+        self.assertEqual([len(page) for page in pages], [get_data.PAGE_SIZE] * 2 + [7])
+        self.assertLess(max(session.requested), 3 + get_data.PAGE_WORKERS)
+
+    def test_incremental_sync_without_news_single_request(self):
+        pages, session = self.fetch(0, params={'after': 1})
+        self.assertEqual(pages, [])
+        self.assertEqual(session.requested, [1])
+
+    def test_incremental_sync_fans_out_after_full_page(self):
+        pages, session = self.fetch(6, params={'after': 1}, last_size=1)
+        self.assertEqual([page[0]['id'] for page in pages], list(range(1, 7)))
+        self.assertLess(max(session.requested), 6 + get_data.PAGE_WORKERS)
+
+
+class TestGetUser(unittest.TestCase):
+    def test_error_response_raises(self):
+        response = requests.Response()
+        response.status_code = 401
+        with mock.patch.object(get_data, 'get_access_token', return_value={'access_token': 'a'}), \
+                mock.patch('src.api.get', return_value=response):
+            self.assertRaises(requests.HTTPError, get_data.get_user)
+
+
+class TestIncrementalDownload(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.store_path = os.path.join(self.tmp_dir.name, 'activities.db')
+        snapshot_path = os.path.join(self.tmp_dir.name, 'activities.snapshot')
+        for patcher in (mock.patch('src.store.STORE_PATH', self.store_path),
+                        mock.patch('src.snapshot.STORE_PATH', self.store_path),
+                        mock.patch('src.snapshot.SNAPSHOT_PATH', snapshot_path),
+                        mock.patch.object(get_data, 'refresh_athlete'),
+                        mock.patch.object(get_data, 'get_access_token',
+                                          return_value={'access_token': 'abc'})):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def stored_ids(self):
+        return sorted(activity['id'] for activity in load())
+
+    def test_empty_storage_downloads_everything(self):
+        data = load_example_data()
+        with mock.patch.object(get_data, 'fetch_pages', return_value=iter([data])) as fetch:
+            get_data.download()
+        fetch.assert_called_once_with({'access_token': 'abc'}, {})
+        self.assertEqual(self.stored_ids(), sorted(a['id'] for a in data))
+
+    def test_only_newer_activities_requested(self):
+        old, new = load_example_data()[1], load_example_data()[0]
+        conn = store.connect()
+        store.upsert(conn, [old])
+        after = store.newest_start(conn)
+        conn.close()
+        with mock.patch.object(get_data, 'fetch_pages', return_value=iter([[old, new]])) as fetch:
+            get_data.download()
+        fetch.assert_called_once_with({'access_token': 'abc'}, {'after': after - 1})
+        self.assertEqual(self.stored_ids(), sorted([old['id'], new['id']]))
+
+    def test_athlete_failure_keeps_download(self):
+        data = load_example_data()
+        get_data.refresh_athlete.side_effect = requests.HTTPError('401 Client Error')
+        output = io.StringIO()
+        with mock.patch.object(get_data, 'fetch_pages', return_value=iter([data])), \
+                mock.patch('sys.stdout', output):
+            get_data.download()
+        self.assertIn('Warning: athlete profile not refreshed', output.getvalue())
+        self.assertIn('Download successful', output.getvalue())
+        self.assertEqual(self.stored_ids(), sorted(a['id'] for a in data))
+
+    def test_quota_exhausted_keeps_synced_pages(self):
+        data = load_example_data()
+
+        def pages(*args):
+            yield data[:1]
+            raise api.RateLimitExceeded('Daily Strava API quota exhausted, try again tomorrow.')
+        output = io.StringIO()
+        with mock.patch.object(get_data, 'fetch_pages', side_effect=pages), \
+                mock.patch('sys.stdout', output):
+            get_data.download()
+        self.assertIn('run download --full again', output.getvalue())
+        self.assertIn('Download successful, 1 activities synced', output.getvalue())
+        self.assertEqual(self.stored_ids(), [data[0]['id']])
+
+    def test_full_download_clears_storage(self):
+        old, new = load_example_data()[1], load_example_data()[0]
+        conn = store.connect()
+        store.upsert(conn, [old])
+        conn.close()
+        with mock.patch.object(get_data, 'fetch_pages', return_value=iter([[new]])):
+            get_data.download(full=True)
+        self.assertEqual(self.stored_ids(), [new['id']])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,162 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+
+from src import store
+from src.http_api import Activities, Handler, Server
+from src.table import ActivityTable
+from src.utils import add_pace_attribute
+
+
+def load_example_data():
+    with open('tests/example_data.json') as f:
+        return json.load(f)
+
+
+class TestHttpApi(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+        self.store_path = os.path.join(self.dir, 'activities.db')
+        conn = store.connect(self.store_path)
+        store.upsert(conn, load_example_data())
+        conn.close()
+        for patcher in [mock.patch('src.store.STORE_PATH', self.store_path),
+                        mock.patch('src.snapshot.STORE_PATH', self.store_path),
+                        mock.patch('src.snapshot.SNAPSHOT_PATH',
+                                   os.path.join(self.dir, 'snapshot'))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(Handler, 'log_message')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        server = self.server = Server(('127.0.0.1', 0), Activities(self.dir, self.store_path))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    def get(self, path):
+        """(status, decoded json) of a GET request."""
+        try:
+            with urllib.request.urlopen(self.url + path) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def test_all_activities(self):
+        status, body = self.get('/activities')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body['activities']), len(load_example_data()))
+        self.assertIsNone(body['next'])
+
+    def test_filters(self):
+        _, body = self.get('/activities?type=run&distance=%3E+10&sortby=distance:desc')
+        distances = [a['distance'] for a in body['activities']]
+        self.assertTrue(distances)
+        self.assertEqual(distances, sorted(distances, reverse=True))
+        self.assertTrue(all(a['type'] == 'Run' and a['distance'] > 10000
+                            for a in body['activities']))
+
+    def test_pages(self):
+        _, everything = self.get('/activities?sortby=distance:desc')
+        ids, path = [], '/activities?sortby=distance:desc&per_page=1'
+        while path:
+            _, body = self.get(path)
+            ids += [a['id'] for a in body['activities']]
+            path = body['next']
+        self.assertEqual(ids, [a['id'] for a in everything['activities']])
+
+    def test_limit_and_pages(self):
+        _, body = self.get('/activities?limit=1&per_page=1')
+        self.assertEqual(len(body['activities']), 1)
+        self.assertIsNone(body['next'])
+
+    def test_stats(self):
+        status, body = self.get('/stats?weekly=2&yearly=1&type=run')
+        self.assertEqual(status, 200)
+        self.assertEqual([len(body['week']), len(body['year'])], [2, 1])
+        self.assertEqual(set(body['week'][0]), {'start', 'end', 'covered_distance',
+                                                'moving_time', 'covered_elevation'})
+
+    def test_stats_of_served_activities(self):
+        today = datetime.date.today().isoformat()
+        activity = {**load_example_data()[1], 'start_date_local': f'{today}T10:00:00Z'}
+        table = ActivityTable(add_pace_attribute([activity]))
+        with mock.patch.object(self.server.activities, 'get', return_value=table):
+            _, body = self.get('/stats?weekly=1&type=run')
+        self.assertEqual(body['week'][0]['covered_distance'],
+                         round(activity['distance'] / 1000, 2))
+
+    def test_bad_requests(self):
+        for path in ['/activities?bogus=1', '/activities?limit=x', '/activities?page=0',
+                     '/activities?sortby=nope:asc', '/stats', '/stats?page=2',
+                     '/activities?radius=5', '/activities?near=49.2,16.6&radius=0']:
+            status, body = self.get(path)
+            self.assertEqual(status, 400, path)
+            self.assertIn('error', body)
+        self.assertEqual(self.get('/nowhere')[0], 404)
+
+    def test_server_error(self):
+        with mock.patch.object(self.server.activities, 'get', side_effect=RuntimeError('boom')), \
+                mock.patch.object(Handler, 'log_error'):
+            status, body = self.get('/activities')
+        self.assertEqual(status, 500)
+        self.assertEqual(body, {'error': 'RuntimeError: boom'})
+
+    def test_missing_file_is_server_error(self):
+        missing = FileNotFoundError("No such file or directory: 'config.json'")
+        with mock.patch('src.parse.query_gear_by_name', side_effect=missing), \
+                mock.patch.object(Handler, 'log_error'):
+            status, _ = self.get('/activities?gear=bike')
+        self.assertEqual(status, 500)
+
+    def test_no_store_unavailable(self):
+        empty_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, empty_dir)
+        self.server.activities = Activities(empty_dir, os.path.join(empty_dir, 'activities.db'))
+        status, body = self.get('/activities')
+        self.assertEqual(status, 503)
+        self.assertIn('run the download command first', body['error'])
+
+    def test_reloads_legacy_pages(self):
+        _, body = self.get('/activities')
+        count = len(body['activities'])
+        with open(os.path.join(self.dir, 'activities_1.json'), 'w') as f:
+            json.dump([{**load_example_data()[0], 'id': 1, 'name': 'Imported'}], f)
+        _, body = self.get('/activities')
+        self.assertEqual(len(body['activities']), count + 1)
+        self.assertIn('Imported', [a['name'] for a in body['activities']])
+
+
+class TestActivities(unittest.TestCase):
+    def test_no_store(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        store_path = os.path.join(tmp_dir, 'activities.db')
+        self.assertIsNone(Activities(tmp_dir, store_path).get())
+        self.assertFalse(os.path.exists(store_path))
+
+    def test_reloads_only_on_change(self):
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        store_path = os.path.join(tmp_dir, 'activities.db')
+        conn = store.connect(store_path)
+        store.upsert(conn, load_example_data())
+        conn.close()
+        with mock.patch('src.snapshot.SNAPSHOT_PATH', os.path.join(tmp_dir, 'snapshot')):
+            activities = Activities(tmp_dir, store_path)
+            table = activities.get()
+            self.assertIs(activities.get(), table)
+            conn = store.connect(store_path)
+            store.upsert(conn, [{**load_example_data()[0], 'id': 1}])
+            conn.close()
+            self.assertEqual(len(activities.get()), len(table) + 1)
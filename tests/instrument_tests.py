@@ -0,0 +1,128 @@
+import io
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from unittest import mock
+
+from src import api, instrument, parse, store
+from src.query import execute_table
+from src.table import ActivityTable
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        self.now += 1.0
+        return self.now
+
+
+class InstrumentTestCase(unittest.TestCase):
+    def setUp(self):
+        self.timings = instrument.enable(FakeClock())
+        self.addCleanup(instrument.disable)
+
+
+class TestTimings(InstrumentTestCase):
+    def test_nested_stages(self):
+        with instrument.stage('query'):
+            with instrument.stage('filter'):
+                pass
+        with instrument.stage('output'):
+            pass
+        self.assertEqual(self.timings.stages,
+                         [[0, 'query', 3.0], [1, 'filter', 1.0], [0, 'output', 1.0]])
+
+    def test_stage_failing(self):
+        with self.assertRaises(ValueError), instrument.stage('query'):
+            raise ValueError
+        self.assertEqual(self.timings.stages, [[0, 'query', 1.0]])
+        self.assertEqual(self.timings.depth, 0)
+
+    def test_filters_add_up(self):
+        instrument.filtered('type', 10, 4)
+        instrument.filtered('type', 5, 1)
+        self.assertEqual(self.timings.filters, {'type': [15, 5]})
+
+    def test_report(self):
+        with instrument.stage('query'):
+            pass
+        instrument.filtered('type', 10, 4)
+        instrument.request('GET', 'https://example.com', 200, 0.25)
+        output = io.StringIO()
+        instrument.report(output)
+        lines = output.getvalue().splitlines()
+        self.assertIn('1000.0 ms', lines[1])
+        self.assertEqual(lines[3].split(), ['type', '10', '4'])
+        self.assertIn('HTTP requests: 1, total 250.0 ms', lines[4])
+
+    def test_disabled(self):
+        instrument.disable()
+        with instrument.stage('query'):
+            instrument.filtered('type', 10, 4)
+        self.assertEqual(self.timings.stages, [])
+        self.assertEqual(self.timings.filters, {})
+
+
+class TestHooks(InstrumentTestCase):
+    def test_api_requests(self):
+        session = mock.Mock()
+        session.request.return_value = mock.Mock(status_code=200, headers={})
+        scheduler = api.RequestScheduler(sleep=lambda seconds: None)
+        scheduler.request('GET', 'https://example.com', session=session)
+        self.assertEqual([request[:3] for request in self.timings.requests],
+                         [('GET', 'https://example.com', 200)])
+
+    def test_filter_rows(self):
+        with open('tests/example_data.json') as f:
+            table = ActivityTable(json.load(f))
+        argv = ['--type', 'run', '--distance', '> 10']
+        plan = parse.build_query_plan(parse.parse_cli_args(argv))
+        selected = execute_table(plan, table)
+        (type_label, type_rows), (distance_label, distance_rows) = self.timings.filters.items()
+        self.assertEqual(type_label, "type IN ('Run')")
+        self.assertEqual(type_rows, [len(table), sum(a['type'] == 'Run' for a in table)])
+        self.assertTrue(distance_label.startswith('distance >= '))
+        self.assertEqual(distance_rows, [type_rows[1], len(selected)])
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.dir = tmp_dir.name
+        store_path = os.path.join(self.dir, 'activities.db')
+        conn = store.connect(store_path)
+        with open('tests/example_data.json') as f:
+            store.upsert(conn, json.load(f))
+        conn.close()
+        for patcher in [mock.patch('src.store.STORE_PATH', store_path),
+                        mock.patch('src.snapshot.STORE_PATH', store_path),
+                        mock.patch('src.snapshot.SNAPSHOT_PATH',
+                                   os.path.join(self.dir, 'snapshot'))]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(instrument.disable)
+
+    def run_main(self, *argv):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with mock.patch('sys.argv', ['strava-cli', *argv]), mock.patch('sys.stdout', stdout), \
+                mock.patch('sys.stderr', stderr):
+            parse.main()
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_timings(self):
+        stdout, stderr = self.run_main('--timings', '--format', 'json', '--type', 'run')
+        self.assertTrue(all(a['type'] == 'Run' for a in json.loads(stdout)))
+        self.assertIn('query plan', stderr)
+        self.assertIn("type IN ('Run')", stderr)
+
+    def test_profile(self):
+        path = os.path.join(self.dir, 'out.prof')
+        _, stderr = self.run_main('--profile', path, '--format', 'json')
+        self.assertEqual(stderr, '')
+        functions = {function for _, _, function in pstats.Stats(path).stats}
+        self.assertIn('dispatch', functions)
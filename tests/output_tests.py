@@ -0,0 +1,92 @@
+import csv
+import importlib.util
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import output
+from src.utils import add_pace_attribute
+
+
+def load_example_data():
+    with open('tests/example_data.json') as f:
+        return add_pace_attribute(json.load(f))
+
+
+class TestPlainPrint(unittest.TestCase):
+    def test_header_only(self):
+        file = io.StringIO()
+        output.plain_print([], file)
+        self.assertEqual(file.getvalue().split('\t')[:3], ['date', 'type', 'name'])
+
+    def test_one_line_per_activity(self):
+        file = io.StringIO()
+        output.plain_print(load_example_data(), file)
+        lines = file.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1].split('\t')[:4],
+                         ['2018-05-02 05:15:09', 'Ride', 'Happy Friday', '24.93'])
+
+    def test_name_with_line_break(self):
+        activity = load_example_data()[0]
+        activity['name'] = 'Happy\n\tFriday'
+        self.assertEqual(output.plain_row(activity)[2], 'Happy Friday')
+
+
+class TestJsonPrint(unittest.TestCase):
+    def test_empty(self):
+        file = io.StringIO()
+        output.json_print([], file)
+        self.assertEqual(json.loads(file.getvalue()), [])
+
+    def test_activities(self):
+        file = io.StringIO()
+        output.json_print(iter(load_example_data()), file)
+        self.assertEqual(json.loads(file.getvalue()), load_example_data())
+
+
+class TestNdjsonPrint(unittest.TestCase):
+    def test_activities(self):
+        file = io.StringIO()
+        output.ndjson_print(iter(load_example_data()), file)
+        lines = file.getvalue().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], load_example_data())
+
+
+class TestCsvPrint(unittest.TestCase):
+    def test_raw_values(self):
+        file = io.StringIO()
+        output.csv_print(load_example_data(), file)
+        rows = list(csv.DictReader(io.StringIO(file.getvalue())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]['name'], 'Happy Friday')
+        self.assertEqual(float(rows[0]['distance']), 24931.4)
+        self.assertEqual(rows[0]['start_lat'], '')
+
+    def test_flattened_coordinates(self):
+        activity = load_example_data()[0]
+        activity['start_latlng'] = [49.1, 16.6]
+        row = dict(zip([column for column, _ in output.EXPORT_COLUMNS],
+                       output.export_row(activity)))
+        self.assertEqual((row['start_lat'], row['start_lng']), (49.1, 16.6))
+
+
+@unittest.skipUnless(importlib.util.find_spec('pyarrow'), 'pyarrow not installed')
+class TestParquetPrint(unittest.TestCase):
+    def test_write_to_file(self):
+        import pyarrow.parquet as pq
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'activities.parquet')
+            with mock.patch.object(output, 'BATCH_SIZE', 1):
+                output.write('parquet', iter(load_example_data()), path)
+            table = pq.read_table(path)
+        self.assertEqual(table.num_rows, 2)
+        self.assertEqual(table.column('name').to_pylist(), ['Happy Friday', 'Bondcliff'])
+        self.assertEqual(table.schema.field('moving_time').type, 'int64')
+
+
+if __name__ == '__main__':
+    unittest.main()
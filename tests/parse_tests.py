@@ -46,6 +46,13 @@ class TestValidateAttrFilters(unittest.TestCase):
         result = parse.validate_attr_filter('<= 5:20', 'average_pace')
         self.assertEqual(expected, result)
 
+    def test_range(self):
+        self.assertEqual(parse.validate_attr_filter('10..42', 'distance'),
+                         {'symbol': '..', 'value': (10.0, 42.0)})
+        self.assertEqual(parse.validate_attr_filter('..5:00', 'average_pace'),
+                         {'symbol': '..', 'value': (None, datetime.timedelta(minutes=5))})
+        self.assertRaises(ValueError, parse.validate_attr_filter, '..', 'distance')
+
 
 class TestFilterActivityTypes(unittest.TestCase):
     def test_incorrect_act_type(self):
@@ -0,0 +1,98 @@
+import datetime
+import operator
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from src import store
+from src.predicates import OPERATORS, compile_filter, raw_value
+from src.table import ActivityTable
+
+
+def random_table():
+    rng = np.random.default_rng(7)
+    count = 4000
+    distances = np.round(rng.uniform(0, 50000, count), 1)
+    # values right at display rounding boundaries
+    distances[:500] = np.arange(9990, 10490, 1.0)
+    distances[500:600] = 10005 + np.arange(-50, 50) * 1e-9
+    speeds = np.round(rng.uniform(0, 12, count), 3)
+    speeds[:10] = 0
+    speeds[10:300] = 1000 / np.arange(250, 540)
+    speeds[300:400] = 1000 / 330 + np.arange(-50, 50) * 1e-15
+    activities = [{'id': index, 'distance': float(distance), 'average_speed': float(speed),
+                   'moving_time': int(rng.integers(0, 10000)),
+                   'total_elevation_gain': float(rng.integers(0, 2000)),
+                   'average_heartrate': None if index % 13 == 0 else float(rng.integers(90, 190)),
+                   'start_date_local': f'2023-05-{index % 28 + 1:02}T{index % 24:02}:00:00Z'}
+                  for index, (distance, speed) in enumerate(zip(distances, speeds))]
+    return activities, ActivityTable(activities)
+
+
+FILTERS = [('distance', 10), ('distance', 10.01), ('distance', 10.005), ('distance', 24.93),
+           ('average_speed', 10.8), ('average_speed', 36.36),
+           ('average_pace', datetime.timedelta(minutes=5, seconds=30)),
+           ('average_pace', datetime.timedelta(0)),
+           ('moving_time', datetime.timedelta(seconds=4500)),
+           ('total_elevation_gain', 1000), ('average_heartrate', 150),
+           ('start_date_local', datetime.date(2023, 5, 10))]
+
+
+class TestCompileFilter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.activities, cls.table = random_table()
+
+    def displayed_mask(self, attribute, symbol, value):
+        with np.errstate(invalid='ignore'):
+            values = self.table.formatted(attribute)
+            value = raw_value(value)
+            if isinstance(value, datetime.date):
+                value = np.datetime64(value, 'D')
+            return OPERATORS[symbol](values, value)
+
+    def test_same_as_comparing_displayed_values(self):
+        for attribute, value in FILTERS:
+            for symbol in OPERATORS:
+                with self.subTest(attribute=attribute, symbol=symbol, value=value):
+                    mask = compile_filter(attribute, symbol, value).mask(self.table)
+                    np.testing.assert_array_equal(
+                        mask, self.displayed_mask(attribute, symbol, value))
+
+    def test_range(self):
+        mask = compile_filter('distance', '..', (10, 42)).mask(self.table)
+        expected = (self.displayed_mask('distance', '>=', 10) &
+                    self.displayed_mask('distance', '<=', 42))
+        np.testing.assert_array_equal(mask, expected)
+        mask = compile_filter('distance', '..', (None, 42)).mask(self.table)
+        np.testing.assert_array_equal(mask, self.displayed_mask('distance', '<=', 42))
+
+    def test_sql_same_as_mask(self):
+        with tempfile.TemporaryDirectory() as directory:
+            conn = store.connect(os.path.join(directory, 'activities.db'))
+            try:
+                store.upsert(conn, self.activities)
+                for attribute, value in FILTERS:
+                    for symbol in OPERATORS:
+                        predicate = compile_filter(attribute, symbol, value)
+                        condition, params = predicate.sql()
+                        ids = [row[0] for row in conn.execute(
+                            f'SELECT id FROM activities WHERE {condition} ORDER BY id', params)]
+                        with self.subTest(attribute=attribute, symbol=symbol, value=value):
+                            self.assertEqual(
+                                ids, np.flatnonzero(predicate.mask(self.table)).tolist())
+            finally:
+                conn.close()
+
+    def test_incorrect_attribute(self):
+        self.assertRaises(KeyError, compile_filter, 'abc', '>', 1)
+
+    def test_operators_used(self):
+        predicate = compile_filter('distance', '>', 10)
+        self.assertEqual([compare for compare, _ in predicate.comparisons], [operator.ge])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,201 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src import parse, store
+from src.query import QueryPlan, execute, execute_table, stream
+from src.table import ActivityTable
+
+
+def load_example_data():
+    with open('tests/example_data.json') as f:
+        return json.load(f)
+
+
+class QueryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.conn = store.connect(os.path.join(self.tmp_dir.name, 'activities.db'))
+        self.addCleanup(self.conn.close)
+        store.upsert(self.conn, load_example_data())
+        self.table = ActivityTable.from_json(store.iterate_raw(self.conn))
+
+    def run_query(self, *argv, gear=None):
+        """Names of selected activities, checking the store, in memory and streamed paths agree."""
+        plan = parse.build_query_plan(parse.parse_cli_args(list(argv)), gear)
+        from_store = [activity['name'] for activity in execute(plan, self.conn)]
+        in_memory = [activity['name'] for activity in execute_table(plan, self.table)]
+        streamed = [activity['name'] for activity in stream(plan, self.conn, chunk_size=1)]
+        self.assertEqual(from_store, in_memory)
+        self.assertEqual(from_store, streamed)
+        return from_store
+
+
+class TestQueryPlan(unittest.TestCase):
+    def test_empty_plan(self):
+        plan = QueryPlan()
+        self.assertIsNone(plan.sql_where())
+
+    def test_sort_condition(self):
+        plan = QueryPlan().sort_by('distance', reverse=True)
+        self.assertEqual(plan.sql_where(), '(distance IS NOT NULL AND distance != 0)')
+        self.assertEqual(plan.sql_order_by(), 'distance DESC, id')
+
+    def test_conditions_joined(self):
+        plan = (QueryPlan().where('type = ?', 'Run', mask=None)
+                .where('distance > ?', 10, mask=None))
+        self.assertEqual(plan.sql_where(), '(type = ?) AND (distance > ?)')
+        self.assertEqual(plan.params, ['Run', 10])
+
+
+class TestBuildQueryPlan(QueryTestCase):
+    def test_no_filters(self):
+        self.assertEqual(set(self.run_query()), {'Happy Friday', 'Bondcliff'})
+
+    def test_type_pushed_down(self):
+        plan = parse.build_query_plan(parse.parse_cli_args(['--type', 'run']))
+        self.assertEqual(plan.predicates, [])
+        self.assertEqual(self.run_query('--type', 'run'), ['Bondcliff'])
+
+    def test_name(self):
+        self.assertEqual(self.run_query('--name', 'happy'), ['Happy Friday'])
+
+    def test_missing_gear(self):
+        self.assertEqual(self.run_query('--gear', 'unknown'), [])
+
+    def test_gear(self):
+        gear = {'id': 'b12345678987654321'}
+        self.assertEqual(self.run_query('--gear', 'bike', gear=gear), ['Happy Friday'])
+
+    def test_attribute_filter(self):
+        self.assertEqual(self.run_query('--distance', '> 24'), ['Happy Friday'])
+
+    def test_multiple_attribute_filters(self):
+        self.assertEqual(self.run_query('--distance', '> 1', '< 24'), ['Bondcliff'])
+
+    def test_sort(self):
+        self.assertEqual(self.run_query('--sortby', 'distance:asc'), ['Bondcliff', 'Happy Friday'])
+        self.assertEqual(self.run_query('--sortby', 'distance:desc'),
+                         ['Happy Friday', 'Bondcliff'])
+
+    def test_limit_with_sort(self):
+        self.assertEqual(self.run_query('--sortby', 'date:desc', '--limit', '1'), ['Happy Friday'])
+
+    def test_name_pushed_down(self):
+        plan = parse.build_query_plan(parse.parse_cli_args(['--name', 'friday']))
+        self.assertEqual(plan.predicates, [])
+        self.assertEqual(self.run_query('--name', 'FRÍDAY'), ['Happy Friday'])
+        self.assertEqual(self.run_query('--name', '^bond'), ['Bondcliff'])
+
+    def test_attribute_filters_pushed_down(self):
+        plan = parse.build_query_plan(parse.parse_cli_args(['--distance', '24..25']))
+        self.assertEqual(plan.predicates, [])
+        self.assertEqual(self.run_query('--distance', '24..25'), ['Happy Friday'])
+        self.assertEqual(self.run_query('--distance', '== 24.93'), ['Happy Friday'])
+        self.assertEqual(self.run_query('--date', '== 2018-05-02'), ['Happy Friday'])
+
+    def test_multiple_sort_keys(self):
+        plan = parse.build_query_plan(parse.parse_cli_args(['--sortby',
+                                                            'distance:desc,date:asc']))
+        self.assertEqual(plan.sql_order_by(), 'distance DESC, start_date_local ASC NULLS LAST, id')
+        self.assertEqual(self.run_query('--sortby', 'date:asc,distance:desc'),
+                         ['Bondcliff', 'Happy Friday'])
+        self.assertEqual(self.run_query('--sortby', 'distance:desc', '--limit', '1'),
+                         ['Happy Friday'])
+
+    def test_missing_secondary_key_last(self):
+        bondcliff = load_example_data()[1]
+        twin = {key: value for key, value in bondcliff.items() if key != 'average_heartrate'}
+        store.upsert(self.conn, [{**twin, 'id': 1, 'name': 'No heartrate'}])
+        self.table = ActivityTable.from_json(store.iterate_raw(self.conn))
+        self.assertEqual(self.run_query('--sortby', 'distance:asc,average_heartrate:asc'),
+                         ['Bondcliff', 'No heartrate', 'Happy Friday'])
+        self.assertEqual(self.run_query('--sortby', 'average_heartrate:asc'),
+                         ['Happy Friday', 'Bondcliff'])
+
+    def test_limit_with_predicate(self):
+        self.assertEqual(len(self.run_query('--name', 'a', '--limit', '1')), 1)
+
+    def test_limit_with_predicate_stops_reading(self):
+        plan = QueryPlan().filter(lambda table: np.ones(len(table), dtype=bool))
+        plan.limit = 1
+        read, store_iterate = [], store.iterate
+
+        def iterate(*args):
+            for activity in store_iterate(*args):
+                read.append(activity['id'])
+                yield activity
+        with mock.patch('src.query.store.iterate', iterate):
+            selected = execute(plan, self.conn, chunk_size=1)
+        self.assertEqual(len(selected), 1)
+        self.assertEqual(len(read), 1)
+
+    def test_zero_limit_rejected(self):
+        with mock.patch('sys.stderr', io.StringIO()):
+            self.assertRaises(SystemExit, parse.parse_cli_args, ['--limit', '0'])
+
+    def test_negative_periods_rejected(self):
+        for flag in ['--weekly', '--monthly', '--yearly']:
+            with mock.patch('sys.stderr', io.StringIO()):
+                self.assertRaises(SystemExit, parse.parse_cli_args, [flag, '-2'])
+
+    def test_uses_rollups(self):
+        def plan(*argv):
+            return parse.build_query_plan(parse.parse_cli_args(list(argv)), {'id': 'b1'})
+        self.assertTrue(plan().uses_rollups())
+        self.assertTrue(plan('--type', 'run', '--gear', 'bike').uses_rollups())
+        self.assertFalse(plan('--name', 'happy').uses_rollups())
+        self.assertFalse(plan('--distance', '> 5').uses_rollups())
+        self.assertFalse(plan('--limit', '5').uses_rollups())
+
+    def test_incorrect_sort_arg(self):
+        args = parse.parse_cli_args(['--sortby', 'distance'])
+        self.assertRaises(ValueError, parse.build_query_plan, args)
+
+
+class TestLocationFilters(QueryTestCase):
+    def setUp(self):
+        super().setUp()
+        data = load_example_data()
+        # Happy Friday in Brno, Bondcliff in Girona
+        data[0]['start_latlng'], data[1]['start_latlng'] = [49.19, 16.61], [41.98, 2.82]
+        store.upsert(self.conn, data)
+        store.set_locations(self.conn, [('Česko', 'Brno', data[0]['id']),
+                                        ('España', 'Girona', data[1]['id'])])
+        self.table = ActivityTable.from_json(store.iterate_raw(self.conn))
+
+    def test_near(self):
+        self.assertEqual(self.run_query('--near', '49.2,16.6'), ['Happy Friday'])
+        self.assertEqual(self.run_query('--near', '49.3,16.6', '--radius', '5'), [])
+        self.assertEqual(set(self.run_query('--near', '45,10', '--radius', '1000')),
+                         {'Happy Friday', 'Bondcliff'})
+
+    def test_country_ignores_case_and_accents(self):
+        self.assertEqual(self.run_query('--country', 'espana'), ['Bondcliff'])
+        self.assertEqual(self.run_query('--city', 'BRNO'), ['Happy Friday'])
+        self.assertEqual(self.run_query('--city', 'Praha'), [])
+
+    def test_incorrect_coordinates(self):
+        for near in ['49.2', '95,10', 'home']:
+            args = parse.parse_cli_args(['--near', near])
+            self.assertRaises(ValueError, parse.build_query_plan, args)
+
+    def test_radius_without_near(self):
+        args = parse.parse_cli_args(['--radius', '10'])
+        self.assertRaises(ValueError, parse.build_query_plan, args)
+
+    def test_radius_not_positive(self):
+        for radius in ['0', '-5', 'far']:
+            with mock.patch('sys.stderr', io.StringIO()):
+                self.assertRaises(SystemExit, parse.parse_cli_args,
+                                  ['--near', '49.2,16.6', '--radius', radius])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from src import parse, routes
+
+HOME = (49.19, 16.61)
+
+
+def encode_polyline(points):
+    """Google polyline encoding, the inverse of routes.decode_polyline."""
+    text = []
+    previous = np.zeros(2, dtype=np.int64)
+    for point in np.round(np.asarray(points) * 1e5).astype(np.int64):
+        for delta in point - previous:
+            value = ~(delta << 1) if delta < 0 else delta << 1
+            while value >= 0x20:
+                text.append(chr((0x20 | (value & 0x1f)) + 63))
+                value >>= 5
+            text.append(chr(value + 63))
+        previous = point
+    return ''.join(text)
+
+
+def loop(radius, seed, direction=0.0):
+    """Circle through HOME with a little GPS noise."""
+    angles = np.linspace(0, 2 * np.pi, 200)
+    noise = np.random.default_rng(seed).normal(0, 0.0002, (200, 2))
+    lat = HOME[0] + radius * (np.sin(angles + direction) - np.sin(direction))
+    lon = HOME[1] + radius * 1.5 * (np.cos(angles + direction) - np.cos(direction))
+    return np.column_stack([lat, lon]) + noise
+
+
+def activity(activity_id, points):
+    return {'id': activity_id, 'map': {'summary_polyline': encode_polyline(points)}}
+
+
+class TestPolyline(unittest.TestCase):
+    def test_decode(self):
+        points = routes.decode_polyline('_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        np.testing.assert_allclose(points, [[38.5, -120.2], [40.7, -120.95], [43.252, -126.453]])
+
+    def test_round_trip(self):
+        points = np.round(loop(0.05, 1), 5)
+        np.testing.assert_allclose(routes.decode_polyline(encode_polyline(points)), points,
+                                   atol=1e-9)
+
+    def test_empty(self):
+        self.assertEqual(routes.decode_polyline('').shape, (0, 2))
+
+    def test_downsample_evenly_spaced(self):
+        points = routes.downsample(np.array([[0.0, 0.0], [0.0, 0.001], [0.0, 0.01]]), 11)
+        np.testing.assert_allclose(points[:, 1], np.linspace(0, 0.01, 11))
+
+
+class TestCluster(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'routes.pickle')
+        self.activities = ([activity(i, loop(0.05, i)) for i in range(1, 4)] +
+                           [activity(i, loop(0.05, i, direction=np.pi)) for i in range(4, 6)] +
+                           [activity(6, loop(0.02, 6)), {'id': 7, 'map': {}}])
+
+    def test_same_routes_grouped(self):
+        clusters = routes.cluster(routes.load_routes(self.activities, self.path))
+        self.assertEqual([sorted(ids) for ids in clusters], [[1, 2, 3], [4, 5], [6]])
+
+    def test_shared_start_alone_makes_no_candidate(self):
+        signatures = {route_id: routes.signature(points) for route_id, points
+                      in routes.load_routes(self.activities, self.path).items()}
+        pairs = {(a, b) for a, others in routes.candidates(signatures) for b in others}
+        self.assertEqual(pairs, {(1, 2), (1, 3), (2, 3), (4, 5)})
+
+    def test_polylines_decoded_once(self):
+        routes.load_routes(self.activities, self.path)
+        changed = [activity(1, loop(0.03, 1))] + self.activities[1:]
+        with mock.patch.object(routes, 'decode_polyline',
+                               wraps=routes.decode_polyline) as decode:
+            loaded = routes.load_routes(changed, self.path)
+        self.assertEqual(decode.call_count, 1)
+        self.assertEqual(sorted(loaded), [1, 2, 3, 4, 5, 6])
+
+
+class TestLike(unittest.TestCase):
+    def like(self, activity_id, stored=()):
+        activities = [activity(1, loop(0.05, 1)), activity(2, loop(0.05, 2)),
+                      {'id': 7, 'map': {}}]
+        output = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp_dir, \
+                mock.patch.object(routes, 'ROUTES_PATH', os.path.join(tmp_dir, 'routes.pickle')), \
+                mock.patch('src.load_activities.query', return_value=activities), \
+                mock.patch('src.load_activities.load', return_value=list(stored)), \
+                mock.patch('sys.stdout', output):
+            parse.dispatch(parse.parse_cli_args(['routes', '--like', str(activity_id)]))
+        return output.getvalue()
+
+    def test_no_map(self):
+        self.assertIn('Activity 7 has no map', self.like(7))
+
+    def test_filtered_out(self):
+        self.assertIn('Activity 8 is left out by the filters', self.like(8, stored=[{'id': 8}]))
+
+    def test_not_downloaded(self):
+        self.assertIn("Activity 9 isn't among the downloaded activities", self.like(9))
+
+
+if __name__ == '__main__':
+    unittest.main()
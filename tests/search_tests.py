@@ -0,0 +1,36 @@
+import unittest
+
+from src.search import NameIndex, is_literal
+
+NAMES = ['Ranní běh', 'Večerní BĚH do Brna', 'Morning Run', 'Bondcliff', None, 'Běžky na Šumavě']
+
+
+class TestNameIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = NameIndex(NAMES)
+
+    def test_literal(self):
+        self.assertTrue(is_literal('morning run'))
+        self.assertFalse(is_literal('^morning'))
+
+    def test_ignores_case_and_accents(self):
+        self.assertEqual(list(self.index.search('beh')), [0, 1])
+        self.assertEqual(list(self.index.search('BĚH')), [0, 1])
+        self.assertEqual(list(self.index.search('sumave')), [5])
+
+    def test_regular_expression(self):
+        self.assertEqual(list(self.index.search('^b')), [3, 5])
+        self.assertEqual(list(self.index.search('run|cliff')), [2, 3])
+
+    def test_trigram_index_gives_same_results(self):
+        patterns = ['beh', 'run', 'b', 'na', 'morning run', 'xyz', 'ni be', 'behh']
+        scanned = [list(self.index.search(pattern)) for pattern in patterns]
+        self.assertIsNotNone(self.index.postings)
+        self.assertEqual([list(self.index.search(pattern)) for pattern in patterns], scanned)
+
+    def test_mask(self):
+        self.assertEqual(list(self.index.mask('run')), [False, False, True, False, False, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import snapshot, store
+
+
+def load_example_data():
+    with open('tests/example_data.json') as f:
+        return json.load(f)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.store_path = os.path.join(self.tmp_dir.name, 'activities.db')
+        self.path = os.path.join(self.tmp_dir.name, 'cache', 'activities.snapshot')
+        conn = store.connect(self.store_path)
+        store.upsert(conn, load_example_data())
+        conn.close()
+
+    def load(self):
+        return snapshot.load(self.path, self.store_path)
+
+    def test_missing_snapshot(self):
+        self.assertIsNone(self.load())
+
+    def test_round_trip(self):
+        snapshot.refresh(self.path, self.store_path)
+        table = self.load()
+        self.assertEqual(sorted(a['name'] for a in table), ['Bondcliff', 'Happy Friday'])
+        self.assertEqual(table[0]['average_pace'], table[0]['average_speed'])
+        self.assertEqual(sorted(table.columns['distance'].tolist()),
+                         sorted(a['distance'] for a in load_example_data()))
+
+    def test_stale_after_store_change(self):
+        snapshot.refresh(self.path, self.store_path)
+        conn = store.connect(self.store_path)
+        store.clear(conn)
+        conn.close()
+        self.assertIsNone(self.load())
+
+    def test_version_mismatch(self):
+        snapshot.refresh(self.path, self.store_path)
+        with mock.patch.object(snapshot, 'SNAPSHOT_VERSION', snapshot.SNAPSHOT_VERSION + 1):
+            self.assertIsNone(self.load())
+
+    def test_corrupted_snapshot(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as f:
+            f.write(b'garbage')
+        self.assertIsNone(self.load())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+from src.spatial import GridIndex, haversine
+
+
+class TestHaversine(unittest.TestCase):
+    def test_known_distance(self):
+        # Brno to Prague, about 185 km
+        distance = haversine(49.1951, 16.6068, np.array([50.0755]), np.array([14.4378]))
+        self.assertAlmostEqual(float(distance[0]), 185, delta=2)
+
+
+class TestGridIndex(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.lats = rng.uniform(-89, 89, 5000)
+        self.lons = rng.uniform(-180, 180, 5000)
+        self.lats[:1000] = rng.uniform(49, 49.5, 1000)
+        self.lons[:1000] = rng.uniform(16.3, 16.9, 1000)
+        self.lats[::97] = np.nan
+        self.index = GridIndex(self.lats, self.lons)
+
+    def assert_same_as_scan(self, lat, lon, radius):
+        with np.errstate(invalid='ignore'):
+            expected = np.flatnonzero(haversine(lat, lon, self.lats, self.lons) <= radius)
+        np.testing.assert_array_equal(self.index.near(lat, lon, radius), expected)
+
+    def test_matches_full_scan(self):
+        for lat, lon, radius in [(49.2, 16.6, 5), (49.2, 16.6, 0.5), (49.2, 16.6, 300),
+                                 (0, 179.99, 200), (88.5, 0, 500), (10, 10, 0)]:
+            self.assert_same_as_scan(lat, lon, radius)
+
+    def test_empty(self):
+        index = GridIndex(np.array([]), np.array([]))
+        self.assertEqual(len(index.near(49.2, 16.6, 5)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from src import store
+
+HEAVY_MODULES = ['requests', 'rich', 'numpy', 'sqlite3']
+
+
+def imported_modules(code, env=None):
+    """Heavy modules present in sys.modules after running code in a fresh interpreter."""
+    code += (f"\nimport sys\n"
+             f"print('modules:' + ','.join(m for m in {HEAVY_MODULES} if m in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True, env=env)
+    modules = result.stdout.splitlines()[-1].removeprefix('modules:')
+    return set(filter(None, modules.split(',')))
+
+
+class TestLazyImports(unittest.TestCase):
+    def test_import_parse(self):
+        self.assertEqual(imported_modules('import src.parse'), set())
+
+    def test_parse_cli_args(self):
+        code = 'from src.parse import parse_cli_args\nparse_cli_args(["--limit", "5"])'
+        self.assertEqual(imported_modules(code), set())
+
+    def test_plain_query(self):
+        with tempfile.TemporaryDirectory() as home:
+            activities_dir = os.path.join(home, '.config', 'strava-cli', 'strava-cli-activities')
+            conn = store.connect(os.path.join(activities_dir, 'activities.db'))
+            with open('tests/example_data.json') as f:
+                store.upsert(conn, json.load(f))
+            conn.close()
+            code = ('import sys\nsys.argv = ["strava-cli", "--format", "plain"]\n'
+                    'from src.parse import main\nmain()')
+            modules = imported_modules(code, env={**os.environ, 'HOME': home})
+        self.assertNotIn('requests', modules)
+        self.assertNotIn('rich', modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
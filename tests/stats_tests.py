@@ -0,0 +1,99 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from src import stats, store
+from src.table import ActivityTable
+
+
+def activity(days_ago, distance=1000, moving_time=600, elevation=10):
+    date = datetime.datetime.today() - datetime.timedelta(days=days_ago)
+    return {'start_date_local': date.strftime('%Y-%m-%dT%H:%M:%SZ'), 'distance': distance,
+            'moving_time': moving_time, 'total_elevation_gain': elevation}
+
+
+class TestCalculateStats(unittest.TestCase):
+    def test_empty_data(self):
+        result = stats.calculate_stats([])
+        self.assertEqual(result['covered_distance'], 0)
+        self.assertEqual(result['moving_time'], datetime.timedelta())
+
+    def test_sums(self):
+        result = stats.calculate_stats([activity(0, 1234, 60, 5), activity(1, 1000, 30, 2.5)])
+        self.assertEqual(result['covered_distance'], 2.23)
+        self.assertEqual(result['moving_time'], datetime.timedelta(seconds=90))
+        self.assertEqual(result['covered_elevation'], 7.5)
+
+
+class TestWeeklyStats(unittest.TestCase):
+    def test_number_of_weeks(self):
+        self.assertEqual(len(stats.weekly_stats([], 6)), 6)
+
+    def test_activities_bucketed_by_week(self):
+        data = [activity(0), activity(7), activity(8), activity(100)]
+        result = stats.weekly_stats(data, 3)
+        self.assertEqual(result[0]['covered_distance'], 1)
+        self.assertEqual(result[1]['covered_distance'] + result[2]['covered_distance'], 2)
+
+
+class TestRollupStats(unittest.TestCase):
+    def test_same_as_period_stats(self):
+        data = [dict(activity(days_ago, 1000 + days_ago, 60 + days_ago, days_ago / 10),
+                     id=days_ago, type='Run' if days_ago % 2 else 'Ride')
+                for days_ago in range(0, 800, 3)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            conn = store.connect(os.path.join(tmp_dir, 'activities.db'))
+            store.upsert(conn, data)
+            for period in stats.PERIODS:
+                self.assertEqual(stats.rollup_stats(conn, 30, period),
+                                 stats.period_stats(data, 30, period))
+            runs = [a for a in data if a['type'] == 'Run']
+            self.assertEqual(stats.rollup_stats(conn, 10, 'week', 'type IN (?)', ['Run']),
+                             stats.period_stats(runs, 10, 'week'))
+            conn.close()
+
+
+class TestBucketIndex(unittest.TestCase):
+    def index(self, dates, period, today):
+        table = ActivityTable([{'start_date_local': f'{date}T10:00:00Z'} for date in dates])
+        return stats.bucket_index(table, period, today).tolist()
+
+    def test_weeks_start_on_monday(self):
+        # 2024-03-11 is a Monday
+        dates = ['2024-03-17', '2024-03-11', '2024-03-10', '2024-03-04', '2023-03-13']
+        self.assertEqual(self.index(dates, 'week', datetime.date(2024, 3, 13)),
+                         [0, 0, 1, 1, 52])
+
+    def test_months(self):
+        dates = ['2024-03-01', '2024-02-29', '2023-03-31']
+        self.assertEqual(self.index(dates, 'month', datetime.date(2024, 3, 13)), [0, 1, 12])
+
+    def test_years(self):
+        dates = ['2024-01-01', '2023-12-31', '2014-06-01']
+        self.assertEqual(self.index(dates, 'year', datetime.date(2024, 3, 13)), [0, 1, 10])
+
+    def test_missing_date(self):
+        table = ActivityTable([{}])
+        self.assertEqual(stats.bucket_index(table, 'week').tolist(), [-1])
+
+
+class TestGenerateRanges(unittest.TestCase):
+    def test_consecutive_ranges(self):
+        for period in stats.PERIODS:
+            ranges = stats.generate_ranges(30, period)
+            for newer, older in zip(ranges, ranges[1:]):
+                self.assertEqual(older['end'] + datetime.timedelta(days=1), newer['start'])
+
+    def test_ranges_match_buckets(self):
+        data = [activity(days_ago) for days_ago in range(0, 800, 3)]
+        for period in stats.PERIODS:
+            ranges = stats.generate_ranges(30, period)
+            for period_range, bucket in zip(ranges, stats.data_by_periods(data, 30, period)):
+                for item in bucket:
+                    date = datetime.date.fromisoformat(item['start_date_local'][:10])
+                    self.assertTrue(period_range['start'] <= date <= period_range['end'])
+
+
+if __name__ == '__main__':
+    unittest.main()
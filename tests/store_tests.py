@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src import load_activities, store
+
+
+def load_example_data():
+    with open('tests/example_data.json') as f:
+        return json.load(f)
+
+
+class StoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, 'activities.db')
+        self.conn = store.connect(self.path)
+        self.addCleanup(self.conn.close)
+
+
+class TestUpsert(StoreTestCase):
+    def test_empty_store(self):
+        self.assertEqual(store.count(self.conn), 0)
+        self.assertIsNone(store.newest_start(self.conn))
+
+    def test_insert(self):
+        store.upsert(self.conn, load_example_data())
+        self.assertEqual(store.count(self.conn), 2)
+
+    def test_replace_same_id(self):
+        data = load_example_data()
+        store.upsert(self.conn, data)
+        data[0]['name'] = 'Renamed'
+        store.upsert(self.conn, data[:1])
+        self.assertEqual(store.count(self.conn), 2)
+        names = {activity['name'] for activity in store.select(self.conn)}
+        self.assertEqual(names, {'Renamed', 'Bondcliff'})
+
+    def test_newest_start(self):
+        store.upsert(self.conn, load_example_data())
+        # Happy Friday, 2018-05-02T12:15:09Z
+        self.assertEqual(store.newest_start(self.conn), 1525263309)
+
+
+class TestSelect(StoreTestCase):
+    def setUp(self):
+        super().setUp()
+        store.upsert(self.conn, load_example_data())
+
+    def test_full_activity_returned(self):
+        self.assertEqual(sorted(store.select(self.conn), key=lambda a: a['id']),
+                         sorted(load_example_data(), key=lambda a: a['id']))
+
+    def test_where(self):
+        result = store.select(self.conn, 'type = ?', ('Run',))
+        self.assertEqual([activity['name'] for activity in result], ['Bondcliff'])
+
+    def test_order_and_limit(self):
+        result = store.select(self.conn, order_by='distance DESC', limit=1)
+        self.assertEqual([activity['name'] for activity in result], ['Happy Friday'])
+
+
+class TestRollups(StoreTestCase):
+    def totals(self, period, since='2000-01-01', where=None, params=()):
+        return store.rollups(self.conn, period, since, where, params)
+
+    def test_empty_store(self):
+        self.assertEqual(self.totals('day'), [])
+
+    def test_periods(self):
+        store.upsert(self.conn, load_example_data())
+        self.assertEqual(self.totals('day'), [('2018-04-30', 1, 23676.5, 5400, 0),
+                                              ('2018-05-02', 1, 24931.4, 4500, 0)])
+        self.assertEqual(self.totals('week'), [('2018-04-30', 2, 48607.9, 9900, 0)])
+        self.assertEqual([row[:2] for row in self.totals('month')],
+                         [('2018-04-01', 1), ('2018-05-01', 1)])
+        self.assertEqual([row[:2] for row in self.totals('year')], [('2018-01-01', 2)])
+
+    def test_filter_by_type(self):
+        store.upsert(self.conn, load_example_data())
+        self.assertEqual(self.totals('week', where='type = ?', params=('Run',)),
+                         [('2018-04-30', 1, 23676.5, 5400, 0)])
+
+    def test_since(self):
+        store.upsert(self.conn, load_example_data())
+        self.assertEqual([row[0] for row in self.totals('day', since='2018-05-01')],
+                         ['2018-05-02'])
+
+    def test_changed_activity(self):
+        data = load_example_data()
+        store.upsert(self.conn, data)
+        data[0]['start_date_local'] = '2019-01-01T10:00:00Z'
+        data[0]['distance'] = 1000
+        store.upsert(self.conn, data[:1])
+        self.assertEqual(self.totals('year'), [('2018-01-01', 1, 23676.5, 5400, 0),
+                                               ('2019-01-01', 1, 1000, 4500, 0)])
+
+    def test_clear(self):
+        store.upsert(self.conn, load_example_data())
+        store.clear(self.conn)
+        self.assertEqual(self.totals('day'), [])
+
+
+class TestLegacyImport(unittest.TestCase):
+    def test_page_files_imported_and_removed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with open(os.path.join(tmp_dir, 'activities_1.json'), 'w') as f:
+                json.dump(load_example_data(), f)
+            conn = store.connect(os.path.join(tmp_dir, 'activities.db'))
+            self.assertEqual(store.count(conn), 2)
+            conn.close()
+            self.assertEqual(os.listdir(tmp_dir), ['activities.db'])
+
+    def test_exists(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'activities.db')
+            self.assertFalse(store.exists(path))
+            with open(os.path.join(tmp_dir, 'activities_1.json'), 'w') as f:
+                json.dump(load_example_data(), f)
+            self.assertTrue(store.exists(path))
+            self.assertFalse(os.path.exists(path))
+
+
+class TestOpenStore(unittest.TestCase):
+    def test_fresh_install_left_untouched(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, 'strava-cli')
+            with mock.patch('src.store.STORE_PATH', os.path.join(data_dir, 'activities.db')):
+                self.assertRaises(FileNotFoundError, load_activities.open_store)
+            self.assertFalse(os.path.exists(data_dir))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import requests
+
+from src import api, streams
+
+STREAMS = {'time': {'data': [0, 1, 2, 3]},
+           'latlng': {'data': [[49.19, 16.61], [49.191, 16.611], [49.192, 16.612],
+                               [49.193, 16.613]]},
+           'heartrate': {'data': [120, None, 125, 130]},
+           'velocity_smooth': {'data': [1.0, 2.0, 3.0, 4.0]}}
+
+
+class FakeSession:
+    """Session serving STREAMS for every activity but those in `missing` and `forbidden`."""
+    def __init__(self, missing=(), quota=None, forbidden=()):
+        self.missing = missing
+        self.quota = quota
+        self.forbidden = forbidden
+        self.requested = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def request(self, method, url, params, headers):
+        activity_id = int(url.split('/')[-2])
+        self.requested.append(activity_id)
+        status = 404 if activity_id in self.missing else 403 if activity_id in self.forbidden \
+            else 200
+        headers = {}
+        if self.quota is not None:
+            # daily usage reported after this request
+            headers = {'X-RateLimit-Limit': f'100,{self.quota}',
+                       'X-RateLimit-Usage': f'1,{len(self.requested)}'}
+        response = mock.Mock(status_code=status, headers=headers,
+                             json=mock.Mock(return_value=STREAMS))
+        if status == 403:
+            response.raise_for_status.side_effect = requests.HTTPError('403 Client Error')
+        return response
+
+
+class TestDownloadStreams(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.directory = self.tmp_dir.name
+
+    def download(self, ids, missing=(), quota=None, forbidden=()):
+        session = FakeSession(missing, quota, forbidden)
+        with mock.patch('requests.Session', return_value=session), \
+                mock.patch('src.api.scheduler', api.RequestScheduler()):
+            count, remaining = streams.download_streams({'access_token': 'abc'}, ids,
+                                                        workers=2, directory=self.directory)
+        self.remaining = remaining
+        return count, session
+
+    def test_typed_memory_mapped_arrays(self):
+        self.download([1])
+        loaded = streams.load(1, directory=self.directory)
+        self.assertEqual(set(loaded), {'time', 'latlng', 'heartrate'})
+        self.assertIsInstance(loaded['latlng'], np.memmap)
+        self.assertEqual(loaded['latlng'].shape, (4, 2))
+        self.assertEqual(loaded['time'].dtype, np.int32)
+        self.assertTrue(np.isnan(loaded['heartrate'][1]))
+
+    def test_only_missing_activities_requested(self):
+        self.download([1, 2])
+        count, session = self.download([3, 1, 2, 4])
+        self.assertEqual(count, 2)
+        self.assertEqual(sorted(session.requested), [3, 4])
+
+    def test_activity_without_streams_not_requested_again(self):
+        self.download([5], missing=[5])
+        self.assertTrue(streams.has_streams(5, self.directory))
+        self.assertEqual(streams.load(5, directory=self.directory), {})
+        _, session = self.download([5])
+        self.assertEqual(session.requested, [])
+
+    def test_stops_when_quota_exhausted(self):
+        count, session = self.download(list(range(10)), quota=3)
+        self.assertEqual(count, 3)
+        self.assertEqual(self.remaining, 7)
+        self.assertEqual(len(session.requested), 3)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['0', '1', '2'])
+
+    def test_failed_activity_skipped(self):
+        with mock.patch('sys.stdout', io.StringIO()) as output:
+            count, session = self.download([1, 2, 3], forbidden=[2])
+        self.assertEqual(count, 2)
+        self.assertEqual(self.remaining, 0)
+        self.assertIn('activity 2 not downloaded', output.getvalue())
+        self.assertFalse(streams.has_streams(2, self.directory))
+        _, session = self.download([1, 2, 3])
+        self.assertEqual(session.requested, [2])
+
+    def test_no_partial_directories_left(self):
+        self.download(list(range(10)))
+        self.assertEqual(sorted(os.listdir(self.directory)), sorted(map(str, range(10))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+import datetime
+import json
+import unittest
+
+import numpy as np
+
+from src.table import ActivityTable, attribute_mask, pace_seconds, sort_order, top_order
+from src.utils import add_pace_attribute, speed_to_pace
+
+
+def load_example_table():
+    with open('tests/example_data.json') as f:
+        return ActivityTable(add_pace_attribute(json.load(f)))
+
+
+class TestActivityTable(unittest.TestCase):
+    def test_sequence_of_activities(self):
+        table = load_example_table()
+        self.assertEqual(len(table), 2)
+        self.assertEqual([activity['name'] for activity in table], ['Happy Friday', 'Bondcliff'])
+        self.assertEqual(table[1]['name'], 'Bondcliff')
+
+    def test_empty(self):
+        table = ActivityTable([])
+        self.assertEqual(len(table), 0)
+        self.assertEqual(len(table.take(np.ones(0, dtype=bool))), 0)
+
+    def test_missing_values(self):
+        table = ActivityTable([{'start_date_local': None}])
+        self.assertTrue(np.isnan(table.columns['distance'][0]))
+        self.assertTrue(np.isnat(table.columns['start_date_local'][0]))
+
+    def test_take_mask(self):
+        table = load_example_table()
+        subset = table.take(np.array([False, True]))
+        self.assertEqual(subset.rows, [table[1]])
+        self.assertEqual(subset.columns['distance'].tolist(), [table[1]['distance']])
+
+    def test_take_indices(self):
+        table = load_example_table()
+        self.assertEqual(table.take(np.array([1, 0])).rows, [table[1], table[0]])
+
+
+class TestPaceSeconds(unittest.TestCase):
+    def test_same_as_speed_to_pace(self):
+        speeds = np.array([0, 0.5, 2.91, 3.0, 4.2, 5.54, 7.77])
+        expected = [speed_to_pace(speed).total_seconds() for speed in speeds]
+        self.assertEqual(pace_seconds(speeds).tolist(), expected)
+
+
+class TestAttributeMask(unittest.TestCase):
+    def test_incorrect_attr(self):
+        self.assertRaises(KeyError, attribute_mask, load_example_table(), 'abc', '>', 1)
+
+    def test_distance(self):
+        mask = attribute_mask(load_example_table(), 'distance', '>', 24)
+        self.assertEqual(mask.tolist(), [True, False])
+
+    def test_date(self):
+        mask = attribute_mask(load_example_table(), 'start_date_local', '==',
+                              datetime.date(2018, 5, 2))
+        self.assertEqual(mask.tolist(), [True, False])
+
+    def test_moving_time(self):
+        mask = attribute_mask(load_example_table(), 'moving_time', '<=',
+                              datetime.timedelta(hours=1, minutes=15))
+        self.assertEqual(mask.tolist(), [True, False])
+
+
+class TestSortOrder(unittest.TestCase):
+    def test_zero_values_left_out(self):
+        table = ActivityTable([{'distance': 5}, {'distance': 0}, {}, {'distance': 3}])
+        self.assertEqual(sort_order(table, 'distance').tolist(), [3, 0])
+
+    def test_stable_descending(self):
+        table = ActivityTable([{'distance': 5}, {'distance': 7}, {'distance': 5}])
+        self.assertEqual(sort_order(table, 'distance', reverse=True).tolist(), [1, 0, 2])
+
+
+class TestTopOrder(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.activities = [{'distance': float(rng.integers(0, 20)),
+                            'moving_time': float(rng.integers(1, 5)),
+                            'start_date_local': f'2023-01-{rng.integers(1, 29):02}T10:00:00Z'}
+                           for _ in range(500)]
+        self.table = ActivityTable(self.activities)
+
+    def full_sort(self, keys):
+        rows = [index for index, activity in enumerate(self.activities) if activity[keys[0][0]]]
+        for attribute, reverse in reversed(keys):
+            rows.sort(key=lambda index: self.activities[index][attribute], reverse=reverse)
+        return rows
+
+    def test_same_as_full_sort(self):
+        for keys in [[('distance', True)], [('distance', False), ('moving_time', True)],
+                     [('moving_time', True), ('start_date_local', False)],
+                     [('moving_time', False), ('distance', True)]]:
+            expected = self.full_sort(keys)
+            for limit in [None, 0, 1, 7, 100, 1000]:
+                with self.subTest(keys=keys, limit=limit):
+                    self.assertEqual(top_order(self.table, keys, limit).tolist(),
+                                     expected[:limit])
+
+    def test_missing_secondary_keys_last(self):
+        table = ActivityTable([
+            {'distance': 5, 'moving_time': 3, 'start_date_local': '2023-01-02T10:00:00Z'},
+            {'distance': 5},
+            {'distance': 5, 'moving_time': 0, 'start_date_local': '2023-01-01T10:00:00Z'},
+            {'moving_time': 1}])
+        for reverse in (False, True):
+            with self.subTest(reverse=reverse):
+                self.assertEqual(top_order(table, [('distance', False), ('moving_time', reverse)])
+                                 .tolist(), [2, 0, 1] if not reverse else [0, 2, 1])
+                self.assertEqual(top_order(table, [('distance', False),
+                                                   ('start_date_local', reverse)]).tolist(),
+                                 [2, 0, 1] if not reverse else [0, 2, 1])
+
+
+if __name__ == '__main__':
+    unittest.main()